@@ -0,0 +1,236 @@
+"""
+Aggregations other than the sum for the grouped charts.
+
+A chart's "aggregation" is one of AGGREGATIONS. Counts and means come from
+the row counts the cube keeps next to its sums, so they are exact and as
+cheap as a sum. Distinct counts are estimated from the HyperLogLog registers
+of `distinct` and percentiles from the t-digests of `sketches`, both kept per
+cube cell, so a filter change only merges the cells it keeps. A chart saved
+with "exact" computes distinct counts and percentiles from the rows instead
+(or, for a dataset too large to load, from a scan of its value counts).
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from catalog import dataset_fingerprint
+
+AGGREGATIONS = {
+    "sum": "Sum",
+    "count": "Count",
+    "mean": "Mean",
+    "distinct": "Distinct Count",
+    "median": "Median",
+    "p95": "95th Percentile",
+}
+PERCENTILES = {"median": 0.5, "p95": 0.95}
+# Charts whose values are grouped, and so can take another aggregation.
+AGGREGATED_CHARTS = ("Bar Chart", "Pie Chart", "Slicer Chart", "Choropleth Map")
+
+
+def aggregation_label(chart: dict, measure: str) -> str:
+    """Axis title of `measure` under the chart's aggregation."""
+    aggregation = chart.get("aggregation", "sum")
+    if aggregation == "sum":
+        return measure
+    if aggregation == "count":
+        return "Count"
+    return f"{AGGREGATIONS[aggregation]} of {measure}"
+
+
+def weighted_quantile(values: np.ndarray, counts: np.ndarray, q: float) -> float:
+    """The `q` quantile of `values` repeated `counts` times, interpolated
+    between order statistics as `Series.quantile` does."""
+    order = np.argsort(values)
+    values, ends = values[order], np.cumsum(counts[order])
+    position = q * (ends[-1] - 1)
+    low = values[np.searchsorted(ends, np.floor(position), side="right")]
+    high = values[np.searchsorted(ends, np.ceil(position), side="right")]
+    return float(low + (high - low) * (position - np.floor(position)))
+
+
+def exact_aggregate_of(df: pd.DataFrame, group_by: list, measure: str, aggregation: str):
+    """`aggregation` of `measure` by `group_by` over the rows of `df`."""
+    grouped = df.groupby(group_by, observed=True)[measure]
+    if aggregation == "count":
+        result = grouped.size()
+    elif aggregation == "mean":
+        result = grouped.sum() / grouped.size()
+    elif aggregation == "distinct":
+        result = grouped.nunique()
+    else:
+        result = grouped.quantile(PERCENTILES[aggregation])
+    return result.rename(measure).reset_index()
+
+
+def preview_aggregate(
+    df: pd.DataFrame,
+    group_by: list,
+    measure: str,
+    aggregation: str,
+    population: int = None,
+    expressions: dict = None,
+) -> pd.DataFrame:
+    """Wizard preview of `aggregation`; counts from a sample are scaled to
+    `population` like the sums of `preview_sum`. `measure` may be one of the
+    calculated `expressions`."""
+    from calculated import aggregate_calculated, evaluate, parse_expression
+    from sampling import preview_sum
+
+    if measure in (expressions or {}):
+        parsed = parse_expression(expressions[measure])
+        if parsed["after_aggregation"] and aggregation == "sum":
+            return aggregate_calculated(
+                parsed,
+                lambda column: preview_sum(df, group_by, column, population),
+                group_by,
+                measure,
+            )
+        df = df.assign(**{measure: evaluate(parsed, df)})
+    if aggregation == "sum":
+        return preview_sum(df, group_by, measure, population)
+    result = exact_aggregate_of(df, group_by, measure, aggregation)
+    if population and aggregation == "count":
+        result[measure] = result[measure] * population / max(len(df), 1)
+    return result
+
+
+def _stream_aggregate(
+    path: str,
+    column_data: tuple,
+    group_by: list,
+    measure: str,
+    aggregation: str,
+    exact: bool,
+    filters: dict,
+):
+    """Distinct counts and percentiles of a dataset too large to load."""
+    from streaming import ROWS, stream_group_sum
+
+    date_column = column_data[0] if column_data else None
+    if exact:
+        # Each distinct value with its row count, per group.
+        counts, _ = stream_group_sum(path, [*group_by, measure], [], date_column, **filters)
+        counts = counts.dropna(subset=[measure])
+        grouped = counts.groupby(group_by, observed=True)
+        if aggregation == "distinct":
+            result = grouped.size()
+        else:
+            result = grouped.apply(
+                lambda group: weighted_quantile(
+                    group[measure].to_numpy(dtype="float64"),
+                    group[ROWS].to_numpy(),
+                    PERCENTILES[aggregation],
+                ),
+                include_groups=False,
+            )
+        return result.rename(measure).reset_index()
+    if aggregation == "distinct":
+        from distinct import stream_registers
+
+        registers = stream_registers(path, group_by, [measure], date_column, **filters)
+        return _counts(registers, group_by, measure)
+    from sketches import stream_sketches
+
+    digests = stream_sketches(path, group_by, [measure], date_column, **filters)
+    return _percentiles(digests, group_by, measure, aggregation)
+
+
+def _counts(registers, group_by: list, measure: str) -> pd.DataFrame:
+    from distinct import estimate
+
+    if registers is None:
+        return pd.DataFrame(columns=[*group_by, measure])
+    return estimate(registers, group_by).rename(columns={"count": measure})
+
+
+def _percentiles(digests, group_by: list, measure: str, aggregation: str) -> pd.DataFrame:
+    from sketches import MEAN, WEIGHT, quantiles
+
+    if digests is None:
+        return pd.DataFrame(columns=[*group_by, measure])
+    result = digests.groupby(group_by, observed=True).apply(
+        lambda digest: quantiles(
+            digest[MEAN].to_numpy(), digest[WEIGHT].to_numpy(), PERCENTILES[aggregation]
+        ).item(),
+        include_groups=False,
+    )
+    return result.rename(measure).reset_index()
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _aggregate(
+    path: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    group_by: list,
+    measure: str,
+    aggregation: str,
+    exact: bool,
+    filters: dict,
+    scan_filters: dict,
+    _df,
+):
+    from streaming import ROWS, uses_streaming
+    from utils import rows_of
+
+    streamed = uses_streaming(path)
+    if filters is not None and aggregation in ("count", "mean"):
+        from cube import get_cube, query_cube
+
+        answer = query_cube(
+            get_cube(path, list(column_data)), group_by, measure, with_count=True, **filters
+        )
+        if answer is None and streamed:
+            # The loaded frame holds sums and row counts per day.
+            answer = (
+                rows_of(_df).groupby(group_by, observed=True)[[measure, ROWS]].sum().reset_index()
+            )
+        if answer is not None:
+            if aggregation == "count":
+                answer[measure] = answer[ROWS]
+            else:
+                answer[measure] = answer[measure] / answer[ROWS].where(answer[ROWS] > 0)
+            return answer.drop(columns=ROWS)
+    if filters is not None and not exact and aggregation == "distinct":
+        from distinct import get_registers, query_registers
+
+        registers = get_registers(path, list(column_data))
+        counts = query_registers(registers, group_by, measure, **filters)
+        if counts is not None:
+            return counts.rename(columns={"count": measure})
+    if filters is not None and not exact and aggregation in PERCENTILES:
+        from sketches import get_sketches, query_sketches
+
+        digests = query_sketches(
+            get_sketches(path, list(column_data)), group_by, measure, **filters
+        )
+        if digests is not None:
+            return _percentiles(digests, group_by, measure, aggregation)
+    if streamed:
+        # The loaded frame cannot answer: it holds sums, not the values.
+        return _stream_aggregate(
+            path, column_data, group_by, measure, aggregation, exact, scan_filters
+        )
+    return exact_aggregate_of(rows_of(_df), group_by, measure, aggregation)
+
+
+def aggregate(
+    chart: dict, df: pd.DataFrame, group_by: list, measure: str, filters, scan_filters: dict
+):
+    """The chart's aggregation of `measure` by `group_by` over the filtered
+    `df` (or the rows of a `deferred_rows` function), as `group_sum` takes
+    its `filters`; `scan_filters` (as `chart_filters` gives them) key the
+    cache and narrow scans of datasets too large to load."""
+    return _aggregate(
+        chart["file_path"],
+        dataset_fingerprint(chart["file_path"]),
+        tuple(chart.get("date_column") or []),
+        group_by,
+        measure,
+        chart.get("aggregation", "sum"),
+        bool(chart.get("exact")),
+        filters,
+        scan_filters,
+        df,
+    )
@@ -1,6 +1,10 @@
 import streamlit as st
+from prewarm import start_prewarm
+from watcher import start_watcher
 
 st.set_page_config(layout="wide")
+start_prewarm()
+start_watcher()
 
 page_nav_bar = st.Page(
     "./nav_bar.py",
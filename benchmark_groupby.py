@@ -0,0 +1,54 @@
+"""
+Benchmark of the bincount group-by kernel against pandas groupby.
+
+    python benchmark_groupby.py database/Sales_Invoice.parquet \
+        --measure TranAmt --group-by Branch --group-by CustState Branch
+
+Each grouping is timed with pandas on the dimensions as loaded, with pandas
+on categoricals and with the kernel on categoricals; the speedup is the
+kernel's over pandas on the same categoricals. The source rows are repeated
+`--copies` times.
+"""
+
+import argparse
+import timeit
+import pandas as pd
+from kernels import bincount_group_sum
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark group-by kernels.")
+    parser.add_argument("path")
+    parser.add_argument("--measure", required=True)
+    parser.add_argument("--group-by", nargs="+", action="append", required=True)
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = list(dict.fromkeys([c for group_by in args.group_by for c in group_by]))
+    df = pd.read_parquet(args.path, columns=[*columns, args.measure])
+    df = pd.concat([df] * args.copies, ignore_index=True)
+    print(f"{len(df):,} rows")
+    print(f"{'group by':<40} {'pandas ms':>10} {'categorical':>12} {'bincount':>9} {'speedup':>8}")
+    for group_by in args.group_by:
+        categorical = df.astype({c: "category" for c in group_by})
+
+        def timed(function) -> float:
+            return min(timeit.repeat(function, number=1, repeat=args.repeat)) * 1000
+
+        pandas_ms = timed(
+            lambda: df.groupby(group_by).agg({args.measure: "sum"}).reset_index()
+        )
+        categorical_ms = timed(
+            lambda: categorical.groupby(group_by, observed=True)
+            .agg({args.measure: "sum"})
+            .reset_index()
+        )
+        kernel_ms = timed(lambda: bincount_group_sum(categorical, group_by, args.measure))
+        print(
+            f"{' x '.join(group_by):<40} {pandas_ms:>10.2f} {categorical_ms:>12.2f} "
+            f"{kernel_ms:>9.2f} {categorical_ms / kernel_ms:>7.2f}x"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark of the process-pool aggregation against the number of workers.
+
+    python benchmark_parallel.py database/Sales_Invoice.parquet \
+        --group-by Branch --measure TranAmt --copies 200 --workers 1 2 4 8
+
+The source file is repeated `--copies` times into a temporary file with
+small row groups, so there is enough work to spread. One worker is the
+in-process streaming scan, the baseline of the reported speedups.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import pyarrow.parquet as pq
+from streaming import stream_group_sum
+
+
+def synthesize(path: str, copies: int, row_group_size: int, directory: str) -> str:
+    table = pq.read_table(path)
+    target = os.path.join(directory, "benchmark.parquet")
+    with pq.ParquetWriter(target, table.schema) as writer:
+        for _ in range(copies):
+            writer.write_table(table, row_group_size=row_group_size)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel aggregation.")
+    parser.add_argument("path")
+    parser.add_argument("--group-by", nargs="+", required=True)
+    parser.add_argument("--measure", required=True)
+    parser.add_argument("--date-column", default=None)
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--row-group-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = synthesize(args.path, args.copies, args.row_group_size, directory)
+        metadata = pq.ParquetFile(path).metadata
+        print(
+            f"{metadata.num_rows:,} rows in {metadata.num_row_groups} row groups, "
+            f"{os.cpu_count()} cores"
+        )
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'peak MiB':>9}")
+        baseline = None
+        for workers in args.workers:
+            # The first run of a pool size also pays for starting its processes.
+            stream_group_sum(path, args.group_by, [args.measure], args.date_column, workers=workers)
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                _, stats = stream_group_sum(
+                    path, args.group_by, [args.measure], args.date_column, workers=workers
+                )
+                timings.append(time.perf_counter() - started)
+            seconds = min(timings)
+            baseline = baseline or seconds
+            print(
+                f"{workers:>8} {seconds:>9.3f} {baseline / seconds:>7.2f}x "
+                f"{stats['peak_bytes'] / 1024**2:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Server-side binning for the Histogram, Heatmap and Density Contour charts.
+
+The filtered rows are reduced with NumPy to counts per bin (sums of the
+measure per cell, for a Heatmap) and only those reach the browser, so a
+figure is the same size whatever the row count. Numeric axes are binned on
+edges taken from the catalog statistics, which do not move as filters
+change; categorical axes use their categories. Bins are cached per chart
+definition and filter state, and datasets too large to load are binned
+batch by batch with the streaming scan.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import streamlit as st
+from catalog import dataset_fingerprint, dataset_parts, get_catalog_entry
+from streaming import STREAM_BATCH_ROWS, filter_expression, month_numbers, uses_streaming
+
+BINNED_CHARTS = ("Histogram", "Heatmap", "Density Contour")
+HISTOGRAM_BINS = 40
+# Bins per axis of a Density Contour.
+CONTOUR_BINS = 50
+
+
+def bin_edges(entry: dict, column: str, bins: int, values: np.ndarray = None) -> list:
+    """`bins` equal-width bins over the catalog range of `column`, or over
+    `values` when the files carry no statistics."""
+    info = entry["columns"].get(column) or {}
+    low, high = info.get("min"), info.get("max")
+    if low is None or high is None:
+        finite = values[np.isfinite(values)] if values is not None else values
+        low, high = (finite.min(), finite.max()) if finite is not None and len(finite) else (0, 1)
+    low, high = float(low), float(high)
+    if high <= low:
+        high = low + 1
+    return np.linspace(low, high, bins + 1).tolist()
+
+
+def bin_codes(values: np.ndarray, edges: list) -> np.ndarray:
+    """Bin of each value, the last bin closed on the right; -1 for values
+    outside the edges and NaNs."""
+    edges = np.asarray(edges)
+    codes = np.searchsorted(edges, values, side="right") - 1
+    codes[values == edges[-1]] = len(edges) - 2
+    codes[(codes < 0) | (codes >= len(edges) - 1)] = -1
+    return codes
+
+
+def category_codes(column: pd.Series):
+    """(codes, labels) of a categorical axis, -1 for missing values."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype(np.int64), column.cat.categories
+    codes, labels = pd.factorize(column, sort=True)
+    return codes.astype(np.int64), labels
+
+
+def count_bins(codes: np.ndarray, size: int, weights: np.ndarray = None) -> np.ndarray:
+    valid = codes >= 0
+    return np.bincount(
+        codes[valid], weights=None if weights is None else weights[valid], minlength=size
+    )
+
+
+def count_grid(x_codes, x_size: int, y_codes, y_size: int, weights=None) -> np.ndarray:
+    """2D histogram of two coded axes, one row per y bin."""
+    valid = (x_codes >= 0) & (y_codes >= 0)
+    cells = y_codes[valid] * x_size + x_codes[valid]
+    return np.bincount(
+        cells,
+        weights=None if weights is None else weights[valid],
+        minlength=x_size * y_size,
+    ).reshape(y_size, x_size)
+
+
+def centers(edges: list) -> list:
+    edges = np.asarray(edges)
+    return ((edges[:-1] + edges[1:]) / 2).tolist()
+
+
+def binned_spec(chart: dict, measure: str, entry: dict = None) -> dict:
+    """What to bin for a chart: the axes, their edges when numeric and the
+    measure a Heatmap sums."""
+    entry = entry or get_catalog_entry(chart["file_path"])
+    if chart["type"] == "Histogram":
+        return {"x": measure, "x_edges": bin_edges(entry, measure, HISTOGRAM_BINS)}
+    if chart["type"] == "Density Contour":
+        x, y = chart["measure"][:2]
+        return {
+            "x": x,
+            "y": y,
+            "x_edges": bin_edges(entry, x, CONTOUR_BINS),
+            "y_edges": bin_edges(entry, y, CONTOUR_BINS),
+        }
+    return {"x": chart["main_dimension"], "y": chart["y_dimension"], "weights": measure}
+
+
+def _numeric(column) -> np.ndarray:
+    if isinstance(column, (pa.Array, pa.ChunkedArray)):
+        column = column.to_pandas()
+    return column.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def histogram_of(df: pd.DataFrame, spec: dict) -> dict:
+    """Counts per bin of the numeric `x` axis, with `y` counts per cell."""
+    x_codes = bin_codes(_numeric(df[spec["x"]]), spec["x_edges"])
+    x_size = len(spec["x_edges"]) - 1
+    if not spec.get("y"):
+        return {"x": centers(spec["x_edges"]), "z": count_bins(x_codes, x_size)}
+    y_codes = bin_codes(_numeric(df[spec["y"]]), spec["y_edges"])
+    y_size = len(spec["y_edges"]) - 1
+    return {
+        "x": centers(spec["x_edges"]),
+        "y": centers(spec["y_edges"]),
+        "z": count_grid(x_codes, x_size, y_codes, y_size),
+    }
+
+
+def heatmap_of(df: pd.DataFrame, spec: dict) -> dict:
+    """Sums of the measure per (x, y) category, without the empty rows and
+    columns filters leave."""
+    x_codes, x_labels = category_codes(df[spec["x"]])
+    y_codes, y_labels = category_codes(df[spec["y"]])
+    weights = _numeric(df[spec["weights"]])
+    weights = np.where(np.isnan(weights), 0, weights)
+    z = count_grid(x_codes, len(x_labels), y_codes, len(y_labels), weights)
+    present = count_grid(x_codes, len(x_labels), y_codes, len(y_labels)) > 0
+    columns, rows = present.any(axis=0), present.any(axis=1)
+    return {
+        "x": [str(label) for label in np.asarray(x_labels)[columns]],
+        "y": [str(label) for label in np.asarray(y_labels)[rows]],
+        "z": np.where(present, z, np.nan)[rows][:, columns],
+    }
+
+
+def stream_histogram(path: str, spec: dict, date_column=None, years=None, months=None, days=None, dimensions=None):
+    """`histogram_of` a dataset too large to load, accumulated per batch."""
+    columns = [spec["x"], *([spec["y"]] if spec.get("y") else [])]
+    if date_column and months is not None:
+        columns.append(date_column)
+    dataset = ds.dataset(dataset_parts(path), format="parquet")
+    scanner = dataset.scanner(
+        columns=list(dict.fromkeys(columns)),
+        filter=filter_expression(dataset.schema, date_column, years, days, dimensions),
+        batch_size=STREAM_BATCH_ROWS,
+    )
+    months = month_numbers(months) if months is not None else None
+    bins = None
+    for batch in scanner.to_batches():
+        table = pa.Table.from_batches([batch])
+        if months is not None:
+            table = table.filter(pc.is_in(pc.month(table[date_column]), months))
+        partial = histogram_of(table, spec)
+        if bins is None:
+            bins = partial
+        else:
+            bins["z"] = bins["z"] + partial["z"]
+    return bins or histogram_of(pd.DataFrame({c: [] for c in columns}), spec)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _chart_bins(path: str, fingerprint: tuple, chart_type: str, spec: dict, filters: dict, date_column, _df):
+    if chart_type == "Heatmap":
+        bins = heatmap_of(_df, spec)
+    elif uses_streaming(path):
+        # The loaded frame holds sums per day, not the rows to count.
+        bins = stream_histogram(path, spec, date_column, **filters)
+    else:
+        bins = histogram_of(_df, spec)
+    bins["z"] = bins["z"].tolist()
+    return bins
+
+
+def chart_bins(chart: dict, df: pd.DataFrame, measure: str, filters: dict) -> dict:
+    """Bins of the filtered `df` of a chart: "x" (and "y") labels and the
+    "z" counts or sums. `filters` is the filter state that narrowed `df`, in
+    the form `chart_filters` gives; it keys the cache in place of the rows."""
+    return _chart_bins(
+        chart["file_path"],
+        dataset_fingerprint(chart["file_path"]),
+        chart["type"],
+        binned_spec(chart, measure),
+        filters,
+        (chart.get("date_column") or [None])[0],
+        df,
+    )
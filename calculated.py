@@ -0,0 +1,201 @@
+"""
+Calculated measures: arithmetic over the numeric columns of a dataset.
+
+A chart's "calculated" maps measure names (listed in its "measure" like the
+stored ones) to expressions such as ``(Sales - Cost) / Sales``; columns whose
+names are not identifiers are written in backticks. An expression is parsed
+once, checked against the dataset's numeric columns, and evaluated on whole
+columns, through numexpr when it is installed.
+
+Sums of an expression that is linear in its columns, or a ratio of such
+terms, are evaluated after aggregation: the sums of its columns come from the
+cube and caches like any stored measure, and a margin % is the margin of the
+totals. Other expressions (products of columns) are evaluated per row, once
+per loaded dataset, and summed like a stored column.
+"""
+
+import ast
+import re
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+try:
+    import numexpr
+except ImportError:  # evaluated with NumPy
+    numexpr = None
+
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+PLACEHOLDER = "__column"
+
+
+def chart_expressions(chart: dict) -> dict:
+    return chart.get("calculated") or {}
+
+
+def stored_measures(chart: dict) -> list:
+    """The dataset columns behind a chart's measures, calculated ones
+    replaced by the columns they read."""
+    expressions = chart_expressions(chart)
+    columns = []
+    for measure in chart.get("measure", []):
+        if measure in expressions:
+            columns.extend(parse_expression(expressions[measure])["columns"].values())
+        else:
+            columns.append(measure)
+    return list(dict.fromkeys(columns))
+
+
+def _linear(node) -> bool:
+    """Whether the sum of `node` over rows is `node` of the column sums."""
+    if isinstance(node, ast.Name):
+        return True
+    if isinstance(node, ast.UnaryOp):
+        return _linear(node.operand)
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            return _linear(node.left) and _linear(node.right)
+        if isinstance(node.op, ast.Mult):
+            return (_constant(node.left) and _linear(node.right)) or (
+                _linear(node.left) and _constant(node.right)
+            )
+        return _linear(node.left) and _constant(node.right)
+    return False
+
+
+def _constant(node) -> bool:
+    return not any(isinstance(child, ast.Name) for child in ast.walk(node))
+
+
+def _ratio(node) -> bool:
+    """Whether `node` is a ratio of linear terms (up to constants), which is
+    read as the ratio of their totals."""
+    if isinstance(node, ast.UnaryOp):
+        return _ratio(node.operand)
+    if not isinstance(node, ast.BinOp):
+        return False
+    if isinstance(node.op, ast.Div) and _linear(node.left) and _linear(node.right):
+        return True
+    if isinstance(node.op, (ast.Add, ast.Sub)):
+        sides = (node.left, node.right)
+        return all(_ratio(side) or _constant(side) for side in sides) and any(
+            _ratio(side) for side in sides
+        )
+    if isinstance(node.op, ast.Mult):
+        return (_constant(node.left) and _ratio(node.right)) or (
+            _ratio(node.left) and _constant(node.right)
+        )
+    return _ratio(node.left) and _constant(node.right)
+
+
+@st.cache_data(show_spinner=False)
+def parse_expression(expression: str, available: tuple = None) -> dict:
+    """The parsed form of `expression`: its "source" with every column
+    renamed to a placeholder, the placeholder -> "columns" map and whether
+    it is evaluated "after_aggregation". Raises ValueError for anything but
+    numbers, columns (of `available`, if given), + - * / and parentheses."""
+    columns = {}
+
+    def placeholder(name: str) -> str:
+        if available is not None and name not in available:
+            raise ValueError(f"Unknown numeric column: {name}")
+        key = next((key for key, column in columns.items() if column == name), None)
+        if key is None:
+            key = f"{PLACEHOLDER}{len(columns)}"
+            columns[key] = name
+        return key
+
+    # Backticked names become placeholders before parsing, bare ones after.
+    source = re.sub(r"`([^`]+)`", lambda match: placeholder(match[1]), expression)
+    try:
+        tree = ast.parse(source, mode="eval").body
+    except SyntaxError as error:
+        raise ValueError(f"Invalid expression: {error.msg}") from None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id not in columns:
+                node.id = placeholder(node.id)
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Unsupported constant: {node.value!r}")
+        elif isinstance(node, ast.BinOp):
+            if not isinstance(node.op, OPERATORS):
+                raise ValueError("Only + - * / are supported.")
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, (ast.UAdd, ast.USub)):
+                raise ValueError("Only + - * / are supported.")
+        elif not isinstance(node, (ast.Load, ast.operator, ast.unaryop)):
+            raise ValueError(f"Unsupported syntax: {ast.unparse(node)}")
+    if not columns:
+        raise ValueError("The expression does not read any column.")
+    return {
+        "source": ast.unparse(tree),
+        "columns": columns,
+        "after_aggregation": _linear(tree) or _ratio(tree),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def _compiled(source: str):
+    return compile(source, "<calculated measure>", "eval")
+
+
+def evaluate(parsed: dict, frame: pd.DataFrame) -> np.ndarray:
+    """The expression over the columns of `frame`, as float64; divisions by
+    zero give NaN."""
+    arrays = {
+        key: frame[column].to_numpy(dtype="float64", na_value=np.nan)
+        for key, column in parsed["columns"].items()
+    }
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if numexpr is not None:
+            values = numexpr.evaluate(parsed["source"], local_dict=arrays)
+        else:
+            values = eval(_compiled(parsed["source"]), {"__builtins__": {}}, arrays)
+    values = np.asarray(values, dtype="float64")
+    if values.ndim == 0:
+        values = np.full(len(frame), values)
+    return np.where(np.isfinite(values), values, np.nan)
+
+
+def aggregate_calculated(
+    parsed: dict, group_sum, group_by: list, measure: str
+) -> pd.DataFrame:
+    """The sums of an after-aggregation `measure` by `group_by`, from
+    `group_sum(column)` of each of its columns."""
+    sums = None
+    for column in dict.fromkeys(parsed["columns"].values()):
+        frame = group_sum(column)[[*group_by, column]]
+        sums = frame if sums is None else sums.merge(frame, on=group_by, how="outer")
+    sums[measure] = evaluate(parsed, sums)
+    return sums[[*group_by, measure]]
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _row_values(
+    path: str, fingerprint: tuple, column_data: tuple, parts, expression: str, _df
+):
+    return evaluate(parse_expression(expression), _df)
+
+
+def with_calculated(chart: dict, df: pd.DataFrame, parts=None) -> pd.DataFrame:
+    """`df` with a column for each calculated measure of the chart that is
+    evaluated per row (all of them, for charts aggregating by other than
+    the sum), cached with the loaded dataset."""
+    values = {}
+    for measure, expression in chart_expressions(chart).items():
+        parsed = parse_expression(expression)
+        if measure in df.columns or (
+            parsed["after_aggregation"] and chart.get("aggregation", "sum") == "sum"
+        ):
+            continue
+        if all(column in df.columns for column in parsed["columns"].values()):
+            values[measure] = _row_values(
+                chart["file_path"],
+                df.attrs.get("fingerprint"),
+                tuple(chart.get("date_column") or []),
+                tuple(parts) if parts is not None else None,
+                expression,
+                df,
+            )
+    return df.assign(**values) if values else df
@@ -0,0 +1,258 @@
+"""
+Catalog of the datasets in ./database built from the Parquet footers.
+
+A dataset is a single `.parquet` file, a base file plus appended delta files
+in a sibling `<name>.parts/` directory, or a directory of parts, possibly
+Hive-partitioned as `year=YYYY/month=MM/`. Schema, row
+counts and column statistics come from the file metadata, so the setup flow
+can offer dimensions, measures and date bounds without reading the data.
+Entries are built per part, keyed by its fingerprint, so a new part is the
+only one read when it appears.
+"""
+
+import calendar
+import glob
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import streamlit as st
+
+DATA_DIR = "./database"
+PARTS_SUFFIX = ".parts"
+
+
+def dataset_parts(path: str) -> list[str]:
+    """Parquet files of a dataset in append (lexical) order."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True))
+    deltas = os.path.splitext(path)[0] + PARTS_SUFFIX
+    return [path, *sorted(glob.glob(os.path.join(deltas, "*.parquet")))]
+
+
+def partition_values(path: str, part: str) -> dict:
+    """Hive `key=value` directories between the dataset root and a part."""
+    if not os.path.isdir(path):
+        return {}
+    values = {}
+    for segment in os.path.relpath(os.path.dirname(part), path).split(os.sep):
+        key, separator, value = segment.partition("=")
+        if separator:
+            values[key.lower()] = value
+    return values
+
+
+def is_partitioned(path: str) -> bool:
+    return any(partition_values(path, part) for part in dataset_parts(path))
+
+
+def partition_years(path: str):
+    """Years of a `year=` partitioned dataset, or None when not partitioned."""
+    years = {
+        int(values["year"])
+        for values in (partition_values(path, part) for part in dataset_parts(path))
+        if "year" in values
+    }
+    return sorted(years) or None
+
+
+def partition_months(path: str, years=None):
+    """Month abbreviations of a `month=` partitioned dataset, or None."""
+    months = set()
+    for part in dataset_parts(path):
+        values = partition_values(path, part)
+        if "month" not in values:
+            continue
+        if years is not None and "year" in values and int(values["year"]) not in years:
+            continue
+        months.add(int(values["month"]))
+    return [calendar.month_abbr[month] for month in sorted(months)] or None
+
+
+def prune_parts(path: str, years=None, months=None) -> list[str]:
+    """Parts that can hold rows of the given years and month abbreviations."""
+    years = None if years is None else {int(year) for year in years}
+    months = (
+        None
+        if months is None
+        else {list(calendar.month_abbr).index(month) for month in months}
+    )
+    parts = []
+    for part in dataset_parts(path):
+        values = partition_values(path, part)
+        if years is not None and "year" in values and int(values["year"]) not in years:
+            continue
+        if months is not None and "month" in values and int(values["month"]) not in months:
+            continue
+        parts.append(part)
+    return parts
+
+
+def part_fingerprint(part: str) -> tuple:
+    """(mtime, size) of a part, followed by those of the dimension tables
+    joined to its dataset, so what is cached from it follows them too."""
+    from models import dimension_versions
+
+    stat = os.stat(part)
+    return (stat.st_mtime_ns, stat.st_size, *dimension_versions(part))
+
+
+def dataset_fingerprint(path: str) -> tuple:
+    return tuple((part, *part_fingerprint(part)) for part in dataset_parts(path))
+
+
+def list_datasets(data_dir: str = DATA_DIR) -> list[str]:
+    datasets = []
+    for name in sorted(os.listdir(data_dir)):
+        full_path = os.path.join(data_dir, name)
+        if name.startswith("."):
+            continue
+        if os.path.isfile(full_path) and name.endswith(".parquet"):
+            datasets.append(name)
+        elif (
+            os.path.isdir(full_path)
+            and not name.endswith(PARTS_SUFFIX)
+            and dataset_parts(full_path)
+        ):
+            datasets.append(name)
+    return datasets
+
+
+def column_kind(data_type: pa.DataType) -> str:
+    """Classify a column the same way `select_dtypes` does on the loaded frame."""
+    if pa.types.is_timestamp(data_type) or pa.types.is_date(data_type):
+        return "date"
+    if pa.types.is_integer(data_type) or pa.types.is_floating(data_type):
+        return "measure"
+    return "dimension"
+
+
+def estimate_distinct(sample: pa.ChunkedArray, num_rows: int) -> int:
+    """Scale the distinct count of the first row group to the whole file.
+
+    Low-cardinality columns saturate inside one row group, so their count is
+    kept as is; near-unique columns are extrapolated linearly.
+    """
+    if len(sample) == 0:
+        return 0
+    distinct = pc.count_distinct(sample).as_py()
+    if distinct > len(sample) / 2:
+        return int(distinct * num_rows / len(sample))
+    return distinct
+
+
+@st.cache_data(show_spinner=False)
+def _build_part_entry(path: str, fingerprint: tuple) -> dict:
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+    first_row_group = (
+        parquet_file.read_row_group(0) if metadata.num_row_groups else None
+    )
+
+    columns = {}
+    for index, field in enumerate(schema):
+        info = {
+            "type": str(field.type),
+            "kind": column_kind(field.type),
+            "min": None,
+            "max": None,
+            "null_count": 0,
+            "distinct_count": None,
+        }
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(index).statistics
+            if statistics is None:
+                continue
+            info["null_count"] += statistics.null_count or 0
+            if statistics.has_min_max:
+                if info["min"] is None or statistics.min < info["min"]:
+                    info["min"] = statistics.min
+                if info["max"] is None or statistics.max > info["max"]:
+                    info["max"] = statistics.max
+        if first_row_group is not None:
+            info["distinct_count"] = estimate_distinct(
+                first_row_group.column(field.name), metadata.num_rows
+            )
+        columns[field.name] = info
+
+    return {
+        "path": path,
+        "fingerprint": fingerprint,
+        "num_rows": metadata.num_rows,
+        "num_row_groups": metadata.num_row_groups,
+        "uncompressed_bytes": sum(
+            metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups)
+        ),
+        "columns": columns,
+    }
+
+
+def merge_entries(path: str, fingerprint: tuple, entries: list) -> dict:
+    """Combine part entries into the entry of the logical dataset."""
+    columns = {}
+    for entry in entries:
+        for name, info in entry["columns"].items():
+            merged = columns.setdefault(name, {**info, "null_count": 0, "parts": []})
+            merged["null_count"] += info["null_count"]
+            for bound, pick in (("min", min), ("max", max)):
+                if info[bound] is None:
+                    continue
+                if merged[bound] is None:
+                    merged[bound] = info[bound]
+                else:
+                    merged[bound] = pick(merged[bound], info[bound])
+            merged["parts"].append((info["distinct_count"], entry["num_rows"]))
+    for info in columns.values():
+        # Near-unique columns keep growing with each part, others saturate.
+        counts = [count or 0 for count, _ in info["parts"]]
+        near_unique = all(count > rows / 2 for count, rows in info.pop("parts") if rows)
+        info["distinct_count"] = sum(counts) if near_unique else max(counts)
+    return {
+        "path": path,
+        "fingerprint": fingerprint,
+        "parts": [entry["path"] for entry in entries],
+        "num_rows": sum(entry["num_rows"] for entry in entries),
+        "num_row_groups": sum(entry["num_row_groups"] for entry in entries),
+        "uncompressed_bytes": sum(entry["uncompressed_bytes"] for entry in entries),
+        "columns": columns,
+    }
+
+
+@st.cache_data(show_spinner=False)
+def _build_entry(path: str, fingerprint: tuple) -> dict:
+    entries = [_build_part_entry(part, tuple(stat)) for part, *stat in fingerprint]
+    return merge_entries(path, fingerprint, entries)
+
+
+def get_catalog_entry(path: str) -> dict:
+    return _build_entry(path, dataset_fingerprint(path))
+
+
+def columns_of_kind(entry: dict, kind: str) -> list[str]:
+    return [name for name, info in entry["columns"].items() if info["kind"] == kind]
+
+
+def date_bounds(entry: dict, column: str):
+    """Return the (min, max) dates of a column or None without statistics."""
+    info = entry["columns"].get(column)
+    if not info or info["min"] is None or info["max"] is None:
+        return None
+    return tuple(
+        value.date() if hasattr(value, "hour") else value
+        for value in (info["min"], info["max"])
+    )
+
+
+@st.cache_data(show_spinner=False)
+def _read_preview(path: str, fingerprint: tuple, rows: int):
+    parquet_file = pq.ParquetFile(path)
+    if not parquet_file.metadata.num_row_groups:
+        return parquet_file.schema_arrow.empty_table().to_pandas()
+    return parquet_file.read_row_group(0).slice(0, rows).to_pandas()
+
+
+def read_preview(path: str, rows: int = 5):
+    """Read the first rows of a dataset touching only its first row group."""
+    first_part = dataset_parts(path)[0]
+    return _read_preview(first_part, part_fingerprint(first_part), rows)
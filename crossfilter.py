@@ -0,0 +1,141 @@
+"""
+Cross-filtering between the charts of a page.
+
+Selecting bars of a Bar Chart or slices of a Pie Chart stores the selected
+values of its dimension as the page's selection. Every other chart of the
+page that reads the same dataset and has that column is narrowed to them:
+the loaded frame by a boolean mask, and the cube and sketch queries through
+their dimension filters. Masks come from a per-dimension index of the loaded
+frame (its factorized codes), built once per dataset version, so a selection
+costs one lookup-table gather per dependent chart. Charts on other datasets
+draw from their caches unchanged.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+CROSS_FILTER_ENABLED = True
+
+
+def _selection_key() -> str:
+    return f"cross_filter_{st.session_state.get('name_of_actually_page')}"
+
+
+def page_selection():
+    """The page's selection: "chart_id", "file_path", "dimension" and
+    "values", or None."""
+    return st.session_state.get(_selection_key())
+
+
+def chart_selection(chart: dict):
+    """(dimension, values) of the page's selection that narrow `chart`, or
+    None when it does not depend on it."""
+    selection = page_selection()
+    if (
+        not CROSS_FILTER_ENABLED
+        or selection is None
+        or selection["chart_id"] == chart["chart_id"]
+        or selection["file_path"] != chart["file_path"]
+    ):
+        return None
+    return selection["dimension"], selection["values"]
+
+
+def select(chart: dict, dimension: str, values: list):
+    """Make `values` of `dimension` the page's selection, or clear it when
+    `chart` made it and `values` is empty; reruns the page if it changed.
+    Only a change of the chart's own selection counts, so a selection made
+    elsewhere is not undone by this chart having none."""
+    seen_key = f"selected_values_{chart['chart_id']}"
+    if st.session_state.get(seen_key, []) == values:
+        return
+    st.session_state[seen_key] = values
+    current = page_selection()
+    if values:
+        selection = {
+            "chart_id": chart["chart_id"],
+            "file_path": chart["file_path"],
+            "dimension": dimension,
+            "values": sorted(values),
+        }
+    elif current is not None and current["chart_id"] == chart["chart_id"]:
+        selection = None
+    else:
+        return
+    if selection != current:
+        st.session_state[_selection_key()] = selection
+        # Other charts are fragments of the page: only an app rerun reaches them.
+        st.rerun(scope="app")
+
+
+def selected_values(event, labels) -> list:
+    """The `labels` (one per bar or slice) of the points selected in a
+    `st.plotly_chart` event."""
+    if not event or not event.selection.points:
+        return []
+    labels = list(labels)
+    indices = [
+        point.get("point_index", point.get("point_number"))
+        for point in event.selection.points
+    ]
+    return list(dict.fromkeys(str(labels[i]) for i in indices if i is not None))
+
+
+def narrow(filters: dict, dimension: str, values: list) -> dict:
+    """`filters` (as `chart_filters` gives them) also keeping only `values`
+    of `dimension`."""
+    dimensions = filters.setdefault("dimensions", {})
+    kept = dimensions.get(dimension)
+    dimensions[dimension] = [v for v in values if kept is None or v in kept]
+    return filters
+
+
+def _factorize(column: pd.Series):
+    codes, categories = pd.factorize(column, use_na_sentinel=True)
+    return codes, pd.Index(np.asarray(categories).astype(str)), np.asarray(categories)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _dimension_index(path: str, fingerprint: tuple, parts, dimension: str, _df):
+    return _factorize(_df[dimension])
+
+
+def _selected_positions(chart: dict, df: pd.DataFrame):
+    """(dimension, codes, categories, positions of the selected categories)
+    of the loaded `df` of a chart, or None when the selection does not
+    narrow it."""
+    selection = chart_selection(chart)
+    if selection is None or selection[0] not in df.columns:
+        return None
+    dimension, values = selection
+    codes, labels, categories = _dimension_index(
+        chart["file_path"], df.attrs.get("fingerprint"), df.attrs.get("parts"), dimension, df
+    )
+    if len(codes) != len(df):  # not the frame the index was built from
+        codes, labels, categories = _factorize(df[dimension])
+    positions = labels.get_indexer(values)
+    return dimension, codes, categories, positions[positions >= 0]
+
+
+def cross_selection(chart: dict, df: pd.DataFrame) -> dict:
+    """The selection narrowing a chart as {dimension: values} of the column's
+    own type, without touching the rows."""
+    selected = _selected_positions(chart, df)
+    if selected is None:
+        return {}
+    dimension, _, categories, positions = selected
+    return {dimension: categories[positions].tolist()}
+
+
+def cross_filter(chart: dict, df: pd.DataFrame):
+    """The rows of the loaded `df` of a chart that the page's selection keeps,
+    and the selection as {dimension: values} of the column's own type."""
+    selected = _selected_positions(chart, df)
+    if selected is None:
+        return df, {}
+    dimension, codes, categories, positions = selected
+    # Missing values are coded -1 and so read the extra, unselected slot.
+    mask = np.zeros(len(categories) + 1, dtype=bool)
+    mask[positions] = True
+    return df[mask[codes]], {dimension: categories[positions].tolist()}
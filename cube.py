@@ -0,0 +1,198 @@
+"""
+Pre-aggregated cube of partial sums per dataset.
+
+At load time the rows are rolled up by Year, Month and every dimension the
+charts on the dataset filter or group by, for each of their measures. Parts
+of a dataset are rolled up separately and merged. Filter interactions in
+`render_form` are then answered by filtering and regrouping the (much
+smaller) cube instead of the raw rows.
+"""
+
+import calendar
+import pandas as pd
+import streamlit as st
+from calculated import stored_measures
+from catalog import dataset_fingerprint
+
+CUBES_ENABLED = True
+# A cube that is not at least this much smaller than the raw rows is dropped.
+CUBE_MAX_RATIO = 0.5
+PERIOD_COLUMNS = ["Year", "Month_Display"]
+ROWS = "__rows"  # raw row count behind each cell
+
+
+def cube_layout(pages: list, path: str, column_data=False) -> tuple:
+    """(dimensions, measures) used by the charts that read `path`."""
+    dimensions, measures = set(), set()
+    for page in pages:
+        for chart in page.get("charts", []):
+            if chart.get("file_path") != path or (chart.get("date_column") or []) != (
+                column_data or []
+            ):
+                continue
+            dimensions.update(chart.get("dimension", []))
+            if chart.get("main_dimension"):
+                dimensions.add(chart["main_dimension"])
+            if chart.get("y_dimension"):
+                dimensions.add(chart["y_dimension"])
+            dimensions.update(chart.get("hierarchy") or [])
+            measures.update(stored_measures(chart))
+    return tuple(sorted(dimensions)), tuple(sorted(measures))
+
+
+def cube_keys(dimensions: list, with_period: bool) -> list:
+    return [*PERIOD_COLUMNS, *dimensions] if with_period else list(dimensions)
+
+
+def build_cube(df: pd.DataFrame, dimensions: list, measures: list, with_period: bool):
+    """Partial sums and ROWS counts of `df` by the cube keys."""
+    keys = cube_keys(dimensions, with_period)
+    measures = [m for m in measures if m in df.columns]
+    if not keys or not measures or any(k not in df.columns for k in keys):
+        return None
+    grouped = df.groupby(keys, dropna=False, sort=False, observed=True)
+    cube = grouped[measures].sum()
+    cube[ROWS] = grouped.size()
+    return cube.reset_index()
+
+
+def combine_cubes(cubes: list, keys: list) -> pd.DataFrame:
+    """Merge the cubes of several parts; sums and counts just add up."""
+    if len(cubes) == 1:
+        return cubes[0]
+    return (
+        pd.concat(cubes, ignore_index=True)
+        .groupby(keys, dropna=False, sort=False, observed=True)
+        .sum()
+        .reset_index()
+    )
+
+
+@st.cache_data(show_spinner=False)
+def _part_cube(
+    part: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    columns: tuple,
+    dimensions: tuple,
+    measures: tuple,
+):
+    from utils import read_part
+
+    df = read_part(part, list(column_data), columns)
+    return build_cube(df, list(dimensions), list(measures), bool(column_data))
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _get_cube(
+    path: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    columns: tuple,
+    dimensions: tuple,
+    measures: tuple,
+):
+    from streaming import stream_group_sum, uses_streaming
+
+    if uses_streaming(path):
+        cube, _ = stream_group_sum(
+            path,
+            cube_keys(list(dimensions), bool(column_data)),
+            list(measures),
+            column_data[0] if column_data else None,
+        )
+        return cube if len(cube) <= CUBE_MAX_RATIO * cube[ROWS].sum() else None
+    # Each part is rolled up on its own, so a new part is the only one read.
+    cubes = [
+        _part_cube(part, tuple(stat), column_data, columns, dimensions, measures)
+        for part, *stat in fingerprint
+    ]
+    if not cubes or any(cube is None for cube in cubes):
+        return None
+    cube = combine_cubes(cubes, cube_keys(list(dimensions), bool(column_data)))
+    if len(cube) > CUBE_MAX_RATIO * cube[ROWS].sum():
+        return None
+    return cube
+
+
+def get_cube(path: str, column_data=False, pages: list = None):
+    """The cube of a dataset, built once per dataset version, or None."""
+    from utils import dataset_columns
+
+    if not CUBES_ENABLED:
+        return None
+    if pages is None:
+        from pages_data import load_pages
+
+        pages = load_pages()
+    dimensions, measures = cube_layout(pages, path, column_data)
+    if not dimensions or not measures:
+        return None
+    return _get_cube(
+        path,
+        dataset_fingerprint(path),
+        tuple(column_data or []),
+        dataset_columns(pages, path, column_data),
+        dimensions,
+        measures,
+    )
+
+
+def query_cube(
+    cube,
+    group_by: list,
+    measure: str,
+    years=None,
+    months=None,
+    dimensions=None,
+    with_count=False,
+):
+    """Group-by sum from the cube, or None when its grain cannot answer.
+
+    With `with_count` the result also carries the ROWS count of each group.
+    """
+    if cube is None or measure not in cube.columns:
+        return None
+    dimensions = dimensions or {}
+    needed = [*group_by, *dimensions]
+    if years is not None or months is not None:
+        needed.extend(PERIOD_COLUMNS)
+    if any(column not in cube.columns for column in needed):
+        return None
+    mask = pd.Series(True, index=cube.index)
+    if years is not None:
+        mask &= cube["Year"].isin(years)
+    if months is not None:
+        mask &= cube["Month_Display"].isin(months)
+    for dimension, values in dimensions.items():
+        mask &= cube[dimension].isin(values)
+    aggregations = {measure: "sum", ROWS: "sum"} if with_count else {measure: "sum"}
+    return cube[mask].groupby(group_by, observed=True).agg(aggregations).reset_index()
+
+
+def cube_values(cube, column: str, years=None, months=None, dimensions=None):
+    """Values of `column` in the cells the filters keep, in date order, or
+    None when the cube cannot list them; filter options come from here
+    instead of the raw rows."""
+    if cube is None or column not in cube.columns:
+        return None
+    dimensions = dimensions or {}
+    if any(dimension not in cube.columns for dimension in dimensions):
+        return None
+    dated = all(period in cube.columns for period in PERIOD_COLUMNS)
+    if (years is not None or months is not None) and not dated:
+        return None
+    mask = pd.Series(True, index=cube.index)
+    if years is not None:
+        mask &= cube["Year"].isin(years)
+    if months is not None:
+        mask &= cube["Month_Display"].isin(months)
+    for dimension, values in dimensions.items():
+        mask &= cube[dimension].isin(values)
+    cells = cube.loc[mask, list(dict.fromkeys([*(PERIOD_COLUMNS if dated else []), column]))]
+    if dated:
+        month_numbers = {name: number for number, name in enumerate(calendar.month_abbr)}
+        cells = cells.assign(
+            __month=cells["Month_Display"].astype(object).map(month_numbers)
+        ).sort_values(["Year", "__month"], kind="stable")
+    return cells[column].dropna().unique().tolist()
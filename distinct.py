@@ -0,0 +1,243 @@
+"""
+HyperLogLog sketches for distinct counts.
+
+Each value of a column is hashed to 64 bits; the first PRECISION bits pick
+one of 2**PRECISION registers and the register keeps the longest run of
+leading zeros seen in the other bits. Registers merge by taking their
+maximum, so, like the t-digests of `sketches`, they are built per cube cell
+(Year, Month and the chart dimensions) for each part, or each streamed
+batch, and a filter only merges the cells it keeps. The registers are kept
+in long form, one row per non-empty register, which stays small for the
+many cells with few distinct values.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import streamlit as st
+from catalog import dataset_fingerprint, dataset_parts, get_catalog_entry
+from cube import PERIOD_COLUMNS, cube_keys, cube_layout
+from sketches import MEASURE
+
+DISTINCT_ENABLED = True
+# 2**12 registers: about 1.6% standard error.
+PRECISION = 12
+# Register stores that are not at least this much smaller than the rows are dropped.
+REGISTERS_MAX_RATIO = 0.5
+REGISTER, RANK = "__register", "__rank"
+
+
+def hashes(column: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-null values of a column."""
+    column = column.dropna()
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        return pd.util.hash_array(column.cat.categories.to_numpy(dtype=object))[codes]
+    return pd.util.hash_array(column.to_numpy(dtype=object))
+
+
+def leading_zeros(values: np.ndarray) -> np.ndarray:
+    """Leading zero bits of non-zero uint64 values."""
+    zeros = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        short = values <= np.uint64(0xFFFFFFFFFFFFFFFF >> shift)
+        zeros += short * shift
+        values = np.where(short, values << np.uint64(shift), values)
+    return zeros
+
+
+def reduce_registers(registers: pd.DataFrame, keys: list) -> pd.DataFrame:
+    return (
+        registers.groupby([*keys, REGISTER], observed=True, dropna=False, sort=False)[RANK]
+        .max()
+        .reset_index()
+    )
+
+
+def register_rows(df: pd.DataFrame, keys: list, columns: list) -> pd.DataFrame:
+    """Registers of each of `columns` over the rows of `df`, per group of `keys`."""
+    frames = []
+    for column in columns:
+        values = hashes(df[column])
+        rest = (values << np.uint64(PRECISION)) | np.uint64(1 << (PRECISION - 1))
+        frame = df.loc[df[column].notna(), keys].reset_index(drop=True)
+        frame[MEASURE] = column
+        frame[REGISTER] = (values >> np.uint64(64 - PRECISION)).astype(np.int64)
+        frame[RANK] = (leading_zeros(rest) + 1).astype(np.int8)
+        frames.append(frame)
+    return merge_registers(frames, keys)
+
+
+def merge_registers(registers: list, keys: list) -> pd.DataFrame:
+    from load_profile import concat_frames
+
+    registers = [frame for frame in registers if frame is not None]
+    if not registers:
+        return None
+    return reduce_registers(concat_frames(registers), [MEASURE, *keys])
+
+
+def estimate(registers: pd.DataFrame, group_by: list) -> pd.DataFrame:
+    """Distinct count per group of `group_by` from its merged registers."""
+    size = 2**PRECISION
+    alpha = 0.7213 / (1 + 1.079 / size)
+    grouped = registers.assign(
+        __inverse=np.exp2(-registers[RANK].astype("float64"))
+    ).groupby(group_by, observed=True)
+    filled = grouped[RANK].size()
+    # Empty registers count as rank 0: 2**0 each.
+    harmonic = grouped["__inverse"].sum() + (size - filled)
+    raw = alpha * size**2 / harmonic
+    # Linear counting is more accurate while many registers are empty.
+    linear = size * np.log(size / (size - filled).clip(lower=1))
+    counts = np.where((raw <= 2.5 * size) & (filled < size), linear, raw)
+    return pd.DataFrame({"count": np.round(counts)}, index=filled.index).reset_index()
+
+
+def distinct_layout(pages: list, path: str, column_data=False) -> tuple:
+    """(dimensions, columns) of the charts that count distinct values of `path`."""
+    charts = [
+        chart
+        for page in pages
+        for chart in page.get("charts", [])
+        if chart.get("aggregation") == "distinct"
+    ]
+    return cube_layout([{"charts": charts}], path, column_data)
+
+
+@st.cache_data(show_spinner=False)
+def _part_registers(
+    part: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    columns: tuple,
+    dimensions: tuple,
+    measures: tuple,
+):
+    from utils import read_part
+
+    df = read_part(part, list(column_data), columns)
+    keys = cube_keys(list(dimensions), bool(column_data))
+    measures = [m for m in measures if m in df.columns]
+    if not measures or any(k not in df.columns for k in keys):
+        return None
+    return register_rows(df, keys, measures)
+
+
+def stream_registers(
+    path: str,
+    keys: list,
+    columns: list,
+    date_column: str = None,
+    years=None,
+    months=None,
+    days=None,
+    dimensions=None,
+):
+    """Registers of a dataset too large to load, merged batch by batch."""
+    import pyarrow.compute as pc
+    from streaming import (
+        DERIVED_COLUMNS,
+        MERGE_EVERY,
+        STREAM_BATCH_ROWS,
+        filter_expression,
+        month_numbers,
+        scan_columns,
+    )
+
+    dataset = ds.dataset(dataset_parts(path), format="parquet")
+    scanner = dataset.scanner(
+        columns=scan_columns(keys, columns, date_column, months),
+        filter=filter_expression(dataset.schema, date_column, years, days, dimensions),
+        batch_size=STREAM_BATCH_ROWS,
+    )
+    derived = [column for column in keys if column in DERIVED_COLUMNS]
+    months = month_numbers(months) if months is not None else None
+    partials = []
+    for batch in scanner.to_batches():
+        table = pa.Table.from_batches([batch])
+        if months is not None:
+            table = table.filter(pc.is_in(pc.month(table[date_column]), months))
+        for column in derived:
+            table = table.append_column(column, DERIVED_COLUMNS[column](table[date_column]))
+        partials.append(register_rows(table.to_pandas(), keys, columns))
+        if len(partials) >= MERGE_EVERY:
+            partials = [merge_registers(partials, keys)]
+    return merge_registers(partials, keys)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _get_registers(
+    path: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    columns: tuple,
+    dimensions: tuple,
+    measures: tuple,
+):
+    from streaming import uses_streaming
+
+    keys = cube_keys(list(dimensions), bool(column_data))
+    if uses_streaming(path):
+        registers = stream_registers(
+            path, keys, list(measures), column_data[0] if column_data else None
+        )
+    else:
+        # Each part has its own registers, so a new part is the only one read.
+        parts = [
+            _part_registers(part, tuple(stat), column_data, columns, dimensions, measures)
+            for part, *stat in fingerprint
+        ]
+        if any(frame is None for frame in parts):
+            return None
+        registers = merge_registers(parts, keys)
+    rows = get_catalog_entry(path)["num_rows"] * len(measures)
+    if registers is None or len(registers) > REGISTERS_MAX_RATIO * rows:
+        return None
+    return registers
+
+
+def get_registers(path: str, column_data=False, pages: list = None):
+    """The registers of a dataset per cube cell, built once per dataset
+    version, or None."""
+    from utils import dataset_columns
+
+    if not DISTINCT_ENABLED:
+        return None
+    if pages is None:
+        from pages_data import load_pages
+
+        pages = load_pages()
+    dimensions, measures = distinct_layout(pages, path, column_data)
+    if not dimensions or not measures:
+        return None
+    return _get_registers(
+        path,
+        dataset_fingerprint(path),
+        tuple(column_data or []),
+        dataset_columns(pages, path, column_data),
+        dimensions,
+        measures,
+    )
+
+
+def query_registers(registers, group_by: list, column: str, years=None, months=None, dimensions=None):
+    """Distinct counts of `column` per group of `group_by` over the cells the
+    filters keep, or None when the cells cannot answer."""
+    if registers is None:
+        return None
+    dimensions = dimensions or {}
+    needed = [*group_by, *dimensions]
+    if years is not None or months is not None:
+        needed.extend(PERIOD_COLUMNS)
+    if any(c not in registers.columns for c in needed):
+        return None
+    mask = registers[MEASURE] == column
+    if years is not None:
+        mask &= registers["Year"].isin(years)
+    if months is not None:
+        mask &= registers["Month_Display"].isin(months)
+    for dimension, values in dimensions.items():
+        mask &= registers[dimension].isin(values)
+    return estimate(reduce_registers(registers[mask], group_by), group_by)
@@ -0,0 +1,64 @@
+"""
+Year -> Month -> Day drill-down for the Drill-down Chart.
+
+The filtered rows are summed once per day (the daily sums `resample` caches)
+and rolled up into a time hierarchy: a sum per year, per year and month, and
+per day, built once per dataset version, measure and filter state. Clicking a
+bar drills into its children and the breadcrumb drills back up; each step
+reads one level of the hierarchy, so neither direction goes back to the rows.
+"""
+
+import calendar
+import pandas as pd
+import streamlit as st
+from catalog import dataset_fingerprint
+from resample import _daily
+
+DRILL_CHARTS = ("Drill-down Chart",)
+LEVELS = ("Year", "Month", "Day")
+
+
+def time_hierarchy(daily: pd.Series) -> dict:
+    """Sums per "Year", per (year, month) "Month" and per "Day" of `daily`."""
+    years, months = daily.index.year, daily.index.month
+    return {
+        "Year": daily.groupby(years).sum(),
+        "Month": daily.groupby([years, months]).sum(),
+        "Day": daily,
+    }
+
+
+def drill_level(hierarchy: dict, path: list) -> pd.DataFrame:
+    """The bars below `path` ([], [year] or [year, month]): their "label",
+    the "key" that drills into them and their "value"."""
+    if not path:
+        sums = hierarchy["Year"]
+        labels = sums.index.astype(str)
+    elif len(path) == 1:
+        months = hierarchy["Month"]
+        sums = months.loc[path[0]] if path[0] in months.index.levels[0] else months.iloc[:0]
+        labels = [calendar.month_abbr[month] for month in sums.index]
+    else:
+        start = pd.Timestamp(year=path[0], month=path[1], day=1)
+        # The daily index is sorted, so the month is a binary-searched slice.
+        sums = hierarchy["Day"].loc[start : start + pd.offsets.MonthEnd(0)]
+        labels = sums.index.strftime("%d %b")
+    return pd.DataFrame(
+        {"label": list(labels), "key": sums.index.to_list(), "value": sums.to_numpy()}
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _hierarchy(path: str, fingerprint: tuple, date_column: str, measure: str, filters: dict, _df):
+    return time_hierarchy(_daily(path, fingerprint, date_column, measure, filters, _df))
+
+
+def chart_drill(chart: dict, df: pd.DataFrame, measure: str, filters: dict, path: list):
+    """(level, bars) of the filtered `df` of a chart below the drill `path`.
+    `filters` (as `chart_filters` gives them) keys the cache in place of the
+    rows."""
+    file_path, date_column = chart["file_path"], chart["date_column"][0]
+    hierarchy = _hierarchy(
+        file_path, dataset_fingerprint(file_path), date_column, measure, filters, df
+    )
+    return LEVELS[len(path)], drill_level(hierarchy, path)
@@ -10,7 +10,22 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import create_choropleth_map, create_variance_comparison_bar_chart
+from binning import bin_edges, histogram_of
+from drilldown import drill_level, time_hierarchy
+from resample import resample
+from rollup import rollup
+from sketches import sketch_rows, summaries
+from utils import (
+    create_bar_chart_with_infinite_bars,
+    create_box_plot,
+    create_choropleth_map,
+    create_density_contour,
+    create_histogram,
+    create_line_chart_with_infinite_lines,
+    create_rollup_chart,
+    create_variance_comparison_bar_chart,
+    create_violin_plot,
+)
 
 
 class Examples:
@@ -59,11 +74,22 @@ class Examples:
         st.plotly_chart(fig)
 
     def histogram(self):
-        fig = px.histogram(self.df, x="A", title="Histogram", labels={"A": "Values"})
+        entry = {"columns": {}}
+        bins = histogram_of(
+            self.df, {"x": "A", "x_edges": bin_edges(entry, "A", 20, self.df["A"].to_numpy())}
+        )
+        fig = create_histogram(bins, "Values")
+        fig.update_layout(title="Histogram")
         st.plotly_chart(fig)
 
     def box_plot(self):
-        fig = px.box(self.df, title="Box Plot")
+        columns = self.df.melt(var_name="Column", value_name="Value")
+        fig = create_box_plot(
+            summaries(sketch_rows(columns, ["Column"], ["Value"]), "Column"),
+            "Column",
+            "Value",
+        )
+        fig.update_layout(title="Box Plot")
         st.plotly_chart(fig)
 
     def heatmap(self):
@@ -78,7 +104,14 @@ class Examples:
         st.plotly_chart(fig)
 
     def area_chart(self):
-        fig = px.area(self.df, title="Area Chart")
+        days = pd.date_range("2024-01-01", periods=len(self.df), freq="D")
+        series = resample(pd.Series(self.df["A"].to_numpy(), index=days), "Week")
+        fig = create_line_chart_with_infinite_lines(
+            data={"lines": [{"x": series.index, "y": series.to_numpy(), "fill": "tozeroy"}]},
+            xaxis_title="Week",
+            yaxis_title="Value",
+        )
+        fig.update_layout(title="Area Chart")
         st.plotly_chart(fig)
 
     def choropleth_map(self):
@@ -152,11 +185,30 @@ class Examples:
         st.plotly_chart(fig)
 
     def violin_plot(self):
-        fig = px.violin(self.df, y="A", title="Violin Plot")
+        columns = self.df[["A"]].melt(var_name="Column", value_name="Value")
+        fig = create_violin_plot(
+            summaries(
+                sketch_rows(columns, ["Column"], ["Value"]), "Column", with_density=True
+            ),
+            "Column",
+            "Value",
+        )
+        fig.update_layout(title="Violin Plot")
         st.plotly_chart(fig)
 
     def density_contour(self):
-        fig = px.density_contour(self.df, x="A", y="B", title="Density Contour")
+        entry = {"columns": {}}
+        bins = histogram_of(
+            self.df,
+            {
+                "x": "A",
+                "y": "B",
+                "x_edges": bin_edges(entry, "A", 10, self.df["A"].to_numpy()),
+                "y_edges": bin_edges(entry, "B", 10, self.df["B"].to_numpy()),
+            },
+        )
+        fig = create_density_contour(bins, "A", "B")
+        fig.update_layout(title="Density Contour")
         st.plotly_chart(fig)
 
     def line_area_combined(self):
@@ -179,13 +231,28 @@ class Examples:
         st.plotly_chart(fig)
 
     def treemap(self):
-        fig = px.treemap(
-            self.category_df, path=["Category"], values="Values", title="Treemap"
+        fig = create_rollup_chart(
+            rollup(self.category_df, ["Category"], "Values"), "Treemap"
         )
+        fig.update_layout(title="Treemap")
         st.plotly_chart(fig)
 
     def sunburst(self):
-        fig = px.sunburst(
-            self.category_df, path=["Category"], values="Values", title="Sunburst Chart"
+        fig = create_rollup_chart(
+            rollup(self.category_df, ["Category"], "Values"), "Sunburst Chart"
+        )
+        fig.update_layout(title="Sunburst Chart")
+        st.plotly_chart(fig)
+
+    def drilldown_chart(self):
+        days = pd.date_range("2022-01-01", periods=len(self.df) * 10, freq="D")
+        daily = pd.Series(np.tile(self.df["A"].abs().to_numpy(), 10), index=days)
+        bars = drill_level(time_hierarchy(daily), [2023])
+        fig = create_bar_chart_with_infinite_bars(
+            data={"bars": [{"x": bars["label"], "y": bars["value"]}]},
+            xaxis_title="Month",
+            yaxis_title="Value",
+            orientation="v",
         )
+        fig.update_layout(title="Drill-down Chart")
         st.plotly_chart(fig)
@@ -0,0 +1,82 @@
+"""
+Incremental re-aggregation for single filter value toggles.
+
+Sums are decomposable: when one value is added to or removed from a
+dimension filter, the new aggregate is the previous one plus or minus the
+partial sums of that value, read from the dataset cube.
+"""
+
+import pandas as pd
+from cube import ROWS, query_cube
+
+
+def toggled_value(previous: dict, current: dict):
+    """(dimension, value, +1/-1) when exactly one filter value changed, else None."""
+    if {k: v for k, v in previous.items() if k != "dimensions"} != {
+        k: v for k, v in current.items() if k != "dimensions"
+    }:
+        return None
+    previous_dimensions = previous.get("dimensions", {})
+    dimensions = current.get("dimensions", {})
+    if previous_dimensions.keys() != dimensions.keys():
+        return None
+    changed = [
+        d for d in dimensions if set(dimensions[d]) != set(previous_dimensions[d])
+    ]
+    if len(changed) != 1:
+        return None
+    dimension = changed[0]
+    added = set(dimensions[dimension]) - set(previous_dimensions[dimension])
+    removed = set(previous_dimensions[dimension]) - set(dimensions[dimension])
+    if len(added) + len(removed) != 1:
+        return None
+    if added:
+        return dimension, next(iter(added)), 1
+    return dimension, next(iter(removed)), -1
+
+
+def apply_partial(
+    previous: pd.DataFrame, partial: pd.DataFrame, group_by: list, measure: str, sign: int
+) -> pd.DataFrame:
+    """Add (sign=1) or subtract (sign=-1) partial sums; groups left without
+    rows disappear, exactly as they would from a full recomputation."""
+    partial = partial.assign(
+        **{measure: partial[measure] * sign, ROWS: partial[ROWS] * sign}
+    )
+    combined = pd.concat([previous, partial], ignore_index=True)
+    result = (
+        combined.groupby(group_by, observed=True)
+        .agg({measure: "sum", ROWS: "sum"})
+        .reset_index()
+    )
+    return result[result[ROWS] > 0].reset_index(drop=True)
+
+
+def incremental_sum(previous: dict, cube, group_by: list, measure: str, filters: dict):
+    """Update the previous aggregate of a chart for the current filters.
+
+    `previous` holds the "group_by", "measure", "filters" and "result" (with
+    ROWS counts) of the last evaluation. None means a full evaluation is needed.
+    """
+    if (
+        not previous
+        or previous["group_by"] != list(group_by)
+        or previous["measure"] != measure
+    ):
+        return None
+    toggle = toggled_value(previous["filters"], filters)
+    if toggle is None:
+        return None
+    dimension, value, sign = toggle
+    partial = query_cube(
+        cube,
+        group_by,
+        measure,
+        filters.get("years"),
+        filters.get("months"),
+        {**filters["dimensions"], dimension: [value]},
+        with_count=True,
+    )
+    if partial is None:
+        return None
+    return apply_partial(previous["result"], partial, group_by, measure, sign)
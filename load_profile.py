@@ -0,0 +1,151 @@
+"""
+Memory-optimized load profiles for the cached datasets.
+
+The profile selected by LOAD_PROFILE is applied to every part `read_part`
+caches: numeric columns are downcast where that is lossless (or within the
+profile's tolerance), repetitive strings become categoricals and the others
+Arrow-backed strings, days are stored as Arrow dates, and derived date
+columns nothing reads are dropped. Bytes saved are logged and kept per
+dataset in `SAVINGS`.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from streamlit.logger import get_logger
+
+LOAD_PROFILES = {
+    "default": {},
+    "memory": {
+        "downcast_integers": True,
+        # Floats holding only whole numbers are stored as integers.
+        "integral_floats": True,
+        # Relative error allowed to store floats as float32; None keeps float64.
+        "float_tolerance": None,
+        # Strings with at most this share of distinct values become categoricals.
+        "category_max_ratio": 0.5,
+        "strings": "string[pyarrow]",
+        "dates": "date32[pyarrow]",
+        # Derived date columns kept by create_year_and_month_week_and_day_columns.
+        "derived_columns": ["Year", "Month_Display", "Day"],
+    },
+}
+LOAD_PROFILE = "memory"
+DERIVED_COLUMNS = [
+    "Year",
+    "Month",
+    "Week",
+    "Day",
+    "Week_Display",
+    "Month_Display",
+    "Month_Year",
+    "Week_Year",
+]
+
+logger = get_logger(__name__)
+SAVINGS = {}  # dataset path -> {"before": bytes, "after": bytes}
+_savings_lock = threading.Lock()
+
+
+def downcast_numeric(column: pd.Series, profile: dict) -> pd.Series:
+    if pd.api.types.is_bool_dtype(column):
+        return column
+    if pd.api.types.is_float_dtype(column):
+        values = column.dropna()
+        if (
+            profile.get("integral_floats")
+            and not column.hasnans
+            and (values % 1 == 0).all()
+            and values.abs().max() < 2**53
+        ):
+            return pd.to_numeric(column.astype("int64"), downcast="integer")
+        tolerance = profile.get("float_tolerance")
+        if tolerance is not None and column.dtype == np.float64:
+            narrow = column.astype(np.float32)
+            if np.allclose(narrow, column, rtol=tolerance, atol=0, equal_nan=True):
+                return narrow
+        return column
+    if profile.get("downcast_integers") and pd.api.types.is_integer_dtype(column):
+        return pd.to_numeric(column, downcast="integer")
+    return column
+
+
+def compact_objects(column: pd.Series, profile: dict) -> pd.Series:
+    kind = pd.api.types.infer_dtype(column, skipna=True)
+    if kind == "date" and profile.get("dates"):
+        return column.astype(profile["dates"])
+    if kind != "string":
+        return column
+    ratio = profile.get("category_max_ratio")
+    if ratio is not None and column.nunique() <= ratio * len(column):
+        return column.astype("category")
+    if profile.get("strings"):
+        return column.astype(profile["strings"])
+    return column
+
+
+def apply_profile(df: pd.DataFrame, profile: str = None) -> pd.DataFrame:
+    """The frame with the columns of the load profile's dtypes."""
+    profile = LOAD_PROFILES[profile or LOAD_PROFILE]
+    if not profile:
+        return df
+    if profile.get("derived_columns") is not None:
+        df = df.drop(
+            columns=[
+                c
+                for c in DERIVED_COLUMNS
+                if c in df.columns and c not in profile["derived_columns"]
+            ]
+        )
+    columns = {}
+    for name, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_numeric_dtype(column):
+            columns[name] = downcast_numeric(column, profile)
+        elif column.dtype == object or pd.api.types.is_string_dtype(column):
+            columns[name] = compact_objects(column, profile)
+    return df.assign(**columns)
+
+
+def load_with_profile(path: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the load profile to a freshly read frame and record the saving."""
+    if not LOAD_PROFILES[LOAD_PROFILE]:
+        return df
+    before = int(df.memory_usage(deep=True).sum())
+    df = apply_profile(df)
+    after = int(df.memory_usage(deep=True).sum())
+    with _savings_lock:
+        SAVINGS[path] = {"before": before, "after": after}
+    logger.info(
+        "Load profile %r: %s from %.1f MiB to %.1f MiB (%.0f%% saved)",
+        LOAD_PROFILE,
+        path,
+        before / 1024**2,
+        after / 1024**2,
+        100 * (before - after) / before if before else 0,
+    )
+    return df
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    """Concatenate profiled parts, keeping the columns that are categorical
+    in every part categorical (plain concat would fall back to objects)."""
+    df = pd.concat(frames, ignore_index=True)
+    for name in frames[0].columns:
+        if all(isinstance(frame[name].dtype, pd.CategoricalDtype) for frame in frames):
+            if not isinstance(df[name].dtype, pd.CategoricalDtype):
+                df[name] = pd.api.types.union_categoricals(
+                    [frame[name] for frame in frames], ignore_order=True
+                )
+    return df
+
+
+def savings_report() -> pd.DataFrame:
+    """Bytes before and after the load profile, per dataset part read so far."""
+    with _savings_lock:
+        report = pd.DataFrame.from_dict(SAVINGS, orient="index")
+    if report.empty:
+        return report
+    report["saved"] = report["before"] - report["after"]
+    return report.sort_values("saved", ascending=False)
@@ -0,0 +1,253 @@
+"""
+Offline materialization of chart aggregates.
+
+Run from cron with `python materialize.py`. Every chart in the pages
+configuration gets Year x Month rollups of its groupings and measures, stored
+as small Parquet files next to the data. Only rollups whose source parts
+changed are recomputed, and rollups of append-only datasets are extended
+with the new parts alone. `render_form` consults the store before
+touching raw rows.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import streamlit as st
+from calculated import stored_measures
+from catalog import DATA_DIR, dataset_parts, part_fingerprint
+from models import join, read_columns
+
+AGGREGATES_DIR = os.path.join(DATA_DIR, ".aggregates")
+MANIFEST_FILE = os.path.join(AGGREGATES_DIR, "manifest.json")
+PERIOD_COLUMNS = ["Year", "Month_Display"]
+
+logger = logging.getLogger(__name__)
+
+
+def store_key(path: str, date_column, group_by) -> str:
+    key = json.dumps([path, list(date_column or []), list(group_by)])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def load_manifest() -> dict:
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    with open(MANIFEST_FILE, "r") as file:
+        return json.load(file)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _cached_manifest(mtime: int) -> dict:
+    return load_manifest()
+
+
+def cached_manifest() -> dict:
+    """The manifest, read again only when the file changes. Shared by the
+    sessions: read-only."""
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    return _cached_manifest(os.stat(MANIFEST_FILE).st_mtime_ns)
+
+
+def save_manifest(manifest: dict):
+    os.makedirs(AGGREGATES_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", dir=AGGREGATES_DIR, suffix=".tmp", delete=False
+    ) as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(file.name, MANIFEST_FILE)
+
+
+def chart_group_sets(chart: dict) -> list:
+    """Groupings worth materializing: the default one and, for bar charts,
+    every dimension the user can switch to."""
+    from utils import default_group_by
+
+    group_sets = []
+    if default_group_by(chart):
+        group_sets.append(tuple(default_group_by(chart)))
+    if chart.get("type") == "Bar Chart":
+        group_sets.extend((dimension,) for dimension in chart.get("dimension", []))
+    return list(dict.fromkeys(group_sets))
+
+
+def plan(pages: list) -> dict:
+    """Map (file_path, date_column) to {group_by: measures} for every chart."""
+    jobs = {}
+    for page in pages:
+        for chart in page.get("charts", []):
+            if not chart.get("file_path") or not chart.get("measure"):
+                continue
+            dataset = (chart["file_path"], tuple(chart.get("date_column") or []))
+            for group_by in chart_group_sets(chart):
+                jobs.setdefault(dataset, {}).setdefault(group_by, set()).update(
+                    stored_measures(chart)
+                )
+    return jobs
+
+
+def current_parts(path: str) -> dict:
+    return {part: list(part_fingerprint(part)) for part in dataset_parts(path)}
+
+
+def appended_parts(entry: dict, parts: dict, measures: set):
+    """Parts added since `entry` was built, or None when it must be rebuilt.
+
+    A rollup can be extended only if every part it was built from is still
+    there, unchanged, and it already covers the requested measures.
+    """
+    if entry is None or not measures <= set(entry["measures"]):
+        return None
+    if any(parts.get(part) != stat for part, stat in entry["parts"].items()):
+        return None
+    return [part for part in parts if part not in entry["parts"]]
+
+
+def materialize_file(path: str, date_column: tuple, group_sets: dict, previous: dict) -> dict:
+    """Compute and write the rollups of one dataset; runs in a worker process.
+
+    Rollups whose parts are unchanged are extended with the appended parts
+    only; the others are rebuilt from every part.
+    """
+    from utils import create_year_and_month_week_and_day_columns
+
+    parts = current_parts(path)
+    plans = {}
+    for group_by, measures in group_sets.items():
+        entry = previous.get(store_key(path, date_column, group_by))
+        new_parts = appended_parts(entry, parts, measures)
+        if new_parts is None:
+            plans[group_by] = (None, list(parts), measures)
+        else:
+            plans[group_by] = (entry, new_parts, set(entry["measures"]))
+
+    columns = {c for group_by, (_, _, measures) in plans.items() for c in (*group_by, *measures)}
+    frames = {}
+    for part in {part for _, part_list, _ in plans.values() for part in part_list}:
+        read, joins = read_columns(part, sorted(columns | set(date_column)))
+        frames[part] = join(pd.read_parquet(part, columns=list(read)), joins)
+        if date_column:
+            create_year_and_month_week_and_day_columns(frames[part], date_column[0])
+
+    entries = {}
+    for group_by, (entry, part_list, measures) in plans.items():
+        keys = [*PERIOD_COLUMNS, *group_by] if date_column else list(group_by)
+        rollups = [
+            frames[part].groupby(keys, dropna=False)[sorted(measures)].sum().reset_index()
+            for part in part_list
+        ]
+        if entry is not None:
+            rollups.insert(0, pd.read_parquet(os.path.join(AGGREGATES_DIR, entry["file"])))
+        if not rollups:
+            continue
+        rollup = (
+            pd.concat(rollups, ignore_index=True)
+            .groupby(keys, dropna=False)[sorted(measures)]
+            .sum()
+            .reset_index()
+        )
+        key = store_key(path, date_column, group_by)
+        file_name = f"{key}.parquet"
+        # Readers see either the old or the new rollup, never a partial one.
+        with tempfile.NamedTemporaryFile(
+            dir=AGGREGATES_DIR, prefix=f".{key}.", suffix=".tmp", delete=False
+        ) as file:
+            rollup.to_parquet(file, index=False)
+        os.replace(file.name, os.path.join(AGGREGATES_DIR, file_name))
+        entries[key] = {
+            "file_path": path,
+            "date_column": list(date_column),
+            "group_by": list(group_by),
+            "measures": sorted(measures),
+            "parts": parts,
+            "file": file_name,
+            "rows": len(rollup),
+        }
+    return entries
+
+
+def is_fresh(entry: dict, measures: set) -> bool:
+    return (
+        entry is not None
+        and entry.get("parts") == current_parts(entry["file_path"])
+        and measures <= set(entry["measures"])
+    )
+
+
+def run(pages: list = None, workers: int = None, force: bool = False) -> dict:
+    from pages_data import load_pages
+
+    pages = load_pages() if pages is None else pages
+    os.makedirs(AGGREGATES_DIR, exist_ok=True)
+    manifest = load_manifest()
+
+    stale = {}
+    for (path, date_column), group_sets in plan(pages).items():
+        for group_by, measures in group_sets.items():
+            entry = manifest.get(store_key(path, date_column, group_by))
+            if force or not is_fresh(entry, measures):
+                stale.setdefault((path, date_column), {})[group_by] = measures
+    logger.info("%d file(s) with stale aggregates", len(stale))
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                materialize_file, path, date_column, group_sets, {} if force else manifest
+            ): path
+            for (path, date_column), group_sets in stale.items()
+        }
+        for future in as_completed(futures):
+            try:
+                manifest.update(future.result())
+                logger.info("Materialized %s", futures[future])
+            except Exception:
+                logger.exception("Failed to materialize %s", futures[future])
+    save_manifest(manifest)
+    logger.info("Done in %.1fs", time.perf_counter() - started)
+    return manifest
+
+
+@st.cache_data(show_spinner=False)
+def _read_rollup(file_name: str, mtime: int) -> pd.DataFrame:
+    return pd.read_parquet(os.path.join(AGGREGATES_DIR, file_name))
+
+
+def lookup(chart: dict, group_by, measure: str, years=None, months=None):
+    """Answer a group-by sum from the store, or None when it cannot."""
+    date_column = chart.get("date_column") or []
+    entry = cached_manifest().get(store_key(chart["file_path"], date_column, group_by))
+    if not is_fresh(entry, {measure}):
+        return None
+    if (years is not None or months is not None) and not date_column:
+        return None
+    path = os.path.join(AGGREGATES_DIR, entry["file"])
+    if not os.path.exists(path):
+        return None
+    rollup = _read_rollup(entry["file"], os.stat(path).st_mtime_ns)
+    if years is not None:
+        rollup = rollup[rollup["Year"].isin(years)]
+    if months is not None:
+        rollup = rollup[rollup["Month_Display"].isin(months)]
+    return rollup.groupby(list(group_by)).agg({measure: "sum"}).reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize chart aggregates.")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size")
+    parser.add_argument(
+        "--force", action="store_true", help="Recompute even unchanged files"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    run(workers=args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
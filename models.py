@@ -0,0 +1,170 @@
+"""
+Relationships between datasets: fact tables that look up dimension tables.
+
+MODELS_FILE lists relationships such as
+
+    {"fact": "./database/Sales_Invoice.parquet", "key": "Customer",
+     "dimension": "./database/Customers.parquet", "dimension_key": "Customer"}
+
+The dimension columns of a dimension table then belong to the fact dataset as
+well: the setup wizard offers them and charts group and filter by them like
+the fact's own columns, without copying them into every fact file. They are
+joined lazily, part by part as the fact is read, and only the ones the charts
+on the dataset use. A dimension table's keys are indexed once per version (a
+pandas Index, whose hash table is built on its first lookup and kept with
+it), so each fact part resolves its keys in one vectorized lookup, and the
+joined parts are cached like plain ones: a fact part's fingerprint includes
+the versions of the tables joined to it.
+
+Datasets too large to load are scanned, not read part by part, and are not
+joined.
+"""
+
+import json
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
+from catalog import PARTS_SUFFIX, dataset_parts
+
+MODELS_FILE = "models.json"  # Relationships between the datasets
+
+
+@st.cache_data(show_spinner=False)
+def _load_relationships(mtime: int) -> list:
+    with open(MODELS_FILE, "r") as file:
+        return json.load(file)
+
+
+def load_relationships() -> list:
+    if not os.path.exists(MODELS_FILE):
+        return []
+    return _load_relationships(os.stat(MODELS_FILE).st_mtime_ns)
+
+
+def _holds(fact: str, part: str) -> bool:
+    """Whether `part` is one of the parts of the fact dataset `fact`."""
+    fact, part = os.path.normpath(fact), os.path.normpath(part)
+    return (
+        part == fact
+        or part.startswith(fact + os.sep)
+        or part.startswith(os.path.splitext(fact)[0] + PARTS_SUFFIX + os.sep)
+    )
+
+
+def relationships_of(path: str) -> list:
+    return [
+        relationship
+        for relationship in load_relationships()
+        if os.path.normpath(relationship["fact"]) == os.path.normpath(path)
+    ]
+
+
+def part_relationships(part: str) -> list:
+    return [
+        relationship
+        for relationship in load_relationships()
+        if _holds(relationship["fact"], part)
+    ]
+
+
+def dimension_versions(part: str) -> tuple:
+    """(mtime, size) of every part of the dimension tables joined to a fact
+    part, flattened."""
+    versions = []
+    for relationship in part_relationships(part):
+        for dimension_part in dataset_parts(relationship["dimension"]):
+            stat = os.stat(dimension_part)
+            versions.extend((stat.st_mtime_ns, stat.st_size))
+    return tuple(versions)
+
+
+def joined_columns(path: str) -> dict:
+    """Dimension columns that relationships add to the dataset at `path`,
+    mapped to their relationship."""
+    from catalog import columns_of_kind, get_catalog_entry
+    from streaming import uses_streaming
+
+    relationships = relationships_of(path)
+    if not relationships or uses_streaming(path):
+        return {}
+    own = get_catalog_entry(path)["columns"]
+    columns = {}
+    for relationship in relationships:
+        entry = get_catalog_entry(relationship["dimension"])
+        for column in columns_of_kind(entry, "dimension"):
+            if column not in own and column != relationship["dimension_key"]:
+                columns.setdefault(column, relationship)
+    return columns
+
+
+def plan_join(relationships: list, own: list, columns) -> tuple:
+    """(columns to read from the fact, [(relationship, joined columns)]) for
+    `columns` of a fact whose own columns are `own`."""
+    if not columns or not relationships:
+        return columns, []
+    missing = [column for column in columns if column not in own]
+    joins, keys = [], []
+    for relationship in relationships:
+        dimension_columns = pq.read_schema(dataset_parts(relationship["dimension"])[0]).names
+        joined = [column for column in missing if column in dimension_columns]
+        if joined:
+            joins.append((relationship, joined))
+            keys.append(relationship["key"])
+            missing = [column for column in missing if column not in joined]
+    joined = {column for _, names in joins for column in names}
+    read = [column for column in columns if column not in joined]
+    return tuple(dict.fromkeys([*read, *keys])), joins
+
+
+def read_columns(part: str, columns) -> tuple:
+    """`plan_join` for one part of a fact."""
+    relationships = part_relationships(part)
+    if not columns or not relationships:
+        return columns, []
+    return plan_join(relationships, pq.read_schema(part).names, columns)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _key_index(dimension: str, fingerprint: tuple, key: str):
+    """The unique keys of a dimension table and the row of each."""
+    keys = pd.concat(
+        [pd.read_parquet(part, columns=[key])[key] for part in dataset_parts(dimension)],
+        ignore_index=True,
+    )
+    # A key listed twice resolves to its first row.
+    first = ~keys.duplicated()
+    return pd.Index(keys[first]), first.to_numpy().nonzero()[0]
+
+
+@st.cache_resource(show_spinner=False, max_entries=128)
+def _dimension_column(dimension: str, fingerprint: tuple, key: str, column: str):
+    """A column of a dimension table, one value per unique key."""
+    _, rows = _key_index(dimension, fingerprint, key)
+    values = pd.concat(
+        [pd.read_parquet(part, columns=[column])[column] for part in dataset_parts(dimension)],
+        ignore_index=True,
+    )
+    return values.array.take(rows)
+
+
+def join(df: pd.DataFrame, joins: list, columns=None) -> pd.DataFrame:
+    """`df` with the joined columns of `joins` (as `plan_join` gives them)
+    looked up through the dimension keys; keys without a match give missing
+    values. Key columns read only for the join are dropped unless in
+    `columns`."""
+    from catalog import dataset_fingerprint
+
+    keys = set()
+    for relationship, joined in joins:
+        dimension, key = relationship["dimension"], relationship["dimension_key"]
+        fingerprint = dataset_fingerprint(dimension)
+        index, _ = _key_index(dimension, fingerprint, key)
+        positions = index.get_indexer(df[relationship["key"]])
+        for column in joined:
+            values = _dimension_column(dimension, fingerprint, key, column)
+            df[column] = values.take(positions, allow_fill=True)
+        keys.add(relationship["key"])
+    if columns is not None:
+        df = df.drop(columns=[key for key in keys if key not in columns])
+    return df
@@ -36,9 +36,13 @@ def create_page(pages):
             if any(p["title"] == new_page_name for p in pages):
                 st.error("Page with this name already exists.")
             else:
-                pages_data.add_page(
-                    {"title": new_page_name, "charts": [], "with_title": with_title}
-                )
+                try:
+                    pages_data.add_page(
+                        {"title": new_page_name, "charts": [], "with_title": with_title}
+                    )
+                except pages_data.PageConflictError as error:
+                    st.error(str(error))
+                    return
                 st.success(f"Page '{new_page_name}' created.")
                 time.sleep(2)
                 st.rerun()  # Refresh the UI
@@ -71,8 +75,7 @@ def delete_page(pages):
         confirm_delete = st.checkbox("Confirm delete")
         if st.button("Delete Page", use_container_width=True):
             if confirm_delete:
-                pages = [p for p in pages if p["title"] != page_name]
-                pages_data.save_pages(pages)
+                pages_data.remove_page(page_name)
                 st.success(f"Page '{page_name}' deleted.")
                 st.rerun()  # Refresh the UI
             else:
@@ -91,12 +94,13 @@ def rename_page(pages):
                 if any(p["title"] == new_page_name for p in pages):
                     st.error("Page with this name already exists.")
                 else:
-                    for page in pages:
-                        if page["title"] == page_name:
-                            page["title"] = new_page_name
-                            pages_data.save_pages(pages)
-                            st.success(f"Page renamed to '{new_page_name}'.")
-                            st.rerun()  # Refresh the UI
+                    try:
+                        pages_data.rename_page(page_name, new_page_name)
+                    except pages_data.PageConflictError as error:
+                        st.error(str(error))
+                        return
+                    st.success(f"Page renamed to '{new_page_name}'.")
+                    st.rerun()  # Refresh the UI
             else:
                 st.error("Please provide a new name.")
     else:
@@ -189,7 +193,7 @@ def portfolio_page():
             "Date Fields": 1,
         },  # Open, High, Low, Close
         "Violin Plot": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
-        "Density Contour": {"Dimensions": 2, "Measures": 0, "Date Fields": 0},
+        "Density Contour": {"Dimensions": 0, "Measures": 2, "Date Fields": 0},
         "Line and Area Combined Chart": {
             "Dimensions": 1,
             "Measures": 2,
@@ -199,6 +203,7 @@ def portfolio_page():
         "Stacked Bar Chart": {"Dimensions": 1, "Measures": 2, "Date Fields": 0},
         "Treemap": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
         "Sunburst Chart": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
+        "Drill-down Chart": {"Dimensions": 0, "Measures": 1, "Date Fields": 1},
     }
 
     # Helper function to render a single chart with an "Add" button
@@ -252,6 +257,7 @@ def portfolio_page():
         ("Stacked Bar Chart", examples.bar_stacked),
         ("Treemap", examples.treemap),
         ("Sunburst Chart", examples.sunburst),
+        ("Drill-down Chart", examples.drilldown_chart),
     ]
 
     # Iterate over chart functions and group them into rows of 3
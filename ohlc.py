@@ -0,0 +1,142 @@
+"""
+Open, high, low and close per period for the Candlestick chart.
+
+The rows are sorted once by (period, time) and cut where the period
+changes: the open is the first row of each run, the close the last, and the
+high and low are `reduceat` maxima and minima over the runs. Candles are
+themselves mergeable (a candle is a row whose open and close carry their
+own times), so daily candles are computed from the rows once per filter
+state, coarser grains are cut from those, and datasets too large to load
+are reduced batch by batch. When the range holds more than CANDLE_BUDGET
+periods of the selected grain, the chart moves to a coarser one.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import streamlit as st
+from catalog import dataset_fingerprint, dataset_parts
+from resample import GRAINS, choose_grain
+
+OHLC_CHARTS = ("Candlestick Chart",)
+CANDLE_BUDGET = 150
+CANDLE_COLUMNS = ["period", "open_time", "open", "high", "low", "close_time", "close"]
+
+
+def period_starts(times: np.ndarray, grain: str) -> np.ndarray:
+    if grain == "Day":
+        return times.astype("datetime64[D]").astype("datetime64[ns]")
+    index = pd.DatetimeIndex(times).to_period(GRAINS[grain]).start_time
+    return index.to_numpy(dtype="datetime64[ns]")
+
+
+def reduce_candles(candles: pd.DataFrame, periods: np.ndarray) -> pd.DataFrame:
+    """Merge `candles` (or rows, as one-row candles) into one per period."""
+    if candles.empty:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+    open_times = candles["open_time"].to_numpy()
+    close_times = candles["close_time"].to_numpy()
+    by_open = np.lexsort((open_times, periods))
+    sorted_periods = periods[by_open]
+    starts = np.flatnonzero(np.r_[True, sorted_periods[1:] != sorted_periods[:-1]])
+    ends = np.r_[starts[1:], len(by_open)] - 1
+    # The latest close of each period, from the same runs sorted by close time.
+    by_close = np.lexsort((close_times, periods))
+
+    def values(column, order):
+        return candles[column].to_numpy(dtype="float64", na_value=np.nan)[order]
+
+    return pd.DataFrame(
+        {
+            "period": sorted_periods[starts],
+            "open_time": open_times[by_open][starts],
+            "open": values("open", by_open)[starts],
+            "high": np.fmax.reduceat(values("high", by_open), starts),
+            "low": np.fmin.reduceat(values("low", by_open), starts),
+            "close_time": close_times[by_close][ends],
+            "close": values("close", by_close)[ends],
+        }
+    )
+
+
+def row_candles(df: pd.DataFrame, date_column: str, measures: list) -> pd.DataFrame:
+    """Daily candles of the rows of `df`; `measures` name the open, high,
+    low and close columns."""
+    times = pd.to_datetime(df[date_column]).to_numpy(dtype="datetime64[ns]")
+    dated = ~np.isnat(times)
+    rows = pd.DataFrame(
+        {
+            "open_time": times[dated],
+            "close_time": times[dated],
+            **{
+                name: df[measure].to_numpy()[dated]
+                for name, measure in zip(("open", "high", "low", "close"), measures)
+            },
+        }
+    )
+    return reduce_candles(rows, period_starts(times[dated], "Day"))
+
+
+def coarsen(candles: pd.DataFrame, grain: str) -> pd.DataFrame:
+    if grain == "Day" or candles.empty:
+        return candles
+    return reduce_candles(candles, period_starts(candles["period"].to_numpy(), grain))
+
+
+def stream_candles(path: str, date_column: str, measures: list, years=None, months=None, days=None, dimensions=None):
+    """Daily candles of a dataset too large to load, merged batch by batch."""
+    from streaming import MERGE_EVERY, STREAM_BATCH_ROWS, filter_expression, month_numbers
+
+    dataset = ds.dataset(dataset_parts(path), format="parquet")
+    scanner = dataset.scanner(
+        columns=list(dict.fromkeys([date_column, *measures])),
+        filter=filter_expression(dataset.schema, date_column, years, days, dimensions),
+        batch_size=STREAM_BATCH_ROWS,
+    )
+    months = month_numbers(months) if months is not None else None
+    partials = []
+    for batch in scanner.to_batches():
+        table = pa.Table.from_batches([batch])
+        if months is not None:
+            table = table.filter(pc.is_in(pc.month(table[date_column]), months))
+        partials.append(row_candles(table.to_pandas(), date_column, measures))
+        if len(partials) >= MERGE_EVERY:
+            merged = pd.concat(partials, ignore_index=True)
+            partials = [reduce_candles(merged, merged["period"].to_numpy())]
+    if not partials:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+    merged = pd.concat(partials, ignore_index=True)
+    return reduce_candles(merged, merged["period"].to_numpy())
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _candles(path: str, fingerprint: tuple, date_column: str, measures: list, filters: dict, grain: str, _df):
+    from streaming import uses_streaming
+
+    if grain != "Day":
+        daily = _candles(path, fingerprint, date_column, measures, filters, "Day", _df)
+        return coarsen(daily, grain)
+    if uses_streaming(path):
+        # The loaded frame holds sums per day, not the prices to chart.
+        return stream_candles(path, date_column, measures, **filters)
+    return row_candles(_df, date_column, measures)
+
+
+def chart_candles(chart: dict, df: pd.DataFrame, filters: dict, grain: str = None):
+    """(grain, candles) of the filtered `df` of a chart at `grain`, or at the
+    coarser grain its range needs to stay within CANDLE_BUDGET candles.
+    `filters` (as `chart_filters` gives them) keys the cache in place of
+    the rows."""
+    path, date_column = chart["file_path"], chart["date_column"][0]
+    fingerprint = dataset_fingerprint(path)
+    measures = chart["measure"][:4]
+    daily = _candles(path, fingerprint, date_column, measures, filters, "Day", df)
+    if len(daily):
+        grain = choose_grain(
+            daily["period"].min(), daily["period"].max(), CANDLE_BUDGET, grain or "Day"
+        )
+    else:
+        grain = grain or "Day"
+    return grain, _candles(path, fingerprint, date_column, measures, filters, grain, df)
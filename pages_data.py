@@ -1,7 +1,44 @@
 import json
 import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 PAGES_FILE = "pages.json"  # File to store pages data
+LOCK_FILE = f"{PAGES_FILE}.lock"  # Shared by every server process on the host
+
+
+class PageConflictError(Exception):
+    """Raised when a page was changed by someone else since it was loaded."""
+
+
+@contextmanager
+def file_lock(lock_file: str):
+    """Hold an exclusive, cross-process lock on `lock_file`."""
+    with open(lock_file, "a+") as lock:
+        if fcntl:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def pages_lock():
+    """Hold an exclusive, cross-process lock on the pages configuration."""
+    return file_lock(LOCK_FILE)
 
 
 def load_pages():
@@ -12,11 +49,62 @@ def load_pages():
 
 
 def save_pages(pages):
-    with open(PAGES_FILE, "w") as file:
+    """Write the pages atomically: readers see either the old or the new file."""
+    directory = os.path.dirname(os.path.abspath(PAGES_FILE))
+    with tempfile.NamedTemporaryFile(
+        "w", dir=directory, prefix=f".{PAGES_FILE}.", suffix=".tmp", delete=False
+    ) as file:
         json.dump(pages, file, indent=4)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(file.name, PAGES_FILE)
+
+
+def update_page(title, mutate, expected_version=None):
+    """Apply `mutate(page)` to the freshest copy of a page and save it.
+
+    When `expected_version` is given and the stored page has moved on since
+    the caller loaded it, PageConflictError is raised instead of overwriting
+    the other editor's changes.
+    """
+    with pages_lock():
+        pages = load_pages()
+        page = next((p for p in pages if p["title"] == title), None)
+        if page is None:
+            raise PageConflictError(f"Page '{title}' no longer exists.")
+        if expected_version is not None and page.get("version", 0) != expected_version:
+            raise PageConflictError(
+                f"Page '{title}' was changed by another editor. Reload and try again."
+            )
+        mutate(page)
+        page["version"] = page.get("version", 0) + 1
+        save_pages(pages)
+        return page
 
 
 def add_page(page):
-    pages = load_pages()
-    pages.append(page)
-    save_pages(pages)
+    with pages_lock():
+        pages = load_pages()
+        if any(p["title"] == page["title"] for p in pages):
+            raise PageConflictError(f"Page '{page['title']}' already exists.")
+        page.setdefault("version", 0)
+        pages.append(page)
+        save_pages(pages)
+
+
+def remove_page(title):
+    with pages_lock():
+        pages = load_pages()
+        save_pages([p for p in pages if p["title"] != title])
+
+
+def rename_page(title, new_title):
+    with pages_lock():
+        pages = load_pages()
+        if any(p["title"] == new_title for p in pages):
+            raise PageConflictError(f"Page '{new_title}' already exists.")
+        for page in pages:
+            if page["title"] == title:
+                page["title"] = new_title
+                page["version"] = page.get("version", 0) + 1
+        save_pages(pages)
@@ -0,0 +1,145 @@
+"""
+Process-pool map-reduce of streamed aggregations.
+
+Datasets listed in PARALLEL_FILE are split into tasks of a few Parquet row
+groups. Each worker memory-maps the part and scans only its own row groups,
+so no rows are pickled between processes; it reduces them with the
+streaming kernel and sends back its partial sums, which the caller merges.
+
+Operators enable it per dataset by mapping its path to a number of worker
+processes (null for one per core), for instance
+
+    {"./database/Sales_Invoice.parquet": 4}
+
+The file is read again whenever it changes; without it every dataset is
+scanned in-process.
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+import streamlit as st
+from catalog import dataset_parts
+from streaming import (
+    MERGE_EVERY,
+    STREAM_BATCH_ROWS,
+    filter_expression,
+    log_stats,
+    merge_partials,
+    reduce_batches,
+    result_frame,
+    scan_columns,
+)
+
+PARALLEL_FILE = "parallel.json"  # Dataset path -> worker processes
+ROW_GROUPS_PER_TASK = 1
+
+
+@st.cache_data(show_spinner=False)
+def _load_parallel_datasets(mtime: int) -> dict:
+    with open(PARALLEL_FILE, "r") as file:
+        return json.load(file)
+
+
+def parallel_datasets() -> dict:
+    if not os.path.exists(PARALLEL_FILE):
+        return {}
+    return _load_parallel_datasets(os.stat(PARALLEL_FILE).st_mtime_ns)
+
+
+def parallel_workers(path: str) -> int:
+    """Worker processes configured for a dataset, or 0 to scan in-process."""
+    for dataset, workers in parallel_datasets().items():
+        if os.path.normpath(dataset) == os.path.normpath(path):
+            return workers or os.cpu_count()
+    return 0
+
+
+def row_group_tasks(parts: list) -> list:
+    """(part, row groups) units of work, ROW_GROUPS_PER_TASK at a time."""
+    tasks = []
+    for part in parts:
+        num_row_groups = pq.ParquetFile(part).metadata.num_row_groups
+        for start in range(0, num_row_groups, ROW_GROUPS_PER_TASK):
+            end = min(start + ROW_GROUPS_PER_TASK, num_row_groups)
+            tasks.append((part, list(range(start, end))))
+    return tasks
+
+
+def _reduce_task(part, row_groups, group_by, measures, date_column, years, months, days, dimensions):
+    """Partial sums of some row groups of a part; runs in a worker process."""
+    fragment = ds.ParquetFileFormat().make_fragment(
+        part, filesystem=fs.LocalFileSystem(use_mmap=True), row_groups=row_groups
+    )
+    schema = fragment.physical_schema
+    scanner = fragment.scanner(
+        schema=schema,
+        columns=scan_columns(group_by, measures, date_column, months),
+        filter=filter_expression(schema, date_column, years, days, dimensions),
+        batch_size=STREAM_BATCH_ROWS,
+    )
+    return reduce_batches(scanner.to_batches(), group_by, measures, date_column, months)
+
+
+@st.cache_resource(show_spinner=False)
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # Forking a server process with live threads is unsafe; spawn fresh ones.
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def parallel_group_sum(
+    path: str,
+    group_by: list,
+    measures: list,
+    date_column: str = None,
+    years=None,
+    months=None,
+    days=None,
+    dimensions=None,
+    parts: list = None,
+    workers: int = None,
+):
+    """`stream_group_sum` spread over a process pool, one task per row group."""
+    started = time.perf_counter()
+    workers = workers or os.cpu_count()
+    tasks = row_group_tasks(dataset_parts(path) if parts is None else parts)
+    futures = [
+        _pool(workers).submit(
+            _reduce_task,
+            part,
+            row_groups,
+            group_by,
+            measures,
+            date_column,
+            years,
+            months,
+            days,
+            dimensions,
+        )
+        for part, row_groups in tasks
+    ]
+    partials, stats = [], {"rows": 0, "batches": 0, "peak_bytes": 0}
+    for future in futures:
+        table, task_stats = future.result()
+        if table is not None:
+            partials.append(table)
+        if len(partials) >= MERGE_EVERY:
+            partials = [merge_partials(partials, group_by, measures)]
+        stats["rows"] += task_stats["rows"]
+        stats["batches"] += task_stats["batches"]
+        # Workers run side by side, each with its own memory.
+        stats["peak_bytes"] = max(stats["peak_bytes"], task_stats["peak_bytes"])
+    table = merge_partials(partials, group_by, measures) if partials else None
+    result = result_frame(table, group_by, measures)
+    stats["groups"] = len(result)
+    stats["tasks"] = len(tasks)
+    stats["seconds"] = time.perf_counter() - started
+    log_stats(path, stats, f"Aggregated with {workers} processes")
+    return result, stats
@@ -0,0 +1,107 @@
+"""
+Startup prewarm of every dataset referenced by the pages configuration.
+
+Each distinct (file_path, date_column) pair is loaded once in a worker pool
+with the columns its charts need, and its cube is built, so the first visitor
+of a page hits a warm cache. Optionally the default-filter aggregate of every chart is computed too.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import streamlit as st
+from streamlit.logger import get_logger
+from pages_data import load_pages
+from calculated import stored_measures
+from cube import get_cube
+from sampling import exact_aggregate
+from utils import default_group_by, load_dataset
+
+PREWARM_WORKERS = 4
+PREWARM_AGGREGATES = True
+
+logger = get_logger(__name__)
+
+
+def dataset_keys(pages: list) -> list:
+    """Distinct (file_path, date_column) pairs used by the configured charts."""
+    keys = {
+        (chart["file_path"], tuple(chart.get("date_column") or []))
+        for page in pages
+        for chart in page.get("charts", [])
+        if chart.get("file_path")
+    }
+    return sorted(keys)
+
+
+def warm_dataset(path: str, column_data: list, pages: list):
+    load_dataset(path, column_data, pages)
+    get_cube(path, column_data, pages)
+
+
+def default_aggregates(pages: list) -> list:
+    """(file_path, date_column, group_by, measure) of each chart's first view."""
+    aggregates = set()
+    for page in pages:
+        for chart in page.get("charts", []):
+            group_by = default_group_by(chart)
+            if group_by and chart.get("measure") and chart.get("file_path"):
+                # A calculated measure is drawn from the sums of its columns.
+                first = stored_measures({**chart, "measure": chart["measure"][:1]})
+                aggregates.update(
+                    (
+                        chart["file_path"],
+                        tuple(chart.get("date_column") or []),
+                        tuple(group_by),
+                        measure,
+                    )
+                    for measure in first
+                )
+    return sorted(aggregates)
+
+
+def _run(pool, jobs: dict, label: str):
+    started = time.perf_counter()
+    futures = {pool.submit(function, *args): name for name, (function, args) in jobs.items()}
+    for done, future in enumerate(as_completed(futures), start=1):
+        try:
+            future.result()
+            logger.info("Prewarmed %s %s (%d/%d)", label, futures[future], done, len(futures))
+        except Exception:
+            logger.exception("Failed to prewarm %s %s", label, futures[future])
+    logger.info(
+        "Prewarmed %d %s in %.1fs", len(futures), label, time.perf_counter() - started
+    )
+
+
+def prewarm(pages: list = None, aggregates: bool = PREWARM_AGGREGATES, workers: int = PREWARM_WORKERS):
+    pages = load_pages() if pages is None else pages
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prewarm") as pool:
+        _run(
+            pool,
+            {
+                f"{path} {list(date_column)}": (warm_dataset, (path, list(date_column), pages))
+                for path, date_column in dataset_keys(pages)
+            },
+            "datasets",
+        )
+        if aggregates:
+            _run(
+                pool,
+                {
+                    f"{path} {list(group_by)} {measure}": (
+                        exact_aggregate,
+                        (path, list(date_column), list(group_by), measure),
+                    )
+                    for path, date_column, group_by, measure in default_aggregates(pages)
+                },
+                "aggregates",
+            )
+
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """Start the prewarm once per server process, in the background."""
+    thread = threading.Thread(target=prewarm, name="prewarm", daemon=True)
+    thread.start()
+    return thread
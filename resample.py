@@ -0,0 +1,75 @@
+"""
+Time-grain-aware resampling for the Line and Area charts.
+
+A chart with a date column is drawn over time: the filtered rows are summed
+once per day (the derived Day column), and the series is resampled from
+those daily sums to the finest grain of GRAINS that keeps it under
+TARGET_POINTS points for the range on screen. Daily sums and each grain's
+series are cached per filter state, so switching grains never goes back
+to the rows.
+"""
+
+import pandas as pd
+import streamlit as st
+from catalog import dataset_fingerprint
+from kernels import group_sum_of
+
+TIME_SERIES_CHARTS = ("Line Chart", "Area Chart")
+# Grain -> pandas period frequency, finest first.
+GRAINS = {"Day": "D", "Week": "W", "Month": "M", "Quarter": "Q"}
+TARGET_POINTS = 200
+
+
+def is_time_series(chart: dict) -> bool:
+    return chart.get("type") in TIME_SERIES_CHARTS and bool(chart.get("date_column"))
+
+
+def daily_sums(df: pd.DataFrame, measure: str) -> pd.Series:
+    """Sums of `measure` per day, indexed by the day's timestamp."""
+    sums = group_sum_of(df, "Day", measure)
+    series = pd.Series(
+        sums[measure].to_numpy(), index=pd.DatetimeIndex(pd.to_datetime(sums["Day"]))
+    )
+    return series.sort_index()
+
+
+def choose_grain(start, end, target: int = TARGET_POINTS, finest: str = "Day") -> str:
+    """The finest grain, down to `finest`, with at most `target` periods
+    from `start` to `end`."""
+    grains = list(GRAINS)
+    for grain in grains[grains.index(finest) :]:
+        if len(pd.period_range(start, end, freq=GRAINS[grain])) <= target:
+            return grain
+    return grain
+
+
+def resample(daily: pd.Series, grain: str) -> pd.Series:
+    """`daily` summed per period of `grain`, indexed by the period start."""
+    if grain == "Day" or daily.empty:
+        return daily
+    periods = daily.index.to_period(GRAINS[grain]).start_time
+    return daily.groupby(periods).sum()
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _daily(path: str, fingerprint: tuple, date_column: str, measure: str, filters: dict, _df):
+    return daily_sums(_df, measure)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _series(
+    path: str, fingerprint: tuple, date_column: str, measure: str, filters: dict, grain: str, _df
+):
+    return resample(_daily(path, fingerprint, date_column, measure, filters, _df), grain)
+
+
+def chart_series(chart: dict, df: pd.DataFrame, measure: str, filters: dict, grain: str = None):
+    """(grain, series) of `measure` over the filtered `df` of a chart, at
+    `grain` or the one `choose_grain` picks for its range. `filters` (as
+    `chart_filters` gives them) keys the cache in place of the rows."""
+    path, date_column = chart["file_path"], chart["date_column"][0]
+    fingerprint = dataset_fingerprint(path)
+    daily = _daily(path, fingerprint, date_column, measure, filters, df)
+    if grain is None:
+        grain = choose_grain(daily.index.min(), daily.index.max()) if len(daily) else "Day"
+    return grain, _series(path, fingerprint, date_column, measure, filters, grain, df)
@@ -0,0 +1,98 @@
+"""
+Hierarchical rollups for the Treemap and Sunburst charts.
+
+A chart's "hierarchy" lists its dimensions from the root down (say category,
+subcategory, SKU). `render_form` sums the measure by the whole hierarchy in
+one aggregation, through the same cube and caches as the other charts, and
+`rollup` derives every upper level from those leaf sums. Each level keeps
+the ROLLUP_TOP_N largest children of every node and folds the rest into an
+"Other" node, down to ROLLUP_MAX_DEPTH levels, so the figure holds at most a
+few hundred nodes whatever the cardinality. Nodes are cached per filter
+state.
+"""
+
+import pandas as pd
+import streamlit as st
+from catalog import dataset_fingerprint
+
+ROLLUP_CHARTS = ("Treemap", "Sunburst Chart")
+ROLLUP_MAX_DEPTH = 3
+# Children kept per node at each level; the others become one "Other" node.
+ROLLUP_TOP_N = 10
+OTHER = "Other"
+SEPARATOR = " / "
+
+
+def chart_hierarchy(chart: dict) -> list:
+    return list(chart.get("hierarchy") or [chart["main_dimension"]])
+
+
+def rollup(
+    leaves: pd.DataFrame,
+    hierarchy: list,
+    measure: str,
+    max_depth: int = ROLLUP_MAX_DEPTH,
+    top_n: int = ROLLUP_TOP_N,
+) -> dict:
+    """Nodes of every level of the hierarchy from the sums of its leaves:
+    "ids", "labels", "parents" and "values", parents summing their children."""
+    levels = hierarchy[:max_depth]
+    frame = leaves[levels].astype(str).astype(object)
+    frame[measure] = leaves[measure].to_numpy()
+    for depth, level in enumerate(levels):
+        keys = levels[: depth + 1]
+        totals = frame[frame[level].notna()].groupby(keys, sort=False)[measure].sum()
+        if depth:
+            ranks = totals.groupby(level=keys[:-1], sort=False).rank(
+                ascending=False, method="first"
+            )
+        else:
+            ranks = totals.rank(ascending=False, method="first")
+        ranks = frame.join(ranks.rename("__rank"), on=keys)["__rank"]
+        folded = (ranks > top_n).to_numpy()
+        frame.loc[folded, level] = OTHER
+        # The folded children's own descendants are not drawn.
+        frame.loc[folded, levels[depth + 1 :]] = None
+
+    nodes = {"ids": [], "labels": [], "parents": [], "values": []}
+    for depth in range(len(levels)):
+        keys = levels[: depth + 1]
+        sums = frame[frame[keys[-1]].notna()].groupby(keys, sort=False)[measure].sum()
+        paths = sums.index.to_flat_index() if depth else [(key,) for key in sums.index]
+        for path, value in zip(paths, sums.to_numpy()):
+            nodes["ids"].append(SEPARATOR.join(path))
+            nodes["labels"].append(path[-1])
+            nodes["parents"].append(SEPARATOR.join(path[:-1]))
+            nodes["values"].append(float(value))
+    return nodes
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _chart_rollup(
+    path: str,
+    fingerprint: tuple,
+    date_column: tuple,
+    hierarchy: list,
+    measure: str,
+    filters: dict,
+    max_depth: int,
+    top_n: int,
+    _leaves,
+):
+    return rollup(_leaves, hierarchy, measure, max_depth, top_n)
+
+
+def chart_rollup(chart: dict, leaves: pd.DataFrame, measure: str, filters: dict) -> dict:
+    """The nodes of a chart from the sums of `measure` by its hierarchy under
+    `filters` (as `chart_filters` gives them)."""
+    return _chart_rollup(
+        chart["file_path"],
+        dataset_fingerprint(chart["file_path"]),
+        tuple(chart.get("date_column") or []),
+        chart_hierarchy(chart),
+        measure,
+        filters,
+        chart.get("max_depth") or ROLLUP_MAX_DEPTH,
+        chart.get("top_n") or ROLLUP_TOP_N,
+        leaves,
+    )
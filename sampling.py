@@ -0,0 +1,117 @@
+"""
+Sample-based previews for the chart setup wizard and the edit dialog.
+
+Large files are previewed from a uniform reservoir sample; sums are scaled to
+the full row count and reported with a 95% error bound. The exact aggregate
+is computed once, in the background, when the chart is saved.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from catalog import dataset_fingerprint, dataset_parts
+from models import join, read_columns
+
+PREVIEW_SAMPLE_SIZE = 50_000
+Z_95 = 1.96
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="exact-aggregate")
+
+
+@st.cache_data(show_spinner=False)
+def _reservoir_sample(
+    path: str, fingerprint: tuple, columns: tuple, size: int, seed: int
+) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    reservoir, reservoir_keys = None, np.empty(0)
+    # Joined columns are looked up once the sample is drawn.
+    read, joins = read_columns(dataset_parts(path)[0], columns)
+    batches = (
+        batch
+        for part in dataset_parts(path)
+        for batch in pq.ParquetFile(part).iter_batches(
+            batch_size=65_536, columns=list(read)
+        )
+    )
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+        keys = np.concatenate([reservoir_keys, rng.random(len(table))])
+        if reservoir is not None:
+            table = pa.concat_tables([reservoir, table])
+        if len(table) > size:
+            keep = np.argpartition(keys, size)[:size]
+            table, keys = table.take(keep), keys[keep]
+        reservoir, reservoir_keys = table, keys
+    if reservoir is None:
+        return pd.DataFrame(columns=list(columns))
+    return join(reservoir.to_pandas(), joins, columns)
+
+
+def reservoir_sample(
+    path: str, columns: list, size: int = PREVIEW_SAMPLE_SIZE, seed: int = 0
+) -> pd.DataFrame:
+    """Uniform sample of `size` rows read batch by batch with bounded memory."""
+    return _reservoir_sample(
+        path, dataset_fingerprint(path), tuple(columns), size, seed
+    )
+
+
+def error_column(measure: str) -> str:
+    return f"{measure} ±"
+
+
+def preview_sum(
+    df: pd.DataFrame, dimensions: list, measure: str, population: int = None
+) -> pd.DataFrame:
+    """Group-by sum of `measure`, estimated from a sample when `population` is set.
+
+    Each group's total is the sample sum scaled by population / n; the error
+    column holds the half-width of its 95% confidence interval.
+    """
+    if population is None:
+        return df.groupby(dimensions, observed=True).agg({measure: "sum"}).reset_index()
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame(columns=[*dimensions, measure, error_column(measure)])
+    values = df[measure].astype("float64")
+    grouped = (
+        df.assign(_sum=values, _sum_of_squares=values**2)
+        .groupby(dimensions, observed=True)[["_sum", "_sum_of_squares"]]
+        .sum()
+    )
+    mean = grouped["_sum"] / n
+    variance = (grouped["_sum_of_squares"] / n - mean**2) * n / max(n - 1, 1)
+    correction = max(1 - n / population, 0)
+    result = pd.DataFrame(
+        {
+            measure: mean * population,
+            error_column(measure): Z_95
+            * population
+            * np.sqrt(variance.clip(lower=0) / n * correction),
+        }
+    )
+    return result.reset_index()
+
+
+@st.cache_data(show_spinner=False)
+def _exact_aggregate(
+    path: str, fingerprint: tuple, date_column, dimensions: tuple, measure: str
+) -> pd.DataFrame:
+    from utils import load_dataset
+
+    df = load_dataset(path, date_column)
+    return preview_sum(df, list(dimensions), measure)
+
+
+def exact_aggregate(path: str, date_column, dimensions: list, measure: str):
+    return _exact_aggregate(
+        path, dataset_fingerprint(path), list(date_column or []), tuple(dimensions), measure
+    )
+
+
+def schedule_exact_aggregate(path: str, date_column, dimensions: list, measure: str):
+    """Load the dataset and compute the exact aggregate off the request thread."""
+    return _executor.submit(exact_aggregate, path, date_column, dimensions, measure)
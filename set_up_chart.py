@@ -1,9 +1,7 @@
 import time
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import os
-import json
 from utils import (
     create_bar_chart_with_infinite_bars,
     render_markdown,
@@ -11,27 +9,53 @@ from utils import (
     create_pie_chart_with_infinite_slices,
     create_variance_comparison_bar_chart,
     create_year_and_month_week_and_day_columns,
+    create_box_plot,
+    create_candlestick_chart,
     create_choropleth_map,
+    create_density_contour,
+    create_heatmap,
+    create_histogram,
+    create_rollup_chart,
+    create_violin_plot,
+    read_parquet,
 )
+from aggregations import (
+    AGGREGATED_CHARTS,
+    AGGREGATIONS,
+    PERCENTILES,
+    aggregation_label,
+    preview_aggregate,
+)
+from binning import BINNED_CHARTS, binned_spec, heatmap_of, histogram_of
+from calculated import parse_expression, stored_measures
+from drilldown import DRILL_CHARTS, drill_level, time_hierarchy
+from models import joined_columns
+from ohlc import CANDLE_BUDGET, OHLC_CHARTS, coarsen, row_candles
+from resample import TIME_SERIES_CHARTS, choose_grain, daily_sums, resample
+from rollup import ROLLUP_CHARTS, rollup
+from sketches import SKETCHED_CHARTS, sketch_rows, summaries
 from components.positions_component.src.streamlit_component_x import position_selector
 from datetime import datetime
-
-# Path to the pages.json file
-PAGES_FILE = "pages.json"
-
-
-def load_pages():
-    """Load pages configuration from the JSON file."""
-    if os.path.exists(PAGES_FILE):
-        with open(PAGES_FILE, "r") as file:
-            return json.load(file)
-    return []
-
-
-def save_pages(pages):
-    """Save pages configuration to the JSON file."""
-    with open(PAGES_FILE, "w") as file:
-        json.dump(pages, file, indent=4)
+from catalog import (
+    DATA_DIR,
+    columns_of_kind,
+    get_catalog_entry,
+    list_datasets,
+    read_preview,
+)
+from sampling import (
+    PREVIEW_SAMPLE_SIZE,
+    error_column,
+    preview_sum,
+    reservoir_sample,
+    schedule_exact_aggregate,
+)
+from streaming import uses_streaming
+from pages_data import (
+    PageConflictError,
+    load_pages,
+    update_page,
+)
 
 
 def get_dynamic_page_layout():
@@ -81,10 +105,10 @@ def setup():
 
     # Step 1: Select the `.parquet` file
     st.subheader("Step 1: Select Data File")
-    data_dir = "./database"
+    data_dir = DATA_DIR
 
     try:
-        files = [f for f in os.listdir(data_dir) if f.endswith(".parquet")]
+        files = list_datasets(data_dir)
     except FileNotFoundError:
         st.error(f"The directory '{data_dir}' does not exist.")
         return
@@ -99,9 +123,10 @@ def setup():
         return
 
     file_path = os.path.join(data_dir, selected_file)
-    df = pd.read_parquet(file_path)
+    entry = get_catalog_entry(file_path)
     st.write("### Preview of Selected DataFrame")
-    st.dataframe(df.head(5))
+    st.caption(f"{entry['num_rows']:,} rows, {len(entry['columns'])} columns")
+    st.dataframe(read_preview(file_path))
 
     # Step 2: Select the page and container position
     st.subheader("Step 2: Select Page and Position")
@@ -142,26 +167,75 @@ def setup():
         "Choropleth Map": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
         "Slicer Chart": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
         "Line Chart": {"Dimensions": 1, "Measures": 1, "Date Fields": 1},
+        "Area Chart": {"Dimensions": 1, "Measures": 1, "Date Fields": 1},
         "Pie Chart": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
         "Scatter Plot": {"Dimensions": 1, "Measures": 2, "Date Fields": 0},
         "Histogram": {"Dimensions": 0, "Measures": 1, "Date Fields": 0},
+        "Heatmap": {"Dimensions": 2, "Measures": 1, "Date Fields": 0},
+        "Density Contour": {"Dimensions": 0, "Measures": 2, "Date Fields": 0},
+        "Box Plot": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
+        "Violin Plot": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
+        "Treemap": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
+        "Sunburst Chart": {"Dimensions": 1, "Measures": 1, "Date Fields": 0},
+        "Candlestick Chart": {"Dimensions": 1, "Measures": 4, "Date Fields": 1},
+        "Drill-down Chart": {"Dimensions": 0, "Measures": 1, "Date Fields": 1},
         "Variance Comparison": {"Dimensions": 1, "Measures": 1, "Date Fields": 1},
     }
 
     requirements = chart_requirements.get(st.session_state["chart_to_configure"], {})
-    available_dimensions = df.select_dtypes(
-        exclude=["number", "datetime"]
-    ).columns.tolist()
-    available_measures = df.select_dtypes(include=["number"]).columns.tolist()
-    available_date_fields = df.select_dtypes(include=["datetime"]).columns.tolist()
+    available_dimensions = [*columns_of_kind(entry, "dimension"), *joined_columns(file_path)]
+    available_measures = columns_of_kind(entry, "measure")
+    available_date_fields = columns_of_kind(entry, "date")
     dimension = None
-    if st.session_state["chart_to_configure"] != "Variance Comparison":
+    y_dimension = None
+    if (
+        st.session_state["chart_to_configure"] != "Variance Comparison"
+        and requirements.get("Dimensions", 1) > 0
+    ):
         dimension = st.selectbox("Select Dimension", available_dimensions)
+    if st.session_state["chart_to_configure"] == "Heatmap":
+        y_dimension = st.selectbox(
+            "Select Second Dimension", [d for d in available_dimensions if d != dimension]
+        )
+        if not y_dimension:
+            st.warning("This chart requires 2 dimensions.")
+            return
+    hierarchy = None
+    if st.session_state["chart_to_configure"] in ROLLUP_CHARTS:
+        hierarchy = [
+            dimension,
+            *st.multiselect(
+                "Select Hierarchy Levels",
+                [d for d in available_dimensions if d != dimension],
+                help="Dimensions below the selected one, from the top level down.",
+            ),
+        ]
     dimensions = st.multiselect("Select Filters", available_dimensions)
     display_filters = False
     if st.session_state.chart_to_configure == "Slicer Chart":    
         display_filters = st.checkbox("Display filters in table", key=f"Slicer tool", help="Use for display columns in table for each filter")
     measures = st.multiselect("Select Measures", available_measures)
+    calculated = {}
+    if st.session_state["chart_to_configure"] in AGGREGATED_CHARTS:
+        definitions = st.text_area(
+            "Calculated Measures",
+            placeholder="Margin % = (Sales - Cost) / Sales",
+            help="One `Name = expression` per line, with + - * / over the numeric "
+            "columns; write names with spaces in backticks. Ratios are computed "
+            "from the totals of their columns.",
+        )
+        for line in filter(str.strip, definitions.splitlines()):
+            name, _, expression = line.partition("=")
+            try:
+                parse_expression(expression.strip(), tuple(available_measures))
+            except ValueError as error:
+                st.error(f"{name.strip()}: {error}")
+                return
+            if not name.strip() or name.strip() in available_measures:
+                st.error(f"Choose a new name for `{expression.strip()}`.")
+                return
+            calculated[name.strip()] = expression.strip()
+        measures = [*measures, *calculated]
     date_fields = st.multiselect("Select Date Fields", available_date_fields)
 
     if len(measures) < requirements.get("Measures", 0):
@@ -177,6 +251,53 @@ def setup():
         return
 
     default_dynamic_measure = measures[0]
+    aggregation, exact = "sum", False
+    if st.session_state["chart_to_configure"] in AGGREGATED_CHARTS:
+        aggregation = st.selectbox(
+            "Select Aggregation", list(AGGREGATIONS), format_func=AGGREGATIONS.get
+        )
+        if aggregation == "distinct" or aggregation in PERCENTILES:
+            exact = st.checkbox(
+                "Exact",
+                help="Compute from the rows instead of the sketches kept per "
+                "month and dimension value. Slower on large datasets.",
+            )
+    if uses_streaming(file_path) and any(
+        aggregation != "sum" or not parse_expression(expression)["after_aggregation"]
+        for expression in calculated.values()
+    ):
+        st.error(
+            "This dataset is too large to load: calculated measures on it must be "
+            "sums of columns or ratios of them."
+        )
+        return
+
+    # Only the columns used by the preview are read from the file.
+    preview_columns = [
+        dimension,
+        y_dimension,
+        *(hierarchy or []),
+        *dimensions,
+        *stored_measures(
+            {"measure": measures[: requirements.get("Measures", 1)], "calculated": calculated}
+        ),
+        *date_fields[:1],
+    ]
+    preview_columns = [c for c in dict.fromkeys(preview_columns) if c]
+    fast_preview = st.toggle(
+        "Fast preview",
+        value=entry["num_rows"] > PREVIEW_SAMPLE_SIZE or uses_streaming(file_path),
+        disabled=uses_streaming(file_path),
+        help=f"Aggregate a random sample of {PREVIEW_SAMPLE_SIZE:,} rows. "
+        "Numbers are approximate, shown with their 95% error bounds.",
+    )
+    population = None
+    if fast_preview:
+        df = reservoir_sample(file_path, preview_columns)
+        population = entry["num_rows"]
+    else:
+        df = read_parquet(file_path, columns=tuple(preview_columns))
+    annotation = "Approximate preview (95% bounds)" if fast_preview else "Preview example"
 
     if st.session_state["chart_to_configure"] != "Variance Comparison":
         st.subheader("Step 4: Data Preview")
@@ -184,17 +305,70 @@ def setup():
     if st.session_state["chart_to_configure"] == "Slicer Chart":
         if dimension not in dimensions:
             dimensions.append(dimension)
-        df = df.groupby(dimensions).agg({measures[0]: "sum"}).reset_index()
+        df = preview_aggregate(
+            df, dimensions, measures[0], aggregation, population, calculated
+        )
+    elif st.session_state["chart_to_configure"] in BINNED_CHARTS:
+        chart = {
+            "type": st.session_state["chart_to_configure"],
+            "file_path": file_path,
+            "main_dimension": dimension,
+            "y_dimension": y_dimension,
+            "measure": measures,
+        }
+        spec = binned_spec(chart, measures[0], entry)
+        bins = (heatmap_of if chart["type"] == "Heatmap" else histogram_of)(df, spec)
+        if population:
+            bins["z"] = bins["z"] * population / max(len(df), 1)
+    elif st.session_state["chart_to_configure"] in SKETCHED_CHARTS:
+        box_summaries = summaries(
+            sketch_rows(df, [dimension], [measures[0]]),
+            dimension,
+            with_density=st.session_state["chart_to_configure"] == "Violin Plot",
+        )
+    elif st.session_state["chart_to_configure"] in ROLLUP_CHARTS:
+        nodes = rollup(
+            preview_sum(df, hierarchy, measures[0], population), hierarchy, measures[0]
+        )
+    elif st.session_state["chart_to_configure"] in OHLC_CHARTS:
+        candles = row_candles(df, date_fields[0], measures[:4])
+        grain = "Day"
+        if len(candles):
+            grain = choose_grain(
+                candles["period"].min(), candles["period"].max(), CANDLE_BUDGET
+            )
+        candles = coarsen(candles, grain)
+    elif st.session_state["chart_to_configure"] in DRILL_CHARTS:
+        create_year_and_month_week_and_day_columns(df, date_fields[0])
+        daily = daily_sums(df, measures[0])
+        if population:
+            daily = daily * population / max(len(df), 1)
+        bars = drill_level(time_hierarchy(daily), [])
+    elif st.session_state["chart_to_configure"] in TIME_SERIES_CHARTS:
+        create_year_and_month_week_and_day_columns(df, date_fields[0])
+        daily = daily_sums(df, measures[0])
+        if population:
+            daily = daily * population / max(len(df), 1)
+        grain = choose_grain(daily.index.min(), daily.index.max()) if len(daily) else "Day"
+        series = resample(daily, grain)
+        st.dataframe(
+            series.rename(measures[0]).rename_axis(grain).reset_index(),
+            use_container_width=True,
+            hide_index=True,
+        )
     elif st.session_state["chart_to_configure"] != "Variance Comparison":
         if dimension not in dimensions:
             dimensions.append(dimension)
-        df = df.groupby(dimension)[measures[0]].sum().reset_index()
+        df = preview_aggregate(
+            df, [dimension], measures[0], aggregation, population, calculated
+        )
         st.dataframe(df, use_container_width=True, hide_index=True)
     elif st.session_state["chart_to_configure"] == "Variance Comparison":
         create_year_and_month_week_and_day_columns(df, date_fields[0])
         this_year = df["Year"].max()
-        total_this_year = df[(df["Year"] == this_year)][measures[0]].sum()
-        total_last_year = df[(df["Year"] == this_year - 1)][measures[0]].sum()
+        totals = preview_sum(df, ["Year"], measures[0], population).set_index("Year")
+        total_this_year = totals[measures[0]].get(this_year, 0)
+        total_last_year = totals[measures[0]].get(this_year - 1, 0)
     # Step 6: Preview the chart
     invert = False
     st.subheader(
@@ -202,12 +376,17 @@ def setup():
         if st.session_state["chart_to_configure"] != "Variance Comparison"
         else "Step 4: Chart Preview"
     )
-    if (
-        st.session_state["chart_to_configure"] == "Line Chart"
-        or st.session_state["chart_to_configure"] == "Bar Chart"
-    ):
+    if st.session_state["chart_to_configure"] == "Bar Chart":
         invert = st.toggle("Invert chart")
-    if st.session_state["chart_to_configure"] != "Variance Comparison":
+    if st.session_state["chart_to_configure"] not in (
+        "Variance Comparison",
+        *BINNED_CHARTS,
+        *SKETCHED_CHARTS,
+        *ROLLUP_CHARTS,
+        *TIME_SERIES_CHARTS,
+        *OHLC_CHARTS,
+        *DRILL_CHARTS,
+    ):
         chart_data = {
             "x": df[dimension],
             "y": df[measures[0]],
@@ -218,8 +397,15 @@ def setup():
                 "x": df[measures[0]],
                 "y": df[dimension],
             }
+        if (
+            fast_preview
+            and error_column(measures[0]) in df.columns
+            and (not invert or st.session_state["chart_to_configure"] == "Bar Chart")
+        ):
+            chart_data["error"] = df[error_column(measures[0])]
 
     if st.session_state["chart_to_configure"] == "Bar Chart":
+        measure_title = aggregation_label({"aggregation": aggregation}, measures[0])
         fig = create_bar_chart_with_infinite_bars(
             data={
                 "bars": [
@@ -228,10 +414,10 @@ def setup():
                     },
                 ],
             },
-            xaxis_title=measures[0] if invert else dimension,
-            yaxis_title=dimension if invert else measures[0],
+            xaxis_title=measure_title if invert else dimension,
+            yaxis_title=dimension if invert else measure_title,
             orientation="h" if invert else "v",
-            text_anotation="Preview example",
+            text_anotation=annotation,
         )
         st.plotly_chart(fig)
     elif st.session_state["chart_to_configure"] == "Variance Comparison":
@@ -243,19 +429,33 @@ def setup():
             this_year=this_year,
             additional_info=None,
         )
+        if fast_preview:
+            fig.add_annotation(
+                text=annotation,
+                xref="paper",
+                yref="paper",
+                x=0.05,
+                y=1.15,
+                showarrow=False,
+                xanchor="left",
+            )
         st.plotly_chart(fig)
-    elif st.session_state["chart_to_configure"] == "Line Chart":
+    elif st.session_state["chart_to_configure"] in TIME_SERIES_CHARTS:
         fig = create_line_chart_with_infinite_lines(
             data={
                 "lines": [
                     {
-                        **chart_data,
+                        "x": series.index,
+                        "y": series.to_numpy(),
+                        "fill": "tozeroy"
+                        if st.session_state["chart_to_configure"] == "Area Chart"
+                        else None,
                     },
                 ],
             },
-            xaxis_title=dimension,
+            xaxis_title=f"{date_fields[0]} (by {grain.lower()})",
             yaxis_title=measures[0],
-            annotation="Preview example",
+            annotation=annotation,
         )
         st.plotly_chart(fig)
 
@@ -275,13 +475,55 @@ def setup():
                     },
                 ],
             },
-            annotation="Preview example",
+            annotation=annotation,
         )
         st.plotly_chart(fig)
     elif st.session_state["chart_to_configure"] == "Choropleth Map":
-        fig = create_choropleth_map(df, measures[0], dimension, chart_title)
+        fig = create_choropleth_map(
+            df, measures[0], dimension, annotation if fast_preview else chart_title
+        )
         st.plotly_chart(fig)
 
+    elif st.session_state["chart_to_configure"] == "Histogram":
+        st.plotly_chart(create_histogram(bins, measures[0], annotation))
+    elif st.session_state["chart_to_configure"] == "Heatmap":
+        st.plotly_chart(create_heatmap(bins, dimension, y_dimension, annotation))
+    elif st.session_state["chart_to_configure"] == "Density Contour":
+        st.plotly_chart(
+            create_density_contour(bins, measures[0], measures[1], annotation)
+        )
+    elif st.session_state["chart_to_configure"] == "Box Plot":
+        st.plotly_chart(
+            create_box_plot(box_summaries, dimension, measures[0], annotation)
+        )
+    elif st.session_state["chart_to_configure"] == "Violin Plot":
+        st.plotly_chart(
+            create_violin_plot(box_summaries, dimension, measures[0], annotation)
+        )
+    elif st.session_state["chart_to_configure"] in ROLLUP_CHARTS:
+        st.plotly_chart(
+            create_rollup_chart(nodes, st.session_state["chart_to_configure"], annotation)
+        )
+    elif st.session_state["chart_to_configure"] in DRILL_CHARTS:
+        st.plotly_chart(
+            create_bar_chart_with_infinite_bars(
+                data={"bars": [{"x": bars["label"], "y": bars["value"]}]},
+                xaxis_title="Year",
+                yaxis_title=measures[0],
+                orientation="v",
+                text_anotation=annotation,
+            )
+        )
+    elif st.session_state["chart_to_configure"] in OHLC_CHARTS:
+        st.plotly_chart(
+            create_candlestick_chart(
+                candles,
+                f"{date_fields[0]} (by {grain.lower()})",
+                ", ".join(measures[:4]),
+                annotation,
+            )
+        )
+
     else:
         st.info("No Preview Available")
     # Step 6: Save Chart Configuration
@@ -292,6 +534,8 @@ def setup():
             "type": st.session_state["chart_to_configure"],
             "dimension": dimensions,
             "main_dimension": dimension,
+            "y_dimension": y_dimension,
+            "hierarchy": hierarchy,
             "measure": measures,
             "date_column": date_fields,
             "filter_dimensions": dimensions,
@@ -301,19 +545,54 @@ def setup():
             "position": selected_position,
             "invert": invert,
             "display_filters": display_filters,
+            "aggregation": aggregation,
+            "exact": exact,
+            "calculated": calculated,
         }
         import uuid
 
-        for page in pages:
-            if page["title"] == selected_page:
-                if "charts" not in page:
-                    page["charts"] = []
-                chart_id = uuid.uuid4().hex
-                chart_config["chart_id"] = chart_id
-                page["charts"].append(chart_config)
-                break
-
-        save_pages(pages)
+        def add_chart(page):
+            # Appended to the freshest page, so other editors' changes stay;
+            # only a position they took in the meantime is a conflict.
+            if "charts" not in page:
+                page["charts"] = []
+            taken = {pos for chart in page["charts"] for pos in chart.get("position", [])}
+            if taken.intersection(selected_position):
+                raise PageConflictError(
+                    "The selected position was taken by another editor. Choose another one."
+                )
+            chart_config["chart_id"] = uuid.uuid4().hex
+            page["charts"].append(chart_config)
+
+        try:
+            update_page(selected_page, add_chart)
+        except PageConflictError as error:
+            st.error(str(error))
+            return
+        if (
+            aggregation == "sum"
+            and measures[0] not in calculated
+            and chart_config["type"]
+            not in (
+                *BINNED_CHARTS,
+                *SKETCHED_CHARTS,
+                *OHLC_CHARTS,
+                *TIME_SERIES_CHARTS,
+                *DRILL_CHARTS,
+            )
+        ):
+            schedule_exact_aggregate(
+                file_path,
+                date_fields,
+                ["Year"]
+                if chart_config["type"] == "Variance Comparison"
+                else dimensions
+                if chart_config["type"] == "Slicer Chart"
+                else hierarchy
+                if chart_config["type"] in ROLLUP_CHARTS
+                else [dimension],
+                measures[0],
+            )
         st.session_state["selected_chart_for_rendering"] = selected_page
         st.success(f"Chart '{chart_title}' has been configured and saved!")
         time.sleep(3)
@@ -0,0 +1,90 @@
+"""
+Datasets shared by every server process on the host.
+
+The first process to read a dataset part publishes the enriched, profiled
+frame as an uncompressed Arrow IPC file under SHARED_DIR (shared memory
+when the host has /dev/shm). Every process, including that one, memory-maps
+the file read-only and wraps its buffers without copying them, so the host
+holds one physical copy per part however many replicas it runs, and a new
+replica attaches instead of decoding Parquet again.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import pyarrow as pa
+import streamlit as st
+from streamlit.logger import get_logger
+from catalog import DATA_DIR
+from pages_data import file_lock
+
+SHARED_ENABLED = True
+SHARED_DIR = (
+    os.path.join("/dev/shm", "dashboard-datasets")
+    if os.path.isdir("/dev/shm")
+    else os.path.join(DATA_DIR, ".shared")
+)
+
+logger = get_logger(__name__)
+
+
+def shared_file(part: str, fingerprint: tuple, column_data, columns, profile: str) -> str:
+    """File of one version of a part read a given way: the path of the part,
+    then the date column and profile of the read, then the columns and the
+    version of the part, each hashed on its own."""
+    part_key = hashlib.sha1(os.path.abspath(part).encode()).hexdigest()[:16]
+    read_key = hashlib.sha1(json.dumps([column_data or [], profile]).encode()).hexdigest()[:8]
+    version = json.dumps([columns or [], list(fingerprint)])
+    version_key = hashlib.sha1(version.encode()).hexdigest()[:12]
+    return os.path.join(SHARED_DIR, f"{part_key}-{read_key}-{version_key}.arrow")
+
+
+def publish(path: str, table: pa.Table):
+    """Write `table` to `path` atomically, as a single uncompressed batch so
+    readers can map every column without copying it."""
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    table = table.combine_chunks()
+    with tempfile.NamedTemporaryFile(dir=SHARED_DIR, suffix=".tmp", delete=False) as file:
+        with pa.ipc.new_file(file, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(file.name, path)
+    # What it replaces goes: the file of an older version of the part, or of
+    # the columns the pages asked for before. Processes still mapping it
+    # keep their pages until they let go. Lock files stay: another process
+    # may hold one.
+    prefix = os.path.basename(path).rsplit("-", 1)[0]
+    for stale in glob.glob(os.path.join(SHARED_DIR, f"{prefix}-*.arrow")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:  # removed by another process
+                pass
+
+
+def attach(path: str):
+    """The frame published at `path`, backed by a read-only memory map."""
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _shared_part(part: str, fingerprint: tuple, column_data, columns: tuple, profile: str, _load):
+    path = shared_file(part, fingerprint, column_data, columns, profile)
+    if not os.path.exists(path):
+        os.makedirs(SHARED_DIR, exist_ok=True)
+        # One process loads and publishes; the others wait and attach.
+        with file_lock(f"{path}.lock"):
+            if not os.path.exists(path):
+                publish(path, pa.Table.from_pandas(_load(), preserve_index=False))
+                logger.info("Published %s to %s", part, path)
+    return attach(path)
+
+
+def shared_part(part: str, fingerprint: tuple, column_data, columns: tuple, profile: str, load):
+    """The frame of a part from the host-wide store, published by `load()`
+    on first use. Callers get their own view: adding or replacing columns
+    never touches the shared frame."""
+    frame = _shared_part(part, fingerprint, column_data, columns, profile, load)
+    return frame.copy(deep=False)
@@ -0,0 +1,341 @@
+"""
+Mergeable quantile sketches for the Box Plot and Violin Plot charts.
+
+A measure is summarized per cube cell (Year, Month and the chart dimensions)
+by a t-digest: a few dozen (mean, weight) centroids, small at the tails and
+large around the median. Digests merge by pooling their centroids and
+compressing them again, so each part (or, for streamed datasets, each batch
+of a row group) is sketched once and a filter change only merges the cells
+it keeps. Quantiles and the violin densities are computed from the merged
+centroids and only those summaries go to the browser.
+
+The digests are kept in long form, one row per centroid, so building and
+merging them for every cell is a handful of vectorized group-bys.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import streamlit as st
+from catalog import dataset_fingerprint, dataset_parts
+from cube import PERIOD_COLUMNS, cube_keys, cube_layout
+
+SKETCHES_ENABLED = True
+SKETCHED_CHARTS = ("Box Plot", "Violin Plot")
+# t-digest compression; a digest keeps at most about half as many centroids.
+COMPRESSION = 200
+# Sketches that are not at least this much smaller than the rows are dropped.
+SKETCH_MAX_RATIO = 0.5
+# Points of the density curve of each violin.
+VIOLIN_POINTS = 64
+MEASURE, MEAN, WEIGHT = "__measure", "__mean", "__weight"
+
+
+def compress(centroids: pd.DataFrame, keys: list, compression: int = COMPRESSION):
+    """Merge the centroids of each group of `keys` into one t-digest.
+
+    Centroids are ordered by mean within their group and cut where the
+    arcsine scale function of their quantile crosses an integer, so no
+    centroid spans more than one unit of it.
+    """
+    if centroids.empty:
+        return centroids[[*keys, MEAN, WEIGHT]]
+    centroids = centroids.sort_values([*keys, MEAN], kind="stable", ignore_index=True)
+    if keys:
+        groups = centroids.groupby(keys, observed=True, dropna=False, sort=False).ngroup()
+        groups = groups.to_numpy()
+    else:
+        groups = np.zeros(len(centroids), dtype=np.int64)
+    means = centroids[MEAN].to_numpy(dtype="float64")
+    weights = centroids[WEIGHT].to_numpy(dtype="float64")
+
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    cumulative = np.cumsum(weights)
+    before = np.repeat(cumulative[starts] - weights[starts], np.diff(np.r_[starts, len(groups)]))
+    totals = np.bincount(groups, weights=weights)[groups]
+    quantile = (cumulative - before - weights / 2) / totals
+    scale = np.floor(
+        compression / (2 * np.pi) * np.arcsin(np.clip(2 * quantile - 1, -1, 1))
+        + compression / 4
+    ).astype(np.int64)
+
+    cells = groups * (compression // 2 + 2) + scale
+    cells, first, inverse = np.unique(cells, return_index=True, return_inverse=True)
+    merged_weights = np.bincount(inverse, weights=weights)
+    merged = centroids.loc[first, keys].reset_index(drop=True)
+    merged[MEAN] = np.bincount(inverse, weights=weights * means) / merged_weights
+    merged[WEIGHT] = merged_weights
+    return merged
+
+
+def sketch_rows(df: pd.DataFrame, keys: list, measures: list) -> pd.DataFrame:
+    """Digests of each measure of the rows of `df`, per group of `keys`."""
+    frames = []
+    for measure in measures:
+        values = df[measure].to_numpy(dtype="float64", na_value=np.nan)
+        present = ~np.isnan(values)
+        frame = df.loc[present, keys].reset_index(drop=True)
+        frame[MEASURE] = measure
+        frame[MEAN] = values[present]
+        frame[WEIGHT] = 1.0
+        frames.append(frame)
+    return merge_sketches(frames, keys)
+
+
+def merge_sketches(sketches: list, keys: list) -> pd.DataFrame:
+    from load_profile import concat_frames
+
+    sketches = [sketch for sketch in sketches if sketch is not None]
+    if not sketches:
+        return None
+    return compress(concat_frames(sketches), [MEASURE, *keys])
+
+
+def sketch_layout(pages: list, path: str, column_data=False) -> tuple:
+    """(dimensions, measures) used by the sketched charts, and the charts
+    aggregating by a percentile, that read `path`."""
+    from aggregations import PERCENTILES
+
+    charts = [
+        chart
+        for page in pages
+        for chart in page.get("charts", [])
+        if chart.get("type") in SKETCHED_CHARTS
+        or chart.get("aggregation") in PERCENTILES
+    ]
+    return cube_layout([{"charts": charts}], path, column_data)
+
+
+@st.cache_data(show_spinner=False)
+def _part_sketches(
+    part: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    columns: tuple,
+    dimensions: tuple,
+    measures: tuple,
+):
+    from utils import read_part
+
+    df = read_part(part, list(column_data), columns)
+    keys = cube_keys(list(dimensions), bool(column_data))
+    measures = [m for m in measures if m in df.columns]
+    if not measures or any(k not in df.columns for k in keys):
+        return None
+    return sketch_rows(df, keys, measures)
+
+
+def stream_sketches(
+    path: str,
+    keys: list,
+    measures: list,
+    date_column: str = None,
+    years=None,
+    months=None,
+    days=None,
+    dimensions=None,
+):
+    """Digests of a dataset too large to load, one per batch and merged as
+    the scan goes; filters are pushed down to the scan."""
+    import pyarrow.compute as pc
+    from streaming import (
+        DERIVED_COLUMNS,
+        MERGE_EVERY,
+        STREAM_BATCH_ROWS,
+        filter_expression,
+        month_numbers,
+        scan_columns,
+    )
+
+    dataset = ds.dataset(dataset_parts(path), format="parquet")
+    scanner = dataset.scanner(
+        columns=scan_columns(keys, measures, date_column, months),
+        filter=filter_expression(dataset.schema, date_column, years, days, dimensions),
+        batch_size=STREAM_BATCH_ROWS,
+    )
+    derived = [column for column in keys if column in DERIVED_COLUMNS]
+    months = month_numbers(months) if months is not None else None
+    partials = []
+    for batch in scanner.to_batches():
+        table = pa.Table.from_batches([batch])
+        if months is not None:
+            table = table.filter(pc.is_in(pc.month(table[date_column]), months))
+        for column in derived:
+            table = table.append_column(column, DERIVED_COLUMNS[column](table[date_column]))
+        partials.append(sketch_rows(table.to_pandas(), keys, measures))
+        if len(partials) >= MERGE_EVERY:
+            partials = [merge_sketches(partials, keys)]
+    return merge_sketches(partials, keys)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _get_sketches(
+    path: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    columns: tuple,
+    dimensions: tuple,
+    measures: tuple,
+):
+    from streaming import uses_streaming
+
+    keys = cube_keys(list(dimensions), bool(column_data))
+    if uses_streaming(path):
+        sketches = stream_sketches(
+            path, keys, list(measures), column_data[0] if column_data else None
+        )
+    else:
+        # Each part is sketched on its own, so a new part is the only one read.
+        parts = [
+            _part_sketches(part, tuple(stat), column_data, columns, dimensions, measures)
+            for part, *stat in fingerprint
+        ]
+        if any(sketch is None for sketch in parts):
+            return None
+        sketches = merge_sketches(parts, keys)
+    if sketches is None or len(sketches) > SKETCH_MAX_RATIO * sketches[WEIGHT].sum():
+        return None
+    return sketches
+
+
+def get_sketches(path: str, column_data=False, pages: list = None):
+    """The digests of a dataset per cube cell, built once per dataset
+    version, or None."""
+    from utils import dataset_columns
+
+    if not SKETCHES_ENABLED:
+        return None
+    if pages is None:
+        from pages_data import load_pages
+
+        pages = load_pages()
+    dimensions, measures = sketch_layout(pages, path, column_data)
+    if not dimensions or not measures:
+        return None
+    return _get_sketches(
+        path,
+        dataset_fingerprint(path),
+        tuple(column_data or []),
+        dataset_columns(pages, path, column_data),
+        dimensions,
+        measures,
+    )
+
+
+def query_sketches(sketches, group_by: list, measure: str, years=None, months=None, dimensions=None):
+    """Digests of `measure` per group of `group_by` over the cells the
+    filters keep, or None when the cells cannot answer."""
+    if sketches is None:
+        return None
+    dimensions = dimensions or {}
+    needed = [*group_by, *dimensions]
+    if years is not None or months is not None:
+        needed.extend(PERIOD_COLUMNS)
+    if any(column not in sketches.columns for column in needed):
+        return None
+    mask = sketches[MEASURE] == measure
+    if years is not None:
+        mask &= sketches["Year"].isin(years)
+    if months is not None:
+        mask &= sketches["Month_Display"].isin(months)
+    for dimension, values in dimensions.items():
+        mask &= sketches[dimension].isin(values)
+    return compress(sketches[mask], [MEASURE, *group_by])
+
+
+def quantiles(means: np.ndarray, weights: np.ndarray, qs) -> np.ndarray:
+    cumulative = np.cumsum(weights) - weights / 2
+    return np.interp(np.asarray(qs) * weights.sum(), cumulative, means)
+
+
+def density(means: np.ndarray, weights: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Gaussian kernel density of the digest at `points`, with Silverman's
+    bandwidth."""
+    total = weights.sum()
+    mean = np.average(means, weights=weights)
+    spread = np.sqrt(np.average((means - mean) ** 2, weights=weights))
+    q1, q3 = quantiles(means, weights, [0.25, 0.75])
+    bandwidth = 0.9 * min(spread, (q3 - q1) / 1.34 or spread) * total ** -0.2
+    bandwidth = bandwidth or (abs(mean) or 1) * 1e-3
+    distance = (points[:, None] - means[None, :]) / bandwidth
+    kernel = np.exp(-0.5 * distance**2) / np.sqrt(2 * np.pi)
+    return kernel @ weights / (total * bandwidth)
+
+
+def summaries(digests: pd.DataFrame, group_by: str, with_density: bool = False) -> list:
+    """Box statistics of each group's digest: quartiles, whiskers at the
+    most extreme centroids inside the Tukey fences, mean and count, with its
+    density curve if asked."""
+    result = []
+    for label, digest in digests.groupby(group_by, observed=True, sort=True):
+        means = digest[MEAN].to_numpy()
+        weights = digest[WEIGHT].to_numpy()
+        q1, median, q3 = quantiles(means, weights, [0.25, 0.5, 0.75]).tolist()
+        low, high = float(means[0]), float(means[-1])
+        # Centroids at the tails hold one or a few values each, so their
+        # means stand in for the data points.
+        spread = 1.5 * (q3 - q1)
+        inside = means[(means >= q1 - spread) & (means <= q3 + spread)]
+        summary = {
+            "name": str(label),
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "lowerfence": min(float(inside.min()), q1) if inside.size else q1,
+            "upperfence": max(float(inside.max()), q3) if inside.size else q3,
+            "mean": float(np.average(means, weights=weights)),
+            "count": int(weights.sum()),
+        }
+        if with_density:
+            points = np.linspace(low, high, VIOLIN_POINTS)
+            summary["points"] = points.tolist()
+            summary["density"] = density(means, weights, points).tolist()
+        result.append(summary)
+    return result
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _chart_summaries(
+    path: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    group_by: str,
+    measure: str,
+    filters: dict,
+    with_density: bool,
+    _df,
+):
+    from streaming import uses_streaming
+
+    digests = None
+    if "days" not in filters:
+        digests = query_sketches(
+            get_sketches(path, list(column_data)), [group_by], measure, **filters
+        )
+    if digests is None and uses_streaming(path):
+        # The loaded frame holds sums per day, not the rows to sketch.
+        digests = stream_sketches(
+            path, [group_by], [measure], column_data[0] if column_data else None, **filters
+        )
+    elif digests is None:
+        digests = sketch_rows(_df, [group_by], [measure])
+    if digests is None:
+        return []
+    return summaries(digests, group_by, with_density)
+
+
+def chart_summaries(chart: dict, df: pd.DataFrame, measure: str, filters: dict) -> list:
+    """Box statistics of `measure` per main dimension value over the
+    filtered `df` of a chart, merged from the sketches of the cells its
+    `filters` (as `chart_filters` gives them) keep."""
+    return _chart_summaries(
+        chart["file_path"],
+        dataset_fingerprint(chart["file_path"]),
+        tuple(chart.get("date_column") or []),
+        chart["main_dimension"],
+        measure,
+        filters,
+        chart["type"] == "Violin Plot",
+        df,
+    )
@@ -0,0 +1,271 @@
+"""
+Out-of-core execution of filters and sum/count aggregations.
+
+Datasets too large to load are scanned batch by batch through a pyarrow
+dataset: date and dimension filters are pushed down to the scan (row groups
+outside them are skipped using their statistics), every batch is reduced to
+partial sums and row counts, and the partials are merged as the scan goes.
+Memory stays bounded by one batch plus the groups seen so far.
+"""
+
+import datetime
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import streamlit as st
+from streamlit.logger import get_logger
+from catalog import dataset_fingerprint, dataset_parts, get_catalog_entry
+
+STREAMING_ENABLED = True
+# Datasets whose uncompressed size exceeds this are never loaded whole.
+STREAMING_MIN_BYTES = 2 * 1024**3
+STREAM_BATCH_ROWS = 262_144
+# Partial aggregates are merged every this many batches.
+MERGE_EVERY = 16
+ROWS = "__rows"  # raw row count behind each group
+
+logger = get_logger(__name__)
+
+DERIVED_COLUMNS = {
+    "Year": lambda dates: pc.year(dates),
+    "Month": lambda dates: pc.month(dates),
+    "Month_Display": lambda dates: pc.strftime(dates, format="%b"),
+    "Day": lambda dates: dates.cast(pa.date32()),
+}
+
+
+def uses_streaming(path: str) -> bool:
+    from parallel import parallel_workers
+
+    return STREAMING_ENABLED and (
+        get_catalog_entry(path)["uncompressed_bytes"] > STREAMING_MIN_BYTES
+        or parallel_workers(path) > 1
+    )
+
+
+def _date_scalar(day: datetime.date, data_type: pa.DataType):
+    if pa.types.is_date(data_type):
+        return pa.scalar(day, data_type)
+    return pa.scalar(datetime.datetime.combine(day, datetime.time()), data_type)
+
+
+def _date_range(field, data_type, start: datetime.date, end: datetime.date):
+    """`start <= field < end` on a date or timestamp column."""
+    return (field >= _date_scalar(start, data_type)) & (
+        field < _date_scalar(end, data_type)
+    )
+
+
+def _all(conditions: list):
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _years_range(field, data_type, years) -> ds.Expression:
+    year_ranges = None
+    for year in years:
+        year_range = _date_range(
+            field,
+            data_type,
+            datetime.date(int(year), 1, 1),
+            datetime.date(int(year) + 1, 1, 1),
+        )
+        year_ranges = year_range if year_ranges is None else year_ranges | year_range
+    return year_ranges if year_ranges is not None else ds.scalar(False)
+
+
+def filter_expression(schema, date_column=None, years=None, days=None, dimensions=None):
+    """Scan filter for the parts of a chart's filters that can be pushed down.
+
+    Years and day ranges become ranges on the date column, so their row group
+    statistics apply; months cannot and are filtered batch by batch. Filters
+    on the columns derived from the date (Year, Month_Display, ...) apply to
+    the date column, as the dataset does not hold them.
+    """
+    conditions = []
+    if date_column:
+        field, data_type = ds.field(date_column), schema.field(date_column).type
+        if years is not None:
+            conditions.append(_years_range(field, data_type, years))
+        if days is not None:
+            conditions.append(
+                _date_range(field, data_type, days[0], days[1] + datetime.timedelta(days=1))
+            )
+    for dimension, values in (dimensions or {}).items():
+        if not date_column or dimension not in DERIVED_COLUMNS or dimension in schema.names:
+            conditions.append(ds.field(dimension).isin(values))
+        elif dimension == "Year":
+            conditions.append(_years_range(field, data_type, values))
+        else:
+            conditions.append(DERIVED_COLUMNS[dimension](field).isin(values))
+    return _all(conditions)
+
+
+def _reduce(table: pa.Table, group_by: list, measures: list, rows: str) -> pa.Table:
+    """Sum `measures` and `rows` (the count column, or None to count rows)."""
+    aggregations = [(m, "sum", pc.ScalarAggregateOptions(min_count=0)) for m in measures]
+    aggregations.append((rows, "sum") if rows else ([], "count_all"))
+    reduced = table.group_by(group_by, use_threads=False).aggregate(aggregations)
+    names = {f"{m}_sum": m for m in measures}
+    names[f"{rows}_sum" if rows else "count_all"] = ROWS
+    return reduced.rename_columns(names)
+
+
+def merge_partials(partials: list, group_by: list, measures: list) -> pa.Table:
+    return _reduce(pa.concat_tables(partials), group_by, measures, ROWS)
+
+
+def scan_columns(group_by: list, measures: list, date_column=None, months=None) -> list:
+    """Columns to read for `group_by`, whose derived date columns come from
+    `date_column`."""
+    columns = [c for c in group_by if c not in DERIVED_COLUMNS] + list(measures)
+    if date_column and (
+        any(c in DERIVED_COLUMNS for c in group_by) or months is not None
+    ):
+        columns.append(date_column)
+    return list(dict.fromkeys(columns))
+
+
+def month_numbers(months: list) -> pa.Array:
+    """Numbers of abbreviated month names, to filter batches with."""
+    return pa.array(
+        [datetime.datetime.strptime(month, "%b").month for month in months], pa.int64()
+    )
+
+
+def reduce_batches(batches, group_by: list, measures: list, date_column=None, months=None):
+    """Partial sums of a stream of record batches, merged as they arrive.
+
+    Returns the merged table (None when no batch came) and the scan stats.
+    """
+    numbers = month_numbers(months) if months is not None else None
+    derived = [column for column in group_by if column in DERIVED_COLUMNS]
+    partials, stats = [], {"rows": 0, "batches": 0, "peak_bytes": 0}
+    baseline = pa.total_allocated_bytes()
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+        if numbers is not None:
+            table = table.filter(pc.is_in(pc.month(table[date_column]), numbers))
+        for column in derived:
+            table = table.append_column(column, DERIVED_COLUMNS[column](table[date_column]))
+        stats["rows"] += len(table)
+        stats["batches"] += 1
+        partials.append(_reduce(table, group_by, measures, None))
+        if len(partials) >= MERGE_EVERY:
+            partials = [merge_partials(partials, group_by, measures)]
+        stats["peak_bytes"] = max(
+            stats["peak_bytes"], pa.total_allocated_bytes() - baseline
+        )
+    return (merge_partials(partials, group_by, measures) if partials else None), stats
+
+
+def result_frame(table, group_by: list, measures: list) -> pd.DataFrame:
+    if table is None:
+        return pd.DataFrame(columns=[*group_by, *measures, ROWS])
+    return table.to_pandas()
+
+
+def log_stats(path: str, stats: dict, label: str = "Streamed"):
+    logger.info(
+        "%s %s: %d rows in %d batches into %d groups, peak %.1f MiB in %.2fs",
+        label,
+        path,
+        stats["rows"],
+        stats["batches"],
+        stats["groups"],
+        stats["peak_bytes"] / 1024**2,
+        stats["seconds"],
+    )
+
+
+def stream_group_sum(
+    path: str,
+    group_by: list,
+    measures: list,
+    date_column: str = None,
+    years=None,
+    months=None,
+    days=None,
+    dimensions=None,
+    parts: list = None,
+    workers: int = None,
+):
+    """Sum `measures` by `group_by` over a dataset, never holding it in memory.
+
+    `group_by` may name the derived Year, Month, Month_Display and Day
+    columns of `date_column`. Returns the result (with a ROWS count per
+    group) and the scan statistics, including the peak Arrow memory in use.
+    Datasets configured for parallel execution are scanned by the process
+    pool unless `workers` says otherwise.
+    """
+    from parallel import parallel_group_sum, parallel_workers
+
+    workers = parallel_workers(path) if workers is None else workers
+    if workers > 1:
+        return parallel_group_sum(
+            path, group_by, measures, date_column, years, months, days, dimensions, parts, workers
+        )
+    started = time.perf_counter()
+    dataset = ds.dataset(
+        dataset_parts(path) if parts is None else parts, format="parquet"
+    )
+    scanner = dataset.scanner(
+        columns=scan_columns(group_by, measures, date_column, months),
+        filter=filter_expression(dataset.schema, date_column, years, days, dimensions),
+        batch_size=STREAM_BATCH_ROWS,
+    )
+    table, stats = reduce_batches(
+        scanner.to_batches(), group_by, measures, date_column, months
+    )
+    result = result_frame(table, group_by, measures)
+    stats["groups"] = len(result)
+    stats["seconds"] = time.perf_counter() - started
+    log_stats(path, stats)
+    return result, stats
+
+
+@st.cache_data(show_spinner=False)
+def _stream_dataset(
+    path: str,
+    fingerprint: tuple,
+    column_data: tuple,
+    dimensions: tuple,
+    measures: tuple,
+    parts: tuple,
+):
+    from load_profile import load_with_profile
+    from utils import create_year_and_month_week_and_day_columns
+
+    date_column = column_data[0] if column_data else None
+    group_by = [*dimensions, "Day"] if date_column else list(dimensions)
+    df, _ = stream_group_sum(
+        path, group_by, list(measures), date_column, parts=list(parts) if parts else None
+    )
+    if date_column:
+        df = df.rename(columns={"Day": date_column})
+        create_year_and_month_week_and_day_columns(df, date_column)
+    return load_with_profile(path, df)
+
+
+def stream_dataset(path: str, column_data=False, pages: list = None, parts: list = None):
+    """Stand-in for the rows of a dataset too large to load: its sums per day
+    and per chart dimension, which every sum the charts draw can regroup."""
+    from cube import cube_layout
+
+    if pages is None:
+        from pages_data import load_pages
+
+        pages = load_pages()
+    dimensions, measures = cube_layout(pages, path, column_data)
+    return _stream_dataset(
+        path,
+        dataset_fingerprint(path),
+        tuple(column_data or []),
+        dimensions,
+        measures,
+        tuple(parts) if parts is not None else None,
+    )
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from calculated import evaluate, parse_expression, stored_measures
+
+
+def test_columns_become_placeholders():
+    parsed = parse_expression("(Sales - `Unit Cost`) / Sales")
+    assert sorted(parsed["columns"].values()) == ["Sales", "Unit Cost"]
+    assert "Sales" not in parsed["source"]
+    assert "Unit Cost" not in parsed["source"]
+
+
+@pytest.mark.parametrize(
+    "expression, after_aggregation",
+    [
+        ("Sales - Cost", True),
+        ("2 * Sales + Cost / 4", True),
+        ("(Sales - Cost) / Sales", True),
+        ("100 * (Sales - Cost) / Sales", True),
+        ("1 - Cost / Sales", True),
+        ("Sales * Quantity", False),
+        ("Sales / Quantity * Cost", False),
+    ],
+)
+def test_after_aggregation(expression, after_aggregation):
+    assert parse_expression(expression)["after_aggregation"] is after_aggregation
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "Sales ** 2",
+        "Sales % 7",
+        "abs(Sales)",
+        "Sales.real",
+        "Sales[0]",
+        "'Sales'",
+        "True + Sales",
+        "Sales if Cost else 0",
+        "__import__('os')",
+        "Sales +",
+        "1 + 2",
+    ],
+)
+def test_rejected(expression):
+    with pytest.raises(ValueError):
+        parse_expression(expression)
+
+
+def test_unknown_columns_are_rejected():
+    with pytest.raises(ValueError, match="Unknown numeric column: Price"):
+        parse_expression("Sales - Price", ("Sales", "Cost"))
+    assert parse_expression("Sales - Cost", ("Sales", "Cost"))["columns"]
+
+
+def test_evaluate_gives_nan_for_divisions_by_zero():
+    frame = pd.DataFrame({"Sales": [10.0, 0.0, 4.0], "Cost": [5, 0, 1]})
+    values = evaluate(parse_expression("(Sales - Cost) / Sales"), frame)
+    np.testing.assert_allclose(values, [0.5, np.nan, 0.75])
+
+
+def test_stored_measures_replace_calculated_ones():
+    chart = {
+        "measure": ["Margin", "Quantity"],
+        "calculated": {"Margin": "Sales - `Unit Cost`"},
+    }
+    assert sorted(stored_measures(chart)) == ["Quantity", "Sales", "Unit Cost"]
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+from drilldown import chart_drill
+
+MEASURE = "Sales"
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "Sales.parquet"
+    pd.DataFrame(
+        {
+            "InvDate": pd.to_datetime(["2022-01-02", "2022-03-03"]),
+            "LastModifiedDateTime": pd.to_datetime(["2023-02-10", "2024-02-11"]),
+            MEASURE: [1.0, 2.0],
+        }
+    ).to_parquet(path)
+    return str(path)
+
+
+def test_charts_differing_only_in_date_column_do_not_share_hierarchies(dataset):
+    frame = pd.read_parquet(dataset)
+    years = {}
+    for date_column in ("InvDate", "LastModifiedDateTime"):
+        rows = frame.assign(Day=frame[date_column].dt.normalize())
+        chart = {"type": "Drill-down Chart", "file_path": dataset, "date_column": [date_column]}
+        level, bars = chart_drill(chart, rows, MEASURE, {}, [])
+        assert level == "Year"
+        years[date_column] = bars["key"].to_list()
+    assert years == {"InvDate": [2022], "LastModifiedDateTime": [2023, 2024]}
+
+
+def test_drill_into_month(dataset):
+    frame = pd.read_parquet(dataset)
+    rows = frame.assign(Day=frame["InvDate"].dt.normalize())
+    chart = {"type": "Drill-down Chart", "file_path": dataset, "date_column": ["InvDate"]}
+    level, bars = chart_drill(chart, rows, MEASURE, {}, [2022])
+    assert level == "Month"
+    assert bars["label"].to_list() == ["Jan", "Mar"]
+    assert bars["value"].to_list() == [1.0, 2.0]
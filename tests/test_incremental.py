@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from cube import ROWS, build_cube, query_cube
+from incremental import incremental_sum
+
+MEASURE = "Sales"
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    size = 5_000
+    return pd.DataFrame(
+        {
+            "Year": rng.choice([2021, 2022, 2023], size),
+            "Month_Display": rng.choice(["Jan", "Feb", "Mar", "Apr"], size),
+            "Branch": rng.choice(["EAST", "WEST", "NORTH", "SOUTH"], size),
+            "Customer": rng.choice([f"C{i}" for i in range(12)], size),
+            MEASURE: rng.normal(100, 30, size).round(2),
+        }
+    )
+
+
+def full_sum(rows, group_by, filters):
+    """Group-by sum and row count over the rows the filters keep."""
+    mask = pd.Series(True, index=rows.index)
+    if "years" in filters:
+        mask &= rows["Year"].isin(filters["years"])
+    if "months" in filters:
+        mask &= rows["Month_Display"].isin(filters["months"])
+    for dimension, values in filters.get("dimensions", {}).items():
+        mask &= rows[dimension].isin(values)
+    grouped = rows[mask].groupby(group_by)
+    expected = grouped[MEASURE].sum().to_frame()
+    expected[ROWS] = grouped.size()
+    return expected.reset_index()
+
+
+def assert_same(result, expected, group_by):
+    result = result.sort_values(group_by).reset_index(drop=True)
+    expected = expected.sort_values(group_by).reset_index(drop=True)
+    assert result[group_by].equals(expected[group_by])
+    np.testing.assert_allclose(result[MEASURE], expected[MEASURE], rtol=1e-9, atol=1e-6)
+    np.testing.assert_array_equal(result[ROWS], expected[ROWS])
+
+
+@pytest.mark.parametrize("group_by", [["Branch"], ["Customer"], ["Branch", "Customer"]])
+@pytest.mark.parametrize("period", [{}, {"years": [2022, 2023]}, {"months": ["Feb"]}])
+def test_random_toggles_match_full_recomputation(rows, group_by, period):
+    cube = build_cube(rows, ["Branch", "Customer"], [MEASURE], with_period=True)
+    rng = np.random.default_rng(len(group_by))
+    values = {d: sorted(rows[d].unique()) for d in ("Branch", "Customer")}
+    filters = {**period, "dimensions": {d: list(v) for d, v in values.items()}}
+    result = query_cube(cube, group_by, MEASURE, with_count=True, **filters)
+    for _ in range(60):
+        previous = {
+            "group_by": group_by,
+            "measure": MEASURE,
+            "filters": filters,
+            "result": result,
+        }
+        dimension = rng.choice(list(values))
+        value = rng.choice(values[dimension])
+        selected = filters["dimensions"][dimension]
+        selected = [v for v in selected if v != value] if value in selected else [*selected, value]
+        filters = {**filters, "dimensions": {**filters["dimensions"], dimension: selected}}
+
+        result = incremental_sum(previous, cube, group_by, MEASURE, filters)
+        assert result is not None
+        assert_same(result, full_sum(rows, group_by, filters), group_by)
+        assert_same(
+            result,
+            query_cube(cube, group_by, MEASURE, with_count=True, **filters),
+            group_by,
+        )
+
+
+def test_other_changes_need_a_full_evaluation(rows):
+    cube = build_cube(rows, ["Branch", "Customer"], [MEASURE], with_period=True)
+    filters = {"dimensions": {"Branch": ["EAST", "WEST"]}}
+    previous = {
+        "group_by": ["Customer"],
+        "measure": MEASURE,
+        "filters": filters,
+        "result": query_cube(cube, ["Customer"], MEASURE, with_count=True, **filters),
+    }
+    two_values = {"dimensions": {"Branch": ["EAST", "WEST", "NORTH", "SOUTH"]}}
+    other_year = {**filters, "years": [2021]}
+    assert incremental_sum(previous, cube, ["Customer"], MEASURE, two_values) is None
+    assert incremental_sum(previous, cube, ["Customer"], MEASURE, other_year) is None
+    assert incremental_sum(previous, cube, ["Branch"], MEASURE, filters) is None
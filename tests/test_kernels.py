@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from kernels import bincount_group_sum
+
+MEASURE = "Sales"
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    size = 1_000
+    return pd.DataFrame(
+        {
+            "Branch": pd.Categorical(rng.choice(["EAST", "WEST", "NORTH"], size)),
+            "Customer": pd.Categorical(rng.choice([f"C{i}" for i in range(7)], size)),
+            MEASURE: rng.normal(100, 30, size),
+        }
+    )
+
+
+def expected_sum(rows, group_by):
+    return rows.groupby(group_by, observed=True).agg({MEASURE: "sum"}).reset_index()
+
+
+@pytest.mark.parametrize("group_by", [["Branch"], ["Branch", "Customer"]])
+def test_matches_pandas(rows, group_by):
+    result = bincount_group_sum(rows, group_by, MEASURE)
+    expected = expected_sum(rows, group_by)
+    pd.testing.assert_frame_equal(
+        result.sort_values(group_by, ignore_index=True),
+        expected.sort_values(group_by, ignore_index=True),
+        check_exact=False,
+    )
+
+
+def test_integer_sums_are_exact_beyond_float_precision(rows):
+    rows[MEASURE] = np.int64(2**53 + 1)
+    result = bincount_group_sum(rows, ["Branch"], MEASURE)
+    expected = expected_sum(rows, ["Branch"])
+    assert result[MEASURE].dtype == np.int64
+    assert result.set_index("Branch")[MEASURE].to_dict() == (
+        expected.set_index("Branch")[MEASURE].to_dict()
+    )
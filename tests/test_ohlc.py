@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ohlc import coarsen, row_candles
+
+PRICE = "Price"
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    size = 3_000
+    # Distinct times, shuffled, so the candles cannot rely on the row order.
+    seconds = rng.choice(90 * 24 * 3600, size, replace=False)
+    return pd.DataFrame(
+        {
+            "InvDate": pd.Timestamp("2023-01-01") + pd.to_timedelta(seconds, unit="s"),
+            PRICE: rng.normal(100, 10, size),
+        }
+    )
+
+
+def expected_candles(rows, frequency):
+    prices = rows.set_index("InvDate")[PRICE].sort_index()
+    return prices.resample(frequency).ohlc().dropna()
+
+
+@pytest.mark.parametrize("grain, frequency", [("Day", "D"), ("Week", "W-SUN"), ("Month", "MS")])
+def test_matches_pandas_resample_ohlc(rows, grain, frequency):
+    candles = coarsen(row_candles(rows, "InvDate", [PRICE] * 4), grain)
+    expected = expected_candles(rows, frequency)
+    if grain == "Week":
+        # Weekly periods are labelled by their start, pandas by their end.
+        expected.index = expected.index - pd.Timedelta(days=6)
+    np.testing.assert_array_equal(candles["period"].to_numpy(), expected.index.to_numpy())
+    for column in ("open", "high", "low", "close"):
+        np.testing.assert_array_equal(candles[column].to_numpy(), expected[column].to_numpy())
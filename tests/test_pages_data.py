@@ -0,0 +1,37 @@
+import pytest
+from pages_data import PageConflictError, add_page, load_pages, update_page
+
+
+@pytest.fixture(autouse=True)
+def pages_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    add_page({"title": "Sales", "charts": []})
+
+
+def append(title):
+    return lambda page: page["charts"].append({"title": title})
+
+
+def test_updates_apply_to_the_freshest_page():
+    update_page("Sales", append("first"))
+    update_page("Sales", append("second"))
+    [page] = load_pages()
+    assert [chart["title"] for chart in page["charts"]] == ["first", "second"]
+    assert page["version"] == 2
+
+
+def test_a_stale_expected_version_is_a_conflict():
+    update_page("Sales", append("first"))
+    with pytest.raises(PageConflictError):
+        update_page("Sales", append("second"), expected_version=0)
+    [page] = load_pages()
+    assert [chart["title"] for chart in page["charts"]] == ["first"]
+
+
+def test_a_conflict_raised_by_the_mutation_saves_nothing():
+    def taken(page):
+        raise PageConflictError("taken")
+
+    with pytest.raises(PageConflictError):
+        update_page("Sales", taken)
+    assert load_pages()[0]["version"] == 0
@@ -0,0 +1,53 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from parallel import PARALLEL_FILE, parallel_group_sum, parallel_workers, row_group_tasks
+from streaming import stream_group_sum
+
+MEASURE = "Sales"
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    size = 4_000
+    path = tmp_path / "Sales.parquet"
+    pd.DataFrame(
+        {
+            "InvDate": pd.Timestamp("2022-01-01")
+            + pd.to_timedelta(rng.integers(0, 2 * 365, size), unit="D"),
+            "Branch": rng.choice(["EAST", "WEST", "NORTH"], size),
+            MEASURE: rng.integers(0, 100, size),
+        }
+    ).to_parquet(path, row_group_size=500)
+    return str(path)
+
+
+def sorted_frame(frame, group_by):
+    return frame.sort_values(group_by, ignore_index=True)
+
+
+@pytest.mark.parametrize("group_by", [["Branch"], ["Year", "Branch"]])
+def test_map_reduce_matches_the_in_process_scan(dataset, monkeypatch, group_by):
+    # Merge partials as they arrive, not only at the end.
+    monkeypatch.setattr("parallel.MERGE_EVERY", 2)
+    filters = {"years": [2022], "months": ["Jan", "Feb", "Mar"]}
+    expected, _ = stream_group_sum(
+        dataset, group_by, [MEASURE], "InvDate", **filters, workers=1
+    )
+    result, stats = parallel_group_sum(
+        dataset, group_by, [MEASURE], "InvDate", **filters, workers=2
+    )
+    assert stats["tasks"] == len(row_group_tasks([dataset])) == 8
+    pd.testing.assert_frame_equal(
+        sorted_frame(result, group_by), sorted_frame(expected, group_by)
+    )
+
+
+def test_workers_are_read_from_the_parallel_file(tmp_path, monkeypatch, dataset):
+    monkeypatch.chdir(tmp_path)
+    assert parallel_workers(dataset) == 0
+    with open(PARALLEL_FILE, "w") as file:
+        json.dump({dataset: 3}, file)
+    assert parallel_workers(dataset) == 3
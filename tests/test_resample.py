@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+from resample import chart_series
+
+MEASURE = "Sales"
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "Sales.parquet"
+    pd.DataFrame(
+        {
+            "InvDate": pd.to_datetime(["2023-01-02", "2023-01-03"]),
+            "LastModifiedDateTime": pd.to_datetime(["2023-02-10", "2023-02-11"]),
+            MEASURE: [1.0, 2.0],
+        }
+    ).to_parquet(path)
+    return str(path)
+
+
+def days_of(frame, date_column):
+    rows = frame.copy()
+    rows["Day"] = rows[date_column].dt.normalize()
+    return rows
+
+
+def test_charts_differing_only_in_date_column_do_not_share_series(dataset):
+    frame = pd.read_parquet(dataset)
+    series = {}
+    for date_column in ("InvDate", "LastModifiedDateTime"):
+        chart = {"type": "Line Chart", "file_path": dataset, "date_column": [date_column]}
+        grain, series[date_column] = chart_series(chart, days_of(frame, date_column), MEASURE, {})
+        assert grain == "Day"
+    assert list(series["InvDate"].index) == list(pd.to_datetime(["2023-01-02", "2023-01-03"]))
+    assert list(series["LastModifiedDateTime"].index) == list(
+        pd.to_datetime(["2023-02-10", "2023-02-11"])
+    )
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from rollup import OTHER, chart_rollup, rollup
+
+MEASURE = "Sales"
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "Sales.parquet"
+    pd.DataFrame({"Branch": ["EAST"], MEASURE: [1.0]}).to_parquet(path)
+    return str(path)
+
+
+def test_parents_sum_their_children_and_the_rest_is_folded():
+    leaves = pd.DataFrame(
+        {
+            "Branch": ["EAST", "EAST", "EAST", "WEST"],
+            "Customer": ["C1", "C2", "C3", "C4"],
+            MEASURE: [5.0, 3.0, 1.0, 2.0],
+        }
+    )
+    nodes = rollup(leaves, ["Branch", "Customer"], MEASURE, top_n=2)
+    values = dict(zip(nodes["ids"], nodes["values"]))
+    assert values["EAST"] == 9.0
+    assert values["WEST"] == 2.0
+    assert values["EAST / C1"] == 5.0
+    assert values["EAST / C2"] == 3.0
+    assert values[f"EAST / {OTHER}"] == 1.0
+    assert "EAST / C3" not in values
+
+
+def test_charts_differing_only_in_date_column_do_not_share_nodes(dataset):
+    years = {"InvDate": ["2022"], "LastModifiedDateTime": ["2024"]}
+    ids = {}
+    for date_column, year in years.items():
+        chart = {
+            "type": "Treemap",
+            "file_path": dataset,
+            "date_column": [date_column],
+            "hierarchy": ["Year"],
+        }
+        leaves = pd.DataFrame({"Year": year, MEASURE: [1.0]})
+        ids[date_column] = chart_rollup(chart, leaves, MEASURE, {})["ids"]
+    assert ids == years
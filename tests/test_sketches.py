@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sketches import merge_sketches, sketch_rows, summaries
+
+MEASURE = "Sales"
+
+
+def box_of(values):
+    rows = pd.DataFrame({"Branch": "EAST", MEASURE: values})
+    return summaries(sketch_rows(rows, ["Branch"], [MEASURE]), "Branch")[0]
+
+
+def test_whiskers_end_at_data_points_inside_the_fences():
+    values = np.r_[np.arange(100.0), 1000.0]
+    box = box_of(values)
+    assert box["lowerfence"] == 0.0
+    assert box["upperfence"] == 99.0
+
+
+def test_whiskers_reach_the_extremes_without_outliers():
+    values = np.arange(100.0)
+    box = box_of(values)
+    assert box["lowerfence"] == 0.0
+    assert box["upperfence"] == 99.0
+
+
+@pytest.mark.parametrize("distribution", ["normal", "lognormal"])
+def test_quartiles_match_numpy(distribution):
+    rng = np.random.default_rng(0)
+    values = getattr(rng, distribution)(size=20_000)
+    box = box_of(values)
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    tolerance = 0.01 * (q3 - q1)
+    assert box["q1"] == pytest.approx(q1, abs=tolerance)
+    assert box["median"] == pytest.approx(median, abs=tolerance)
+    assert box["q3"] == pytest.approx(q3, abs=tolerance)
+    assert box["mean"] == pytest.approx(values.mean())
+    assert box["count"] == len(values)
+
+
+def test_summaries_merge_across_sketches():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=10_000)
+    rows = pd.DataFrame({"Branch": "EAST", MEASURE: values})
+    halves = [
+        sketch_rows(rows.iloc[:5_000], ["Branch"], [MEASURE]),
+        sketch_rows(rows.iloc[5_000:], ["Branch"], [MEASURE]),
+    ]
+    box = summaries(merge_sketches(halves, ["Branch"]), "Branch")[0]
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    assert box["q1"] == pytest.approx(q1, abs=0.01 * (q3 - q1))
+    assert box["q3"] == pytest.approx(q3, abs=0.01 * (q3 - q1))
+    assert box["count"] == len(values)
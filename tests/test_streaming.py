@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from streaming import stream_group_sum
+
+MEASURE = "Sales"
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    size = 2_000
+    return pd.DataFrame(
+        {
+            "InvDate": pd.Timestamp("2022-01-01")
+            + pd.to_timedelta(rng.integers(0, 3 * 365, size), unit="D"),
+            "Branch": rng.choice(["EAST", "WEST"], size),
+            MEASURE: rng.integers(0, 100, size),
+        }
+    )
+
+
+@pytest.fixture
+def dataset(tmp_path, rows):
+    path = tmp_path / "Sales.parquet"
+    rows.to_parquet(path, row_group_size=250)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "dimensions",
+    [
+        {"Year": [2023]},
+        {"Month_Display": ["Feb", "Mar"]},
+        {"Year": [2022, 2024], "Month_Display": ["Jan"], "Branch": ["EAST"]},
+    ],
+)
+def test_filters_on_derived_date_columns(rows, dataset, dimensions):
+    result, _ = stream_group_sum(
+        dataset, ["Branch"], [MEASURE], "InvDate", dimensions=dimensions, workers=1
+    )
+    derived = rows.assign(
+        Year=rows["InvDate"].dt.year, Month_Display=rows["InvDate"].dt.strftime("%b")
+    )
+    mask = np.ones(len(rows), dtype=bool)
+    for dimension, values in dimensions.items():
+        mask &= derived[dimension].isin(values).to_numpy()
+    expected = derived[mask].groupby("Branch")[MEASURE].sum()
+    assert result.set_index("Branch")[MEASURE].to_dict() == expected.to_dict()
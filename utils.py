@@ -1,10 +1,59 @@
+import calendar
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import plotly.graph_objects as go
 import plotly.express as px
 from streamlit import fragment, popover
+import numpy as np
 import pandas as pd
+from catalog import (
+    columns_of_kind,
+    dataset_fingerprint,
+    dataset_parts,
+    date_bounds,
+    get_catalog_entry,
+    is_partitioned,
+    part_fingerprint,
+    partition_months,
+    partition_years,
+    prune_parts,
+)
+from aggregations import aggregate, aggregation_label, preview_aggregate
+from binning import BINNED_CHARTS, chart_bins
+from calculated import (
+    aggregate_calculated,
+    chart_expressions,
+    parse_expression,
+    stored_measures,
+    with_calculated,
+)
+from crossfilter import (
+    chart_selection,
+    cross_filter,
+    cross_selection,
+    narrow,
+    select,
+    selected_values,
+)
+from cube import PERIOD_COLUMNS, cube_values, get_cube
+from drilldown import DRILL_CHARTS, chart_drill
+from kernels import group_sum_of
+from ohlc import OHLC_CHARTS, chart_candles
+from resample import GRAINS, chart_series, is_time_series
+from rollup import ROLLUP_CHARTS, chart_hierarchy, chart_rollup
+from sketches import SKETCHED_CHARTS, chart_summaries
+from load_profile import LOAD_PROFILE, concat_frames, load_with_profile
+from models import join, joined_columns, read_columns
+from shared import SHARED_ENABLED, shared_part
+from watcher import watch_fragment
+from streaming import stream_dataset, uses_streaming
+
+# Charts drawn from the filtered rows rather than from sums by dimension.
+ROW_CHARTS = (*BINNED_CHARTS, *SKETCHED_CHARTS, *OHLC_CHARTS)
 
 
 def render_markdown():
@@ -23,6 +72,9 @@ def create_bar_chart_with_infinite_bars(
 ) -> go.Figure:
     fig = go.Figure()
     for bar in data.get("bars", []):
+        error = None
+        if bar.get("error") is not None:
+            error = dict(type="data", array=bar["error"])
         fig.add_trace(
             go.Bar(
                 x=bar["x"],
@@ -31,6 +83,8 @@ def create_bar_chart_with_infinite_bars(
                 text=bar.get("text", ""),
                 textposition="auto",
                 orientation=orientation,
+                error_x=error if orientation == "h" else None,
+                error_y=error if orientation != "h" else None,
             )
         )
     fig.update_layout(
@@ -71,32 +125,178 @@ def create_bar_chart_with_filters(chart: dict, df):
             "x": df[selected_measure],
             "y": df[selected_dimension],
         }
+    measure_title = aggregation_label(chart, selected_measure)
     fig = create_bar_chart_with_infinite_bars(
         data={"bars": [chart_data]},
-        xaxis_title=selected_measure if chart.get("invert") else selected_dimension,
-        yaxis_title=selected_dimension if chart.get("invert") else selected_measure,
+        xaxis_title=measure_title if chart.get("invert") else selected_dimension,
+        yaxis_title=selected_dimension if chart.get("invert") else measure_title,
         orientation="h" if chart.get("invert") else "v",
     )
-    st.plotly_chart(
+    event = st.plotly_chart(
         fig,
         use_container_width=True,
         key=f"{chart['chart_id']}_chart",
-        on_select=lambda: None,
+        on_select="rerun",
         config={"displayModeBar": True},
     )
+    select(
+        chart,
+        selected_dimension,
+        selected_values(event, chart_data["y" if chart.get("invert") else "x"]),
+    )
     return fig
 
 
+def selected_period(id_chart):
+    """Year/Month selection of `create_filters`, or None for a Day range."""
+    time_unit = st.session_state.get(f"time_unit_{id_chart}")
+    if time_unit == "Day":
+        return None
+    period = {}
+    if time_unit in ("Year", "Month"):
+        years = st.session_state.get(f"selected_year_{id_chart}", ["All"])
+        if "All" not in years:
+            period["years"] = years
+    if time_unit == "Month":
+        months = st.session_state.get(f"selected_month_{id_chart}", ["All"])
+        if "All" not in months:
+            period["months"] = months
+    return period
+
+
+def chart_filters(chart: dict) -> dict:
+    """The filters the form of a chart applies in this run: optional "years",
+    "months", "days" and "dimensions" entries, from its widget state."""
+    id_chart = chart["chart_id"]
+    filters = {}
+    if chart.get("date_column"):
+        period = selected_period(id_chart)
+        if period is None:
+            days = st.session_state.get(f"selected_day_{id_chart}")
+            if days and len(days) == 2:
+                filters["days"] = tuple(days)
+        else:
+            filters.update(period)
+            if "years" in filters:
+                filters["years"] = [int(year) for year in filters["years"]]
+    for i, dimension in enumerate(chart.get("dimension") or []):
+        selected = st.session_state.get(f"{id_chart}_dimension{i}", ["All"])
+        if selected and "All" not in selected:
+            filters.setdefault("dimensions", {})[dimension] = list(selected)
+    selection = chart_selection(chart)
+    if selection is not None:
+        narrow(filters, *selection)
+    return filters
+
+
+def group_sum(chart: dict, df: pd.DataFrame, group_by, measure, filters=None):
+    """Sum `measure` by `group_by` over the filtered `df`, or over the rows a
+    `deferred_rows` function gives, which is only called when no store can
+    answer.
+
+    `filters` describes what narrowed the dataset: optional "years", "months"
+    and "dimensions" ({dimension: values}) entries, or None when a Day range
+    was applied. Unless it is None the answer comes from the materialized
+    store, the warm aggregate cache or the dataset cube before raw rows.
+    Charts with another "aggregation" go through `aggregate`, and calculated
+    measures are summed from their columns' sums when that is valid.
+    """
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+    expression = chart_expressions(chart).get(measure)
+    if expression is not None:
+        parsed = parse_expression(expression)
+        if parsed["after_aggregation"] and chart.get("aggregation", "sum") == "sum":
+            return aggregate_calculated(
+                parsed,
+                lambda column: group_sum(chart, df, group_by, column, filters),
+                group_by,
+                measure,
+            )
+        filters = None  # evaluated per row: only the loaded rows hold it
+    if chart.get("aggregation", "sum") != "sum":
+        return aggregate(chart, df, group_by, measure, filters, chart_filters(chart))
+    if filters is not None:
+        if not filters.get("dimensions"):
+            from materialize import lookup
+
+            stored = lookup(
+                chart, group_by, measure, filters.get("years"), filters.get("months")
+            )
+            if stored is not None:
+                return stored
+        if not filters:
+            from sampling import exact_aggregate
+
+            return exact_aggregate(
+                chart["file_path"], chart.get("date_column", False), group_by, measure
+            )
+        import copy
+        from cube import ROWS, get_cube, query_cube
+        from incremental import incremental_sum
+
+        cube = get_cube(chart["file_path"], chart.get("date_column", False))
+        fingerprint = dataset_fingerprint(chart["file_path"])
+        previous_key = f"previous_aggregate_{chart['chart_id']}"
+        previous = st.session_state.get(previous_key)
+        if previous and previous.get("fingerprint") != fingerprint:
+            previous = None  # computed from an earlier version of the dataset
+        answer = incremental_sum(previous, cube, group_by, measure, filters)
+        if answer is None:
+            answer = query_cube(cube, group_by, measure, with_count=True, **filters)
+        if answer is not None:
+            st.session_state[previous_key] = {
+                "group_by": group_by,
+                "measure": measure,
+                "filters": copy.deepcopy(filters),
+                "result": answer,
+                "fingerprint": fingerprint,
+            }
+            return answer.drop(columns=ROWS)
+    return group_sum_of(rows_of(df), group_by, measure)
+
+
+def default_group_by(chart: dict):
+    """Columns `render_form` groups by before any widget is touched."""
+    if (
+        chart.get("type") in ("Variance Comparison", *ROW_CHARTS, *DRILL_CHARTS)
+        or is_time_series(chart)
+        or not chart.get("main_dimension")
+    ):
+        return None
+    if chart.get("type") in ROLLUP_CHARTS:
+        return chart_hierarchy(chart)
+    if chart.get("type") == "Slicer Chart" and chart.get("display_filters"):
+        dimensions = list(chart.get("dimension", []))
+        if chart["main_dimension"] not in dimensions:
+            dimensions.insert(0, chart["main_dimension"])
+        return dimensions
+    return [chart["main_dimension"]]
+
+
 def render_form(chart: dict, df: pd.DataFrame):
     optional_info = ""
     selected_dimension = False
+    filters = {}
+    watch_fragment(chart["file_path"])
+    if (
+        chart.get("date_column") and is_partitioned(chart["file_path"])
+    ) or df.attrs.get("fingerprint") != dataset_fingerprint(chart["file_path"]):
+        # Fragment reruns keep the frame they were started with; reload the
+        # partitions for the time filter of this run, or a changed dataset.
+        df = load_chart_dataset(chart)
+    # Rows are only filtered when the chart needs them: filters are collected
+    # in `row_filters` and options come from the cube's keys where it has them.
+    selection = cross_selection(chart, df)
+    row_filters = {}
+    cube = get_cube(chart["file_path"], chart.get("date_column", False))
     col_1, col_2 = st.columns(2)
 
     with col_1.popover("Filter"):
         if chart.get("date_column") and chart.get("type") != "Variance Comparison":
-            df, optional_info_dict = create_filters(
-                df, chart["file_path"], chart["chart_id"]
+            row_filters, optional_info_dict = create_filters(
+                df, chart["file_path"], chart["chart_id"], chart["date_column"][0], cube
             )
+            filters = selected_period(chart["chart_id"])
             for key, value in optional_info_dict.items():
                 if "Selected Days" in key:
                     optional_info += f"{key}: {value} <br>"
@@ -119,13 +319,27 @@ def render_form(chart: dict, df: pd.DataFrame):
                         f"default_dimension_{dimension}_{chart['chart_id']}"
                     ] = ["All"]
 
-                default_options = [
-                    "All",
-                    *df.sort_values(by=chart["date_column"])[dimension]
-                    .dropna()
-                    .unique()
-                    .tolist(),
-                ]
+                options = None
+                if filters is not None:
+                    narrowed = {"dimensions": dict(filters.get("dimensions", {}))}
+                    for selected, values in selection.items():
+                        narrow(narrowed, selected, values)
+                    options = cube_values(
+                        cube,
+                        dimension,
+                        filters.get("years"),
+                        filters.get("months"),
+                        narrowed["dimensions"],
+                    )
+                if options is None:
+                    rows = filter_rows(cross_filter(chart, df)[0], **row_filters)
+                    options = (
+                        rows.sort_values(by=chart["date_column"])[dimension]
+                        .dropna()
+                        .unique()
+                        .tolist()
+                    )
+                default_options = ["All", *options]
 
                 if st.session_state.get(
                     f"flag_year_month_updated_{chart['chart_id']}", False
@@ -189,9 +403,15 @@ def render_form(chart: dict, df: pd.DataFrame):
 
                 if "All" not in selected_dimension and selected_dimension:
                     optional_info += f"<em>{dimension.upper()}</em>: {', '.join(selected_dimension)} <br>"
-                    df = df[df[dimension].isin(selected_dimension)]
+                    row_filters.setdefault("dimensions", {})[dimension] = selected_dimension
+                    if filters is not None:
+                        filters.setdefault("dimensions", {})[dimension] = selected_dimension
                 elif not selected_dimension:
                     st.info("Please select at least one filter.")
+            for dimension, values in selection.items():
+                optional_info += f"<em>{dimension.upper()}</em>: {', '.join(map(str, values))} (selected) <br>"
+                if filters is not None:
+                    narrow(filters, dimension, values)
             st.session_state[f"flag_year_month_updated_{chart['chart_id']}"] = False
             st.session_state[f"flag_dimension_updated_{chart['chart_id']}"] = False
             if chart.get("type") == "Bar Chart":
@@ -207,8 +427,9 @@ def render_form(chart: dict, df: pd.DataFrame):
             selected_measure = st.selectbox(
                 "Select Measure", chart["measure"], key=f"{chart['chart_id']}_measure"
             )
+            rows = deferred_rows(chart, df, row_filters)
             if chart["type"] == "Variance Comparison":
-                df = df.sort_values(by="Year", ascending=False)
+                df = rows().sort_values(by="Year", ascending=False)
                 try:
                     prior_year = st.selectbox(
                         "Select Prior Year",
@@ -242,34 +463,45 @@ def render_form(chart: dict, df: pd.DataFrame):
                 except Exception:
                     st.session_state.flag_error_variance_comparisson = True
 
-            filtered_df = df
+            filtered_df = rows
             if chart["type"] == "Bar Chart":
-                filtered_df = (
-                    df.groupby(selected_dimension)[selected_measure].sum().reset_index()
+                filtered_df = group_sum(
+                    chart, rows, selected_dimension, selected_measure, filters
                 )
             elif chart["type"] == "Slicer Chart":
                 if chart["display_filters"]:
                     if chart.get("main_dimension", None) not in chart["dimension"]:
                         chart["dimension"].insert(0, chart["main_dimension"])
-                filtered_df = (
-                    df.groupby(chart.get("main_dimension") if not chart.get("display_filters") else chart["dimension"])
-                    .agg({selected_measure: "sum"})
-                    .reset_index()
+                filtered_df = group_sum(
+                    chart,
+                    rows,
+                    chart.get("main_dimension") if not chart.get("display_filters") else chart["dimension"],
+                    selected_measure,
+                    filters,
+                )
+            elif chart["type"] in (*ROW_CHARTS, *DRILL_CHARTS) or is_time_series(chart):
+                pass  # see `chart_bins`, `chart_summaries`, `chart_candles`, `chart_series` and `chart_drill`
+            elif chart["type"] in ROLLUP_CHARTS:
+                filtered_df = group_sum(
+                    chart, rows, chart_hierarchy(chart), selected_measure, filters
                 )
             elif chart["type"] != "Variance Comparison" and chart.get(
                 "main_dimension", None
             ):
-                filtered_df = (
-                    df.groupby(chart.get("main_dimension"))[selected_measure]
-                    .sum()
-                    .reset_index()
+                filtered_df = group_sum(
+                    chart, rows, chart.get("main_dimension"), selected_measure, filters
+                )
+            if chart["type"] not in (*ROW_CHARTS, *DRILL_CHARTS) and not is_time_series(
+                chart
+            ):
+                filtered_df = rows_of(filtered_df).sort_values(
+                    by=selected_measure, ascending=False
                 )
-            filtered_df = filtered_df.sort_values(by=selected_measure, ascending=False)
     if st.session_state.get("flag_error_variance_comparisson", False):
         st.session_state.flag_error_variance_comparisson = False
         st.warning("Please select filter with range with minimum 2 years.")
         st.stop()
-    return filtered_df, selected_dimension, selected_measure, optional_info, col_2
+    return rows_of(filtered_df), selected_dimension, selected_measure, optional_info, col_2
 
 
 def extract_row_number(position):
@@ -477,8 +709,62 @@ def create_year_and_month_week_and_day_columns(data, date_column):
     data["Week_Year"] = data[date_column].dt.strftime("%Y-W%U")
 
 
-def create_filters(df, path, id_chart):
+def month_options(df, path, years=None, cube=None):
+    """Month names to offer, from the partitions when the dataset has them,
+    else from the cube, and only then from the rows."""
+    months = partition_months(path, years) or cube_values(cube, "Month_Display", years)
+    if months is None:
+        months = df["Month_Display"].dropna().unique()
+    return sorted(months, key=lambda x: pd.to_datetime(x, format="%b").month)
+
+
+def year_options(df, path, cube=None):
+    years = partition_years(path) or cube_values(cube, "Year")
+    if years is None:
+        years = df["Year"].dropna().unique()
+    return sorted(years)
+
+
+def filter_rows(df, years=None, months=None, days=None, dimensions=None):
+    """The rows of `df` that the filters of a chart's form keep."""
+    mask = np.ones(len(df), dtype=bool)
+    if years is not None:
+        mask &= df["Year"].isin(years).to_numpy()
+    if months is not None:
+        mask &= df["Month_Display"].isin(months).to_numpy()
+    if days is not None:
+        mask &= ((df["Day"] >= days[0]) & (df["Day"] <= days[1])).to_numpy(
+            dtype=bool, na_value=False
+        )
+    for dimension, values in (dimensions or {}).items():
+        mask &= df[dimension].isin(values).to_numpy()
+    return df if mask.all() else df[mask]
+
+
+def deferred_rows(chart: dict, df: pd.DataFrame, row_filters: dict):
+    """A function returning the rows of the loaded `df` that the form keeps,
+    filtered on its first call: charts answered by a store never call it."""
+    rows = []
+
+    def filtered():
+        if not rows:
+            rows.append(filter_rows(cross_filter(chart, df)[0], **row_filters))
+        return rows[0]
+
+    return filtered
+
+
+def rows_of(df):
+    """`df`, or the rows a `deferred_rows` function gives."""
+    return df() if callable(df) else df
+
+
+def create_filters(df, path, id_chart, date_column=None, cube=None):
+    """The time filter widgets of a chart. Returns the row filters they set,
+    as `filter_rows` takes them, and their description; options come from
+    the partitions or the cube before the rows."""
     optional_info = {}
+    rows = {}
     time_unit = st.segmented_control(
         "Select Time Unit",
         ["Year", "Month", "Day"],
@@ -502,13 +788,7 @@ def create_filters(df, path, id_chart):
             if st.session_state.get(f"last_month_selected_{id_chart}", False):
                 st.session_state[f"last_selected_time_unit_{id_chart}"] = time_unit
                 for month in st.session_state[f"last_month_selected_{id_chart}"]:
-                    if month not in [
-            "All",
-            *sorted(
-                df["Month_Display"].dropna().unique(),
-                key=lambda x: pd.to_datetime(x, format="%b").month,
-            ),
-        ]:
+                    if month not in ["All", *month_options(df, path, cube=cube)]:
                         st.session_state[f"last_month_selected_{id_chart}"].remove(
                             month
                         )
@@ -518,7 +798,7 @@ def create_filters(df, path, id_chart):
 
         selected_time_unit = st.multiselect(
             "Select Year",
-            ["All", *sorted(df["Year"].dropna().unique())],
+            ["All", *year_options(df, path, cube)],
             default=st.session_state[f"default_value_for_year_{id_chart}"],
             key=f"selected_year_{id_chart}",
         )
@@ -529,7 +809,7 @@ def create_filters(df, path, id_chart):
         st.session_state[f"last_year_selected_{id_chart}"] = selected_time_unit
 
         if "All" not in selected_time_unit:
-            df = df[df["Year"].isin(selected_time_unit)]
+            rows["years"] = selected_time_unit
             optional_info["<em>Years</em>"] = [
                 str(number) for number in selected_time_unit
             ]
@@ -540,9 +820,11 @@ def create_filters(df, path, id_chart):
 
         options_month = [
             "All",
-            *sorted(
-                df["Month_Display"].dropna().unique(),
-                key=lambda x: pd.to_datetime(x, format="%b").month,
+            *month_options(
+                df,
+                path,
+                None if "All" in selected_time_unit else selected_time_unit,
+                cube,
             ),
         ]
         st.session_state[f"options_month_{id_chart}"] = options_month
@@ -560,14 +842,17 @@ def create_filters(df, path, id_chart):
         st.session_state[f"last_month_selected_{id_chart}"] = selected_month
         if "All" not in selected_month:
             optional_info["<em>Months</em>"] = selected_month
-            df = df[df["Month_Display"].isin(selected_month)]
+            rows["months"] = selected_month
 
     elif time_unit == "Day":
+        bounds = date_column and date_bounds(get_catalog_entry(path), date_column)
+        if not bounds:
+            bounds = (df["Day"].dropna().min(), df["Day"].dropna().max())
         selected_day = st.date_input(
             "Select Day",
-            (df["Day"].dropna().min(), df["Day"].dropna().max()),
-            df["Day"].dropna().min(),
-            df["Day"].dropna().max(),
+            bounds,
+            bounds[0],
+            bounds[1],
             key=f"selected_day_{id_chart}",
         )
         if st.session_state.get(f"last_selected_day_{id_chart}", None) != selected_day:
@@ -580,16 +865,18 @@ def create_filters(df, path, id_chart):
             optional_info["<em>Selected Days</em>"] = (
                 f"{selected_day[0].strftime('%Y/%m/%d')} to {selected_day[1].strftime('%Y/%m/%d')}"
             )
-        df = df[(df["Day"] >= selected_day[0]) & (df["Day"] <= selected_day[1])]
-    return df, optional_info
+        if len(selected_day) == 2:
+            rows["days"] = tuple(selected_day)
+    return rows, optional_info
 
 
 def render_chart_with_base_type_of_chart(chart, pages, page):
     st.subheader(chart["chart_name"], divider="grey", anchor=False)
-    df = read_parquet(chart["file_path"], chart.get("date_column", False))
+    df = load_chart_dataset(chart, pages)
+    get_cube(chart["file_path"], chart.get("date_column", False), pages)
     if chart["type"] == "Bar Chart":
         fig = create_bar_chart_with_filters(chart, df)
-    elif chart["type"] == "Line Chart":
+    elif chart["type"] in ("Line Chart", "Area Chart"):
         fig = create_line_chart_with_filters(chart, df)
     elif chart["type"] == "Pie Chart":
         fig = create_pie_chart_with_filters(chart, df)
@@ -601,17 +888,36 @@ def render_chart_with_base_type_of_chart(chart, pages, page):
         fig = create_variance_comparison_bar_chart_with_filters(chart, df)
     elif chart["type"] == "Choropleth Map":
         fig = create_choropleth_map_with_filters(chart, df)
+    elif chart["type"] == "Histogram":
+        fig = create_histogram_with_filters(chart, df)
+    elif chart["type"] == "Heatmap":
+        fig = create_heatmap_with_filters(chart, df)
+    elif chart["type"] == "Density Contour":
+        fig = create_density_contour_with_filters(chart, df)
+    elif chart["type"] == "Box Plot":
+        fig = create_box_plot_with_filters(chart, df)
+    elif chart["type"] == "Violin Plot":
+        fig = create_violin_plot_with_filters(chart, df)
+    elif chart["type"] in ROLLUP_CHARTS:
+        fig = create_rollup_chart_with_filters(chart, df)
+    elif chart["type"] == "Candlestick Chart":
+        fig = create_candlestick_chart_with_filters(chart, df)
+    elif chart["type"] in DRILL_CHARTS:
+        fig = create_drilldown_chart_with_filters(chart, df)
 
     if st.session_state["edit_mode_is_enabled"]:
         if st.button(
             "Edit Chart :material/edit_square:",
             key=f"{chart['chart_id']}_edit",
         ):
+            st.session_state[f"edit_page_version_{chart['chart_id']}"] = page.get(
+                "version", 0
+            )
             create_edit_form(chart, fig, pages, page)
 
 
 def delete_chart(pages, selected_page: str, page, selected_chart):
-    import set_up_chart
+    from pages_data import PageConflictError, update_page
     import time
 
     st.subheader("Edit this chart", anchor=False, divider="grey")
@@ -620,13 +926,19 @@ def delete_chart(pages, selected_page: str, page, selected_chart):
         disabled=selected_chart is None,
         use_container_width=True,
     ):
-        page["charts"] = [
-            chart
-            for chart in page["charts"]
-            if chart["chart_name"] != selected_chart["chart_name"]
-        ]
-        pages = [p if p["title"] != selected_page else page for p in pages]
-        set_up_chart.save_pages(pages)
+
+        def remove_chart(page):
+            page["charts"] = [
+                chart
+                for chart in page["charts"]
+                if chart["chart_id"] != selected_chart["chart_id"]
+            ]
+
+        try:
+            update_page(selected_page, remove_chart)
+        except PageConflictError as error:
+            st.error(str(error))
+            return
         st.success(f"Chart {selected_chart['chart_name']} deleted.")
         time.sleep(2)
         st.rerun()
@@ -643,17 +955,26 @@ def create_edit_form(chart, fig, pages, page):
             key=f"{chart['chart_id']}_chart_edit",
             on_select=lambda: None,
         )
-    df = read_parquet(chart["file_path"], chart.get("date_column", False))
-    available_dimensions = df.select_dtypes(
-        exclude=["number", "datetime"]
-    ).columns.tolist()
+    entry = get_catalog_entry(chart["file_path"])
+    available_dimensions = [
+        *columns_of_kind(entry, "dimension"), *joined_columns(chart["file_path"])
+    ]
+    if chart.get("date_column"):
+        # Derived on load from the date column, so not in the catalog.
+        available_dimensions.extend(PERIOD_COLUMNS)
     name_of_chart = st.text_input("Chart Name", chart.get("chart_name", ""))
-    available_measures = df.select_dtypes(include=["number"]).columns.tolist()
-    available_date_fields = df.select_dtypes(include=["datetime"]).columns.tolist()
+    available_measures = columns_of_kind(entry, "measure")
+    available_date_fields = columns_of_kind(entry, "date")
     dimension= None
-    if chart["type"] != "Variance Comparison":
+    # Drill-down Charts drill through time: they have no main dimension.
+    if chart["type"] not in ("Variance Comparison", *DRILL_CHARTS):
+        main_dimension = chart.get("main_dimension")
         dimension = st.selectbox(
-            "Select Dimension", available_dimensions, index=available_dimensions.index(chart.get("main_dimension", []))
+            "Select Dimension",
+            available_dimensions,
+            index=available_dimensions.index(main_dimension)
+            if main_dimension in available_dimensions
+            else 0,
         )
     dimensions = st.multiselect(
         "Select Filters", available_dimensions, default=chart.get("dimension", [])
@@ -662,17 +983,51 @@ def create_edit_form(chart, fig, pages, page):
     if chart["type"] == "Slicer Chart":    
         display_filters = st.checkbox("Display filters in table and group by filters selected", key=f"{chart['chart_id']}_invert", help="Use for display columns in table for each filter and group by filters selected")
     measures = st.multiselect(
-        "Select Measure", available_measures, default=chart.get("measure", [])
+        "Select Measure",
+        [*available_measures, *chart_expressions(chart)],
+        default=chart.get("measure", []),
     )
     date_fields = st.multiselect(
         "Select Date Field", available_date_fields, default=chart.get("date_column", [])
     )
+    if chart["type"] in DRILL_CHARTS and not date_fields:
+        st.warning("This chart requires a date field.")
+        return
+    if (
+        dimension
+        and measures
+        and (dimension != chart.get("main_dimension") or measures != chart["measure"])
+    ):
+        from sampling import reservoir_sample
+
+        columns = stored_measures({**chart, "measure": measures[:1]})
+        derived = dimension in PERIOD_COLUMNS and bool(chart.get("date_column"))
+        source = chart["date_column"][0] if derived else dimension
+        sample = reservoir_sample(chart["file_path"], list(dict.fromkeys([source, *columns])))
+        if derived:
+            create_year_and_month_week_and_day_columns(sample, source)
+        st.caption(
+            f"Approximate preview from a sample of {len(sample):,} of "
+            f"{entry['num_rows']:,} rows (95% bounds)"
+        )
+        st.dataframe(
+            preview_aggregate(
+                sample,
+                [dimension],
+                measures[0],
+                chart.get("aggregation", "sum"),
+                entry["num_rows"],
+                chart_expressions(chart),
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
 
     from set_up_chart import get_available_positions
     from components.positions_component.src.streamlit_component_x import (
         position_selector,
     )
-    from set_up_chart import load_pages, save_pages
+    from pages_data import PageConflictError, update_page
     import uuid
 
     available_positions = get_available_positions(
@@ -693,30 +1048,57 @@ def create_edit_form(chart, fig, pages, page):
     if st.button(
         "Save Changes", disabled=not bool(selected_position), use_container_width=True
     ):
+        # Keys the dialog does not edit ("y_dimension", "invert", the
+        # aggregation...) are kept as the chart had them.
         chart_config = {
+            **chart,
             "chart_name": name_of_chart,
-            "type": chart.get("type"),
             "dimension": dimensions,
+            "filter_dimensions": dimensions,
             "main_dimension": dimension,
             "measure": measures,
             "date_column": date_fields,
             "dynamic_measures": measures,
-            "file_path": chart.get("file_path"),
             "position": selected_position,
             "display_filters": display_filters,
         }
+        if chart.get("hierarchy"):
+            # The rollup's top level follows the main dimension.
+            chart_config["hierarchy"] = list(
+                dict.fromkeys([dimension, *chart["hierarchy"][1:]])
+            )
         selected_page = st.session_state.name_of_actually_page
-        pages = load_pages()
-        for page in pages:
-            if page["title"] == selected_page:
-                for chart_old in page["charts"]:
-                    if chart_old["chart_id"] == chart["chart_id"]:
-                        page["charts"].remove(chart_old)
-                        chart_config["chart_id"] = str(uuid.uuid4())
-                        page["charts"].append(chart_config)
-                        break
-                break
-        save_pages(pages)
+
+        def replace_chart(page):
+            for chart_old in page["charts"]:
+                if chart_old["chart_id"] == chart["chart_id"]:
+                    page["charts"].remove(chart_old)
+                    chart_config["chart_id"] = str(uuid.uuid4())
+                    page["charts"].append(chart_config)
+                    break
+
+        try:
+            update_page(
+                selected_page,
+                replace_chart,
+                expected_version=st.session_state.get(
+                    f"edit_page_version_{chart['chart_id']}"
+                ),
+            )
+        except PageConflictError as error:
+            st.error(str(error))
+            return
+        from sampling import schedule_exact_aggregate
+
+        if (
+            dimension
+            and measures
+            and chart_config.get("aggregation", "sum") == "sum"
+            and measures[0] not in chart_expressions(chart_config)
+        ):
+            schedule_exact_aggregate(
+                chart["file_path"], date_fields, [dimension], measures[0]
+            )
         st.success("Chart edited successfully.")
         st.toast("Chart edited successfully.", icon=":material/check_circle:")
         from time import sleep
@@ -797,7 +1179,7 @@ def create_choropleth_map(
     else:
         locationmode = "country names"
         scope = "world"
-    data = df.groupby(location_column)[measure].sum().reset_index()
+    data = group_sum_of(df, location_column, measure)
     fig_map = px.choropleth(
         data,
         locations=location_column,
@@ -853,11 +1235,17 @@ def create_line_chart_with_infinite_lines(
                 x=line["x"],
                 y=line["y"],
                 mode="lines+markers",
+                fill=line.get("fill"),
                 name=line.get("name", ""),
                 marker_color=line.get("marker_color", None),
                 text=line.get("text", ""),
                 textposition="top center",
                 orientation="h",
+                error_y=(
+                    dict(type="data", array=line["error"])
+                    if line.get("error") is not None
+                    else None
+                ),
             )
         )
     fig.update_layout(
@@ -886,6 +1274,31 @@ def create_line_chart_with_filters(chart: dict, df):
     filtered_df, selected_dimension, selected_measure, optional_info, _ = render_form(
         chart, df
     )
+    if is_time_series(chart):
+        grain, series = chart_series(
+            chart, filtered_df, selected_measure, chart_filters(chart)
+        )
+        fig = create_line_chart_with_infinite_lines(
+            data={
+                "lines": [
+                    {
+                        "x": series.index,
+                        "y": series.to_numpy(),
+                        "marker_color": "blue",
+                        "fill": "tozeroy" if chart["type"] == "Area Chart" else None,
+                    }
+                ]
+            },
+            xaxis_title=f"{chart['date_column'][0]} (by {grain.lower()})",
+            yaxis_title=selected_measure,
+        )
+        st.plotly_chart(
+            fig,
+            use_container_width=True,
+            key=f"{chart['chart_id']}_chart",
+            on_select=lambda: None,
+        )
+        return fig
     fig = create_line_chart_with_infinite_lines(
         data={
             "lines": [
@@ -952,11 +1365,16 @@ def create_pie_chart_with_filters(chart: dict, df):
             ]
         },
     )
-    st.plotly_chart(
+    event = st.plotly_chart(
         fig,
         use_container_width=True,
         key=f"{chart['chart_id']}_chart",
-        on_select=lambda: None,
+        on_select="rerun",
+    )
+    select(
+        chart,
+        chart["main_dimension"],
+        selected_values(event, filtered_df[chart["main_dimension"]]),
     )
     return fig
 
@@ -1024,6 +1442,410 @@ def create_scatter_chart_with_filters(chart: dict, df):
     return fig
 
 
+def create_histogram(bins: dict, xaxis_title, annotation=False) -> go.Figure:
+    x = bins["x"]
+    fig = go.Figure(
+        go.Bar(
+            x=x,
+            y=bins["z"],
+            width=x[1] - x[0] if len(x) > 1 else None,
+            marker_color="blue",
+        )
+    )
+    fig.update_layout(
+        xaxis_title=xaxis_title,
+        yaxis_title="Count",
+        bargap=0.05,
+        margin=dict(l=10, r=10, t=120, b=10),
+    )
+    if annotation:
+        fig.add_annotation(
+            text=annotation,
+            xref="paper",
+            yref="paper",
+            x=0.05,
+            y=1.25,
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            align="left",
+            xanchor="left",
+            yanchor="top",
+        )
+    return fig
+
+
+def create_heatmap(bins: dict, xaxis_title, yaxis_title, annotation=False) -> go.Figure:
+    fig = go.Figure(go.Heatmap(x=bins["x"], y=bins["y"], z=bins["z"], colorscale="Blues"))
+    fig.update_layout(
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        margin=dict(l=10, r=10, t=120, b=10),
+    )
+    if annotation:
+        fig.add_annotation(
+            text=annotation,
+            xref="paper",
+            yref="paper",
+            x=0.05,
+            y=1.25,
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            align="left",
+            xanchor="left",
+            yanchor="top",
+        )
+    return fig
+
+
+def create_density_contour(bins: dict, xaxis_title, yaxis_title, annotation=False) -> go.Figure:
+    fig = go.Figure(
+        go.Contour(
+            x=bins["x"],
+            y=bins["y"],
+            z=bins["z"],
+            colorscale="Blues",
+            contours_coloring="lines",
+            line_width=2,
+        )
+    )
+    fig.update_layout(
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        margin=dict(l=10, r=10, t=120, b=10),
+    )
+    if annotation:
+        fig.add_annotation(
+            text=annotation,
+            xref="paper",
+            yref="paper",
+            x=0.05,
+            y=1.25,
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            align="left",
+            xanchor="left",
+            yanchor="top",
+        )
+    return fig
+
+
+@fragment
+def create_histogram_with_filters(chart: dict, df):
+    filtered_df, _, selected_measure, optional_info, _ = render_form(chart, df)
+    bins = chart_bins(chart, filtered_df, selected_measure, chart_filters(chart))
+    fig = create_histogram(bins, selected_measure, optional_info)
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart",
+        on_select=lambda: None,
+    )
+    return fig
+
+
+@fragment
+def create_heatmap_with_filters(chart: dict, df):
+    filtered_df, _, selected_measure, optional_info, _ = render_form(chart, df)
+    bins = chart_bins(chart, filtered_df, selected_measure, chart_filters(chart))
+    fig = create_heatmap(
+        bins, chart.get("main_dimension"), chart.get("y_dimension"), optional_info
+    )
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart",
+        on_select=lambda: None,
+    )
+    return fig
+
+
+@fragment
+def create_density_contour_with_filters(chart: dict, df):
+    filtered_df, _, selected_measure, optional_info, _ = render_form(chart, df)
+    bins = chart_bins(chart, filtered_df, selected_measure, chart_filters(chart))
+    fig = create_density_contour(bins, *chart["measure"][:2], optional_info)
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart",
+        on_select=lambda: None,
+    )
+    return fig
+
+
+def create_box_plot(summaries: list, xaxis_title, yaxis_title, annotation=False) -> go.Figure:
+    fig = go.Figure(
+        go.Box(
+            x=[summary["name"] for summary in summaries],
+            q1=[summary["q1"] for summary in summaries],
+            median=[summary["median"] for summary in summaries],
+            q3=[summary["q3"] for summary in summaries],
+            lowerfence=[summary["lowerfence"] for summary in summaries],
+            upperfence=[summary["upperfence"] for summary in summaries],
+            mean=[summary["mean"] for summary in summaries],
+            marker_color="blue",
+        )
+    )
+    fig.update_layout(
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        margin=dict(l=10, r=10, t=120, b=10),
+    )
+    if annotation:
+        fig.add_annotation(
+            text=annotation,
+            xref="paper",
+            yref="paper",
+            x=0.05,
+            y=1.25,
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            align="left",
+            xanchor="left",
+            yanchor="top",
+        )
+    return fig
+
+
+def create_violin_plot(summaries: list, xaxis_title, yaxis_title, annotation=False) -> go.Figure:
+    """Violins drawn from server-side densities, with the quartiles of each
+    group as a narrow box inside."""
+    fig = go.Figure()
+    for position, summary in enumerate(summaries):
+        peak = max(summary["density"]) or 1
+        half_widths = [0.4 * value / peak for value in summary["density"]]
+        fig.add_trace(
+            go.Scatter(
+                x=[position + w for w in half_widths]
+                + [position - w for w in reversed(half_widths)],
+                y=summary["points"] + summary["points"][::-1],
+                fill="toself",
+                mode="lines",
+                line_color="blue",
+                fillcolor="rgba(0, 0, 255, 0.3)",
+                name=summary["name"],
+                hoverinfo="name",
+            )
+        )
+    fig.add_trace(
+        go.Box(
+            x=list(range(len(summaries))),
+            q1=[summary["q1"] for summary in summaries],
+            median=[summary["median"] for summary in summaries],
+            q3=[summary["q3"] for summary in summaries],
+            lowerfence=[summary["lowerfence"] for summary in summaries],
+            upperfence=[summary["upperfence"] for summary in summaries],
+            width=0.08,
+            marker_color="black",
+            name="Quartiles",
+        )
+    )
+    fig.update_layout(
+        xaxis=dict(
+            title=xaxis_title,
+            tickvals=list(range(len(summaries))),
+            ticktext=[summary["name"] for summary in summaries],
+        ),
+        yaxis_title=yaxis_title,
+        showlegend=False,
+        margin=dict(l=10, r=10, t=120, b=10),
+    )
+    if annotation:
+        fig.add_annotation(
+            text=annotation,
+            xref="paper",
+            yref="paper",
+            x=0.05,
+            y=1.25,
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            align="left",
+            xanchor="left",
+            yanchor="top",
+        )
+    return fig
+
+
+@fragment
+def create_box_plot_with_filters(chart: dict, df):
+    filtered_df, _, selected_measure, optional_info, _ = render_form(chart, df)
+    summaries = chart_summaries(chart, filtered_df, selected_measure, chart_filters(chart))
+    fig = create_box_plot(
+        summaries, chart.get("main_dimension"), selected_measure, optional_info
+    )
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart",
+        on_select=lambda: None,
+    )
+    return fig
+
+
+@fragment
+def create_violin_plot_with_filters(chart: dict, df):
+    filtered_df, _, selected_measure, optional_info, _ = render_form(chart, df)
+    summaries = chart_summaries(chart, filtered_df, selected_measure, chart_filters(chart))
+    fig = create_violin_plot(
+        summaries, chart.get("main_dimension"), selected_measure, optional_info
+    )
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart",
+        on_select=lambda: None,
+    )
+    return fig
+
+
+def create_rollup_chart(nodes: dict, chart_type: str, annotation=False) -> go.Figure:
+    trace = go.Sunburst if chart_type == "Sunburst Chart" else go.Treemap
+    fig = go.Figure(
+        trace(
+            ids=nodes["ids"],
+            labels=nodes["labels"],
+            parents=nodes["parents"],
+            values=nodes["values"],
+            branchvalues="total",
+        )
+    )
+    fig.update_layout(margin=dict(l=10, r=10, t=120, b=10))
+    if annotation:
+        fig.add_annotation(
+            text=annotation,
+            xref="paper",
+            yref="paper",
+            x=0.05,
+            y=1.25,
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            align="left",
+            xanchor="left",
+            yanchor="top",
+        )
+    return fig
+
+
+@fragment
+def create_rollup_chart_with_filters(chart: dict, df):
+    filtered_df, _, selected_measure, optional_info, _ = render_form(chart, df)
+    nodes = chart_rollup(chart, filtered_df, selected_measure, chart_filters(chart))
+    fig = create_rollup_chart(nodes, chart["type"], optional_info)
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart",
+        on_select=lambda: None,
+    )
+    return fig
+
+
+def create_candlestick_chart(candles: pd.DataFrame, xaxis_title, yaxis_title, annotation=False) -> go.Figure:
+    fig = go.Figure(
+        go.Candlestick(
+            x=candles["period"],
+            open=candles["open"],
+            high=candles["high"],
+            low=candles["low"],
+            close=candles["close"],
+        )
+    )
+    fig.update_layout(
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        xaxis_rangeslider_visible=False,
+        margin=dict(l=10, r=10, t=120, b=10),
+    )
+    if annotation:
+        fig.add_annotation(
+            text=annotation,
+            xref="paper",
+            yref="paper",
+            x=0.05,
+            y=1.25,
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            align="left",
+            xanchor="left",
+            yanchor="top",
+        )
+    return fig
+
+
+@fragment
+def create_candlestick_chart_with_filters(chart: dict, df):
+    filtered_df, _, _, optional_info, col_2 = render_form(chart, df)
+    with col_2:
+        selected_grain = st.segmented_control(
+            "Grain",
+            list(GRAINS),
+            key=f"grain_{chart['chart_id']}",
+            default="Day",
+            label_visibility="collapsed",
+        )
+    grain, candles = chart_candles(
+        chart, filtered_df, chart_filters(chart), selected_grain or "Day"
+    )
+    if selected_grain and grain != selected_grain:
+        optional_info += f"<em>Shown by {grain.lower()}</em> <br>"
+    fig = create_candlestick_chart(
+        candles, chart["date_column"][0], ", ".join(chart["measure"][:4]), optional_info
+    )
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart",
+        on_select=lambda: None,
+    )
+    return fig
+
+
+@fragment
+def create_drilldown_chart_with_filters(chart: dict, df):
+    filtered_df, _, selected_measure, optional_info, col_2 = render_form(chart, df)
+    path_key = f"drill_path_{chart['chart_id']}"
+    step_key = f"drill_step_{chart['chart_id']}"
+    path = st.session_state.setdefault(path_key, [])
+    st.session_state.setdefault(step_key, 0)
+    with col_2:
+        crumbs = ["All", *(str(key) for key in path[:1])]
+        crumbs += [calendar.month_abbr[key] for key in path[1:]]
+        for depth, (column, crumb) in enumerate(zip(st.columns(3), crumbs)):
+            if column.button(
+                crumb,
+                key=f"drill_up_{depth}_{chart['chart_id']}",
+                disabled=depth == len(path),
+                use_container_width=True,
+            ):
+                path = st.session_state[path_key] = path[:depth]
+                st.session_state[step_key] += 1
+    level, bars = chart_drill(
+        chart, filtered_df, selected_measure, chart_filters(chart), path
+    )
+    fig = create_bar_chart_with_infinite_bars(
+        data={"bars": [{"x": bars["label"], "y": bars["value"]}]},
+        xaxis_title=level,
+        yaxis_title=selected_measure,
+        orientation="v",
+        text_anotation=optional_info or None,
+    )
+    # A new key per drill step, so the chart of the next level starts
+    # without the click that opened it.
+    event = st.plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"{chart['chart_id']}_chart_{st.session_state[step_key]}",
+        on_select="rerun",
+        selection_mode="points",
+    )
+    points = event.selection.points if event else []
+    if points and level != "Day":
+        st.session_state[path_key] = [*path, int(bars["key"].iloc[points[0]["point_index"]])]
+        st.session_state[step_key] += 1
+        st.rerun(scope="fragment")
+    return fig
+
+
 @fragment
 def create_slicer_chart(chart, df):
     filtered_df, _, _, optional_info, col_2 = render_form(chart, df)
@@ -1134,9 +1956,128 @@ def create_variance_comparison_bar_chart(
     return fig
 
 
-@st.cache_data
-def read_parquet(path: str, column_data: bool | str = False):
-    df = pd.read_parquet(path)
+PARTITION_READ_WORKERS = 8
+
+
+def _load_part(part: str, column_data, columns: tuple = None):
+    read, joins = read_columns(part, columns)
+    df = join(pd.read_parquet(part, columns=list(read) if read else None), joins, columns)
     if column_data:
         create_year_and_month_week_and_day_columns(df, column_data[0])
+    return load_with_profile(part, df)
+
+
+@st.cache_data
+def _read_part(part: str, fingerprint: tuple, column_data, columns: tuple = None):
+    return _load_part(part, column_data, columns)
+
+
+def read_part(part: str, column_data: bool | str = False, columns: tuple = None):
+    """A part with its derived columns, from the host-wide shared store when
+    it is enabled, else from this process' cache."""
+    # False and [] read the same: one cache entry, which `watcher.evict` finds.
+    column_data = list(column_data or [])
+    fingerprint = part_fingerprint(part)
+    if SHARED_ENABLED:
+        return shared_part(
+            part,
+            fingerprint,
+            column_data,
+            columns,
+            LOAD_PROFILE,
+            lambda: _load_part(part, column_data, columns),
+        )
+    return _read_part(part, fingerprint, column_data, columns)
+
+
+def read_parquet(
+    path: str, column_data: bool | str = False, columns: tuple = None, parts: list = None
+):
+    """Read a dataset part by part; only new or changed parts miss the cache.
+
+    `parts` restricts the read to a pruned subset of the dataset's parts,
+    which are then loaded in parallel.
+    """
+    parts = dataset_parts(path) if parts is None else parts
+    if len(parts) == 1:
+        return read_part(parts[0], column_data, columns)
+    if not parts:
+        return read_part(dataset_parts(path)[0], column_data, columns).iloc[0:0]
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=min(PARTITION_READ_WORKERS, len(parts)),
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    ) as pool:
+        frames = list(
+            pool.map(lambda part: read_part(part, column_data, columns), parts)
+        )
+    return concat_frames(frames)
+
+
+def chart_columns(chart: dict) -> list:
+    return [
+        *chart.get("dimension", []),
+        chart.get("main_dimension"),
+        chart.get("y_dimension"),
+        *(chart.get("hierarchy") or []),
+        *stored_measures(chart),
+        *(chart.get("date_column") or []),
+    ]
+
+
+def dataset_columns(pages: list, path: str, column_data=False) -> tuple:
+    """Columns that the charts reading `path` with `column_data` need, across
+    every page, so the page views and the prewarm share one cache entry."""
+    available = {*get_catalog_entry(path)["columns"], *joined_columns(path)}
+    columns = {
+        column
+        for page in pages
+        for chart in page.get("charts", [])
+        if chart.get("file_path") == path
+        and (chart.get("date_column") or []) == (column_data or [])
+        for column in chart_columns(chart)
+        if column in available
+    }
+    return tuple(sorted(columns)) or None
+
+
+def load_dataset(
+    path: str, column_data=False, pages: list = None, parts: list = None
+) -> pd.DataFrame:
+    if pages is None:
+        from pages_data import load_pages
+
+        pages = load_pages()
+    if uses_streaming(path):
+        return stream_dataset(path, column_data, pages, parts)
+    return read_parquet(
+        path, column_data, dataset_columns(pages, path, column_data), parts
+    )
+
+
+def load_chart_dataset(chart: dict, pages: list = None) -> pd.DataFrame:
+    """The dataset of a chart; Hive-partitioned datasets only read the
+    partitions its current time filter keeps."""
+    parts = None
+    if chart.get("date_column") and is_partitioned(chart["file_path"]):
+        parts = prune_parts(chart["file_path"], **partition_filter(chart["chart_id"]))
+    fingerprint = dataset_fingerprint(chart["file_path"])
+    df = load_dataset(chart["file_path"], chart.get("date_column", False), pages, parts)
+    df.attrs.update(fingerprint=fingerprint, parts=tuple(parts) if parts else None)
+    if not uses_streaming(chart["file_path"]):
+        df = with_calculated(chart, df, parts)  # keeps the attrs
     return df
+
+
+def partition_filter(id_chart) -> dict:
+    """Years and months the current time filter of a chart can touch."""
+    if st.session_state.get(f"time_unit_{id_chart}") == "Day":
+        days = st.session_state.get(f"selected_day_{id_chart}")
+        if days and len(days) == 2:
+            return {"years": list(range(days[0].year, days[1].year + 1))}
+        return {}
+    return {
+        key: value
+        for key, value in (selected_period(id_chart) or {}).items()
+        if key in ("years", "months")
+    }
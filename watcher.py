@@ -0,0 +1,220 @@
+"""
+Polling watcher of the datasets and the pages configuration.
+
+Every WATCH_INTERVAL seconds the fingerprints of the datasets (and the
+modification time of the pages file) are compared with the previous poll.
+When a dataset changes, only the cache entries built from its previous
+version are evicted and only the chart fragments that read it are rerun, in
+every open session. A change to the pages configuration can move or remove
+charts, so it reruns the sessions showing charts in full.
+"""
+
+import os
+import threading
+import time
+import streamlit as st
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from catalog import DATA_DIR, dataset_fingerprint, list_datasets
+from pages_data import PAGES_FILE, load_pages
+
+WATCH_ENABLED = True
+WATCH_INTERVAL = 2.0
+
+logger = get_logger(__name__)
+_fragments = {}  # session id -> {fragment id: dataset path}
+_fragments_lock = threading.Lock()
+
+
+def _current_fragment_id(ctx):
+    fragment_id = getattr(ctx, "current_fragment_id", None)
+    if fragment_id is None:
+        try:
+            from streamlit.runtime.scriptrunner_utils.script_run_context import (
+                ThreadState,
+            )
+
+            fragment_id = ThreadState.get().fragment_id
+        except (ImportError, RuntimeError):
+            return None
+    return fragment_id
+
+
+def watch_fragment(path: str):
+    """Record that the running chart fragment reads `path`."""
+    ctx = get_script_run_ctx()
+    fragment_id = ctx and _current_fragment_id(ctx)
+    if fragment_id:
+        with _fragments_lock:
+            _fragments.setdefault(ctx.session_id, {})[fragment_id] = os.path.normpath(path)
+
+
+def watched_paths(pages: list) -> list:
+    paths = {os.path.join(DATA_DIR, name) for name in list_datasets()}
+    paths.update(
+        chart["file_path"]
+        for page in pages
+        for chart in page.get("charts", [])
+        if chart.get("file_path")
+    )
+    return sorted(paths)
+
+
+def snapshot(pages: list) -> dict:
+    fingerprints = {}
+    for path in watched_paths(pages):
+        try:
+            fingerprints[path] = dataset_fingerprint(path)
+        except OSError:
+            fingerprints[path] = None  # removed between listing and stat
+    return fingerprints
+
+
+def pages_mtime():
+    return os.stat(PAGES_FILE).st_mtime_ns if os.path.exists(PAGES_FILE) else None
+
+
+def evict(path: str, fingerprint: tuple, pages: list):
+    """Drop the cache entries built from one version of a dataset. Entries
+    are keyed by fingerprint, so the new version misses them anyway; this
+    frees the memory instead of waiting for eviction."""
+    from catalog import _build_entry, _build_part_entry
+    from cube import _get_cube, cube_layout
+    from distinct import _get_registers, distinct_layout
+    from load_profile import LOAD_PROFILE
+    from prewarm import dataset_keys, default_aggregates
+    from sampling import _exact_aggregate
+    from shared import _shared_part
+    from sketches import _get_sketches, sketch_layout
+    from utils import _read_part, dataset_columns
+
+    current = {part: stat for part, *stat in dataset_fingerprint(path)}
+    _build_entry.clear(path, fingerprint)
+    changed = [(part, tuple(stat)) for part, *stat in fingerprint if current.get(part) != stat]
+    for part, stat in changed:
+        _build_part_entry.clear(part, stat)
+    for dataset, date_column in dataset_keys(pages):
+        if dataset == path:
+            column_data = list(date_column) or False
+            columns = dataset_columns(pages, path, column_data)
+            # The loaded parts, keyed as `read_part` normalizes its arguments.
+            for part, stat in changed:
+                _read_part.clear(part, stat, list(date_column), columns)
+                _shared_part.clear(part, stat, list(date_column), columns, LOAD_PROFILE, None)
+            _get_cube.clear(
+                path,
+                fingerprint,
+                date_column,
+                columns,
+                *cube_layout(pages, path, column_data),
+            )
+            _get_sketches.clear(
+                path,
+                fingerprint,
+                date_column,
+                columns,
+                *sketch_layout(pages, path, column_data),
+            )
+            _get_registers.clear(
+                path,
+                fingerprint,
+                date_column,
+                columns,
+                *distinct_layout(pages, path, column_data),
+            )
+    for dataset, date_column, group_by, measure in default_aggregates(pages):
+        if dataset == path:
+            # Keyed as `exact_aggregate` normalizes its arguments.
+            _exact_aggregate.clear(path, fingerprint, list(date_column), group_by, measure)
+
+
+def _sessions():
+    """session id -> (session, its last client state, {fragment id: path}) of
+    the open sessions that show charts. The push to the browsers relies on
+    Streamlit internals, reached only here: on a version without them it is
+    skipped, and the watcher keeps evicting."""
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return {}
+    sessions = {}
+    try:
+        manager = Runtime.instance()._session_mgr
+        with _fragments_lock:
+            for session_id in list(_fragments):
+                info = manager.get_active_session_info(session_id)
+                if info is None:
+                    del _fragments[session_id]  # the session ended
+                else:
+                    sessions[session_id] = (
+                        info.session,
+                        info.session._client_state,
+                        dict(_fragments[session_id]),
+                    )
+    except AttributeError:
+        logger.warning("Cannot rerun sessions with this version of Streamlit")
+        return {}
+    return sessions
+
+
+def _rerun(session, client_state, fragment_id: str = None):
+    """Rerun a session with its last client state, as a save of the source
+    does, or only one of its fragments."""
+    from streamlit.proto.ClientState_pb2 import ClientState
+
+    rerun_state = ClientState()
+    rerun_state.CopyFrom(client_state)
+    rerun_state.fragment_id = fragment_id or ""
+    session.request_rerun(rerun_state)
+
+
+def refresh_fragments(paths: set):
+    paths = {os.path.normpath(path) for path in paths}
+    for session_id, (session, client_state, fragments) in _sessions().items():
+        for fragment_id, path in fragments.items():
+            if path in paths:
+                _rerun(session, client_state, fragment_id)
+                logger.info("Reran fragment %s of session %s", fragment_id, session_id)
+
+
+def refresh_sessions():
+    for session_id, (session, client_state, _) in _sessions().items():
+        _rerun(session, client_state)
+        logger.info("Reran session %s", session_id)
+
+
+def watch(interval: float = WATCH_INTERVAL):
+    pages = load_pages()
+    fingerprints, mtime = snapshot(pages), pages_mtime()
+    while True:
+        time.sleep(interval)
+        try:
+            if pages_mtime() != mtime:
+                mtime, pages = pages_mtime(), load_pages()
+                logger.info("Pages configuration changed")
+                refresh_sessions()
+            current = snapshot(pages)
+            changed = {
+                path
+                for path in current
+                if path in fingerprints and current[path] != fingerprints[path]
+            }
+            for path in changed:
+                logger.info("Dataset %s changed", path)
+                if fingerprints[path] and current[path]:
+                    evict(path, fingerprints[path], pages)
+            if changed:
+                refresh_fragments(changed)
+            fingerprints = current
+        except Exception:
+            logger.exception("File watcher poll failed")
+
+
+@st.cache_resource(show_spinner=False)
+def start_watcher():
+    """Start the watcher once per server process, in the background."""
+    if not WATCH_ENABLED:
+        return None
+    thread = threading.Thread(target=watch, name="watcher", daemon=True)
+    thread.start()
+    return thread